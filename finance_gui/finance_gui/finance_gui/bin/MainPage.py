@@ -4,9 +4,9 @@ from tkinter import ttk
 import tkinter as tk
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
-from bin.StatisticsFrame import StatisticsFrame
 import sys
 import os
+import time
 
 # 添加项目根目录到Python路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,22 +17,90 @@ if project_root not in sys.path:
 # 现有的导入语句
 from bin.view import *   # 菜单栏对应的各个子页面
 
-# 添加统计模块的导入
-try:
-    from bin.StatisticsFrame import StatisticsFrame
-except ImportError as e:
-    print(f"导入统计模块失败: {e}")
-    # 如果导入失败，创建一个空的占位符类
-    class StatisticsFrame(tb.Frame):
-        def __init__(self, parent):
-            super().__init__(parent)
-            label = tb.Label(self, text="统计模块加载失败，请检查StatisticsFrame.py文件")
-            label.pack(pady=20)
+CHECKPOINT_INTERVAL = 60 * 60 * 1000  # 检查是否跨月、需要补建余额快照的间隔（毫秒）
+
+
+class FallbackStatisticsFrame(tb.Frame):
+    """统计模块导入失败时的占位页面"""
+    def __init__(self, parent):
+        super().__init__(parent)
+        label = tb.Label(self, text="统计模块加载失败，请检查StatisticsFrame.py文件")
+        label.pack(pady=20)
+
+    def refresh_if_stale(self):
+        pass
+
+
+def load_statistics_frame():
+    """首次需要统计图表时才导入统计模块（会同时导入 matplotlib），并记录导入耗时"""
+    start = time.perf_counter()
+    try:
+        from bin.StatisticsFrame import StatisticsFrame
+    except ImportError as e:
+        print(f"导入统计模块失败: {e}")
+        return FallbackStatisticsFrame
+    logger.info("导入统计模块（含 matplotlib）耗时 %.3f 秒" % (time.perf_counter() - start))
+    return StatisticsFrame
+
+
+class RefreshCoordinator(object):
+    """标签页按需刷新
+    数据表变化事件（见 CHANGE_EVENTS）只把依赖该表的页面标记为待刷新，
+    切换到某个标签页时才刷新该页中待刷新的部分，不可见的页面不查询数据库
+    refresher = RefreshCoordinator(notebook, win)
+    refresher.register(tab, refresh, ["payments", "incomes"])
+    """
+
+    def __init__(self, notebook, win):
+        self.notebook = notebook
+        self.tabs = {}  # {标签页: [(刷新函数, 依赖的表)]}
+        self.dirty = set()  # 待刷新的 (标签页, 序号)
+        for table, event in CHANGE_EVENTS.items():
+            win.bind(event, lambda e, t=table: self.mark_dirty(t), add="+")
+        notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed, add="+")
+
+    def register(self, tab, refresh, tables):
+        """登记标签页 tab 中的一个刷新函数及其依赖的数据表"""
+        self.tabs.setdefault(str(tab), []).append((refresh, set(tables)))
+
+    def mark_dirty(self, table):
+        """table 数据变化：标记其他标签页中依赖它的部分待刷新
+        当前可见的标签页就是发生写入的页面，写入后已自行刷新，不再重复刷新"""
+        current = self.notebook.select()
+        for tab, items in self.tabs.items():
+            if tab == current:
+                continue
+            for i, (refresh, tables) in enumerate(items):
+                if table in tables:
+                    self.dirty.add((tab, i))
+
+    def on_tab_changed(self, event=None):
+        self.refresh_tab(self.notebook.select())
+
+    def refresh_tab(self, tab, force=False):
+        """刷新标签页中待刷新的部分，force 为 True 时全部刷新"""
+        tab = str(tab)
+        for i, (refresh, tables) in enumerate(self.tabs.get(tab, [])):
+            if not force and (tab, i) not in self.dirty:
+                continue
+            self.dirty.discard((tab, i))
+            try:
+                refresh()
+            except Exception as e:
+                print("刷新页面失败:%s" % e)
+
+    def refresh_all(self):
+        """立即刷新所有标签页"""
+        for tab in self.tabs:
+            self.refresh_tab(tab, force=True)
 """修改结束"""
 
 class MainPage(object):
-    def __init__(self, master=None):
+    def __init__(self, master=None, start_time=None):
         self.win = master  # 定义内部变量root
+        self.start_time = start_time or time.perf_counter()  # 程序启动时间，用于统计首次绘制耗时
+        self.statistics_frame = None  # 统计页面，第一次切换到统计图表页时才创建
+        self.home_pies = None  # 主页饼图（home_charts.HomePie），首次绘制时才导入 matplotlib
         # self.win.protocol('WM_DELETE_WINDOW', self.closeWindow)  # 绑定窗口关闭事件，防止计时器正在工作导致数据丢失
 
         # 设置窗口大小
@@ -48,14 +116,57 @@ class MainPage(object):
         # 设置窗口初始位置在屏幕居中
         self.win.geometry("%sx%s+%s+%s" % (winWidth, winHeight, x, y))
         self.page = None  # 用于标记功能界面
+        self.closed_month = None  # 已补建余额快照的最近月份
+        self.checkpoint_balances()  # 在显示余额之前补建快照
         self.createPage()
         """修改开始"""
-        # 在创建其他标签页的代码后面添加
-        #self.add_statistics_tab()
-        self.statistics_frame = StatisticsFrame(self.notebook)
-        self.notebook.add(self.statistics_frame, text="统计图表")
+        # 统计图表页先放一个空容器，第一次切换到该页时才创建 StatisticsFrame
+        self.statistics_tab = tb.Frame(self.notebook)
+        self.notebook.add(self.statistics_tab, text="统计图表")
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed, add="+")
+        # 窗口先显示，空闲时再绘制主页饼图
+        self.win.after_idle(self.on_first_paint)
         """修改结束"""
 
+    def get_statistics_frame(self):
+        """获取唯一的统计页面实例，第一次切换到统计图表页时导入统计模块并创建"""
+        if self.statistics_frame is None:
+            frame_class = load_statistics_frame()
+            start = time.perf_counter()
+            self.statistics_frame = frame_class(self.statistics_tab)
+            logger.info("创建统计页面耗时 %.3f 秒" % (time.perf_counter() - start))
+        return self.statistics_frame
+
+    def checkpoint_balances(self):
+        """为已结束的月份补建账户余额快照：启动时执行一次，之后每隔 CHECKPOINT_INTERVAL 检查，跨月后再执行
+        余额页面只读取快照，刷新时不再逐个账户检查"""
+        month = balances.last_closed_month()
+        if month != self.closed_month:
+            try:
+                created = balances.checkpoint(db.get_connection())
+                self.closed_month = month
+                if created:
+                    logger.info("补建账户余额快照 %s 个（至 %s）" % (created, month))
+            except Exception as e:
+                logger.info("补建账户余额快照失败:%s" % e)
+        self.win.after(CHECKPOINT_INTERVAL, self.checkpoint_balances)
+
+    def on_tab_changed(self, event=None):
+        """第一次切换到统计图表页时创建并显示统计页面"""
+        if self.notebook.select() != str(self.statistics_tab):
+            return
+        frame = self.get_statistics_frame()
+        if not frame.winfo_manager():
+            frame.pack(fill=tk.BOTH, expand=True)
+        frame.refresh_if_stale()  # 离开统计页期间账目有变化时重绘图表
+
+    def on_first_paint(self):
+        """窗口首次显示后：记录启动耗时，再绘制主页饼图"""
+        self.win.update_idletasks()  # 确保窗口与占位面板已经绘制
+        logger.info("窗口首次显示耗时 %.3f 秒" % (time.perf_counter() - self.start_time))
+        self.refresh_home_pie()
+        logger.info("主页饼图绘制完成，累计耗时 %.3f 秒" % (time.perf_counter() - self.start_time))
+
     def createPage(self):
         # 设置主框架标签页
         # Tab Control introduced here --------------------------------------
@@ -83,6 +194,9 @@ class MainPage(object):
         tab6 = tb.Frame(tabControl)
         tabControl.add(tab6, text='  还款  ')
 
+        tab_loan = tb.Frame(tabControl)
+        tabControl.add(tab_loan, text='  借贷  ')
+
         tab7 = tb.Frame(tabControl)
         tabControl.add(tab7, text='  记录  ')
 
@@ -94,7 +208,7 @@ class MainPage(object):
         # ~ Tab Control introduced here -----------------------------------------
 
         # ========= 主页布局 =========
-        # 第0行：信息汇总区（左：IndexFrame，右：预算容器）
+        # 第0行：信息汇总区（左：IndexFrame，右：预算容器；下方：账户余额）
         # 第1行：两个饼图（支出 / 收入）
         try:
             tab1.rowconfigure(0, weight=1)   # 信息汇总区域可扩展
@@ -140,6 +254,13 @@ class MainPage(object):
         except Exception:
             pass
 
+        # 下方：账户余额（BalanceFrame 与 BudgetFrame 一样自己 grid 内部 root，这里只调整位置）
+        self.home_balance_panel = BalanceFrame(summary_pair)
+        try:
+            self.home_balance_panel.root.grid_configure(row=1, column=0, columnspan=2, padx=8, pady=4, sticky="nsew")
+        except Exception:
+            pass
+
         # ========= 分类占比（支出 / 收入） =========
         charts_group = tb.LabelFrame(tab1, text="本月分类占比（支出 / 收入）")
         charts_group.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
@@ -154,11 +275,15 @@ class MainPage(object):
             try:
                 from datetime import datetime
                 now = datetime.now()
-                # 刷新支出
-                self.statistics_frame.render_pie_chart_in_parent(self.home_pie_frame, now.year, now.month)
-                # 刷新收入
-                if hasattr(self, "home_income_pie_frame"):
-                    self.statistics_frame.render_income_pie_chart_in_parent(self.home_income_pie_frame, now.year, now.month)
+                if self.home_pies is None:
+                    # 主页饼图只需要 ChartSlot 和按月汇总表，不创建统计页面
+                    start = time.perf_counter()
+                    from bin.home_charts import HomePie
+                    logger.info("导入主页图表模块（含 matplotlib）耗时 %.3f 秒" % (time.perf_counter() - start))
+                    self.home_pies = [HomePie(self.home_pie_frame, "payments", "支出", clickable=True),
+                                      HomePie(self.home_income_pie_frame, "incomes", "收入", level=1, label="parent")]
+                for pie in self.home_pies:
+                    pie.render(now.year, now.month)
                 # 刷新主页预算栏
                 try:
                     self.home_budget_panel.show_infos()
@@ -198,25 +323,9 @@ class MainPage(object):
         self.home_income_pie_frame.grid(row=0, column=0, sticky="w", padx=6, pady=6)
         self.home_income_pie_frame.grid_propagate(False)
 
-        # 确保已创建 statistics_frame 实例（在统计页使用的同一个实例）
-        try:
-            _ = self.statistics_frame
-        except AttributeError:
-            hidden_tab = tb.Frame(self.notebook)
-            self.statistics_frame = StatisticsFrame(hidden_tab)  # 不加入到 notebook
-
-        # 初始渲染（支出 + 收入）
-        try:
-            from datetime import datetime
-            now = datetime.now()
-            self.statistics_frame.render_pie_chart_in_parent(self.home_pie_frame, now.year, now.month)
-            self.statistics_frame.render_income_pie_chart_in_parent(self.home_income_pie_frame, now.year, now.month)
-        except Exception as e:
-            for frm in (self.home_pie_frame, self.home_income_pie_frame):
-                try:
-                    tb.Label(frm, text=f"渲染分类占比图失败：{e}").grid(row=0, column=0, padx=10, pady=10, sticky="w")
-                except Exception:
-                    pass
+        # 饼图先显示占位提示，窗口显示后在空闲回调中绘制（见 on_first_paint）
+        for frm in (self.home_pie_frame, self.home_income_pie_frame):
+            tb.Label(frm, text="加载中...", anchor="center").pack(fill=tb.BOTH, expand=True, padx=10, pady=10)
 
         # ========= 其它标签页 =========
         self.monty2 = PaymentFrame(tab2)
@@ -237,63 +346,37 @@ class MainPage(object):
         self.monty6 = RepaymentFrame(tab6)
         self.monty6.grid(column=0, row=0, padx=8, pady=4)
 
+        self.monty_loan = LoanFrame(tab_loan)
+        self.monty_loan.grid(column=0, row=0, padx=8, pady=4)
+
         self.monty7 = NoteFrame(tab7)
         self.monty7.grid(column=0, row=0, padx=8, pady=4)
 
         monty8 = BackupFrame(tab8)
         monty8.grid(column=0, row=0, padx=8, pady=4)
 
-        # 绑定标签栏 鼠标左键事件 用于每次点击 主页标签都能得到最新的汇总信息
-        tabControl.bind("<Button-1>", self.reshow_infos) 
-        #self.notebook.bind("<Button-1>", self.reshow_infos) # 调用方法获取最新汇总信息
+        # 数据变化时只标记相关页面，切换到该页面时才刷新
+        all_tables = [table for table in CHANGE_EVENTS if table != "dimensions"]
+        self.refresher = RefreshCoordinator(tabControl, self.win)
+        self.refresher.register(tab1, self.monty1.show_infos, all_tables)
+        self.refresher.register(tab1, self.refresh_home_pie, ["payments", "incomes"])  # 含主页预算栏
+        # 账户余额依赖各类交易与账户（新增账户）
+        self.refresher.register(tab1, self.home_balance_panel.show_infos,
+                                [table for table in CHANGE_EVENTS if table != "notes"])
+        self.refresher.register(tab2, self.monty2.showAll, ["payments"])
+        self.refresher.register(tab3, self.monty3.showAll, ["incomes"])
+        self.refresher.register(tab_budget, self.monty_budget.show_infos, ["payments"])
+        self.refresher.register(tab4, self.monty4.showAll, ["borrows"])
+        self.refresher.register(tab5, self.monty5.showAll, ["lends"])
+        self.refresher.register(tab6, self.monty6.showAll, ["repayments"])
+        self.refresher.register(tab6, self.monty6.set_loan_values, ["borrows", "lends"])  # 所还借款下拉框
+        self.refresher.register(tab_loan, self.monty_loan.show_infos, ["borrows", "lends", "repayments", "dimensions"])
+        self.refresher.register(tab7, self.monty7.showAll, ["notes"])
+        # 新增账户、分类等标签后，各页面的下拉框从维度缓存重新取选项
+        for tab, frame in [(tab2, self.monty2), (tab3, self.monty3), (tab4, self.monty4), (tab5, self.monty5),
+                           (tab6, self.monty6)]:
+            self.refresher.register(tab, frame.set_combox_values, ["dimensions"])
 
-    # 绑定事件：当有支出/收入变化时刷新预算显示
-        try:
-            self.win.bind('<<PaymentsChanged>>', self.reshow_infos)
-            self.win.bind('<<IncomesChanged>>', self.reshow_infos)
-        except Exception:
-            pass
-
-    def reshow_infos(self, event=None):
-        # 刷新显示各个页面最新信息
-        try:
-            self.monty1.show_infos()
-        except Exception:
-            pass
-        try:
-            self.monty2.showAll()
-        except Exception:
-            pass
-        try:
-            self.monty3.showAll()
-        except Exception:
-            pass
-        # 主页预算栏
-        try:
-            self.home_budget_panel.show_infos()
-        except Exception:
-            pass
-        # 预算标签页（保留）
-        try:
-            self.monty_budget.show_infos()
-        except Exception:
-            pass
-        try:
-            self.monty4.showAll()
-        except Exception:
-            pass
-        try:
-            self.monty5.showAll()
-        except Exception:
-            pass
-        try:
-            self.monty6.showAll()
-        except Exception:
-            pass
-        try:
-            self.monty7.showAll()
-        except Exception:
-            pass
   
 
     
@@ -312,7 +395,7 @@ def add_statistics_tab(self):
         self.notebook.add(tab9, text='  统计图表  ')
             
             # 在标签页中创建统计框架
-        self.statistics_frame = StatisticsFrame(tab9)
+        self.statistics_frame = load_statistics_frame()(tab9)
         self.statistics_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
     
             
@@ -182,7 +182,7 @@ class StatisticsFram_main(tb.Frame):
                 query = """
                     SELECT 
                         COALESCE(pc.title, '未分类') as category_name, 
-                        SUM(p.money) as total_amount
+                        SUM(p.money_fen) / 100.0 as total_amount
                     FROM payments p
                     LEFT JOIN pay_categorys pc ON p.category_pid = pc.id
                     WHERE p.note_date BETWEEN ? AND ? 
@@ -195,7 +195,7 @@ class StatisticsFram_main(tb.Frame):
                 query = """
                     SELECT 
                         '支出' as category_name, 
-                        SUM(p.money) as total_amount
+                        SUM(p.money_fen) / 100.0 as total_amount
                     FROM payments p
                     WHERE p.note_date BETWEEN ? AND ? 
                     AND p.is_delete = 0
@@ -236,7 +236,7 @@ class StatisticsFram_main(tb.Frame):
             if 'category_pid' in column_names:
                 query = """                    SELECT 
                         COALESCE(ic.title, '未分类') as category_name,
-                        SUM(p.money) as total_amount
+                        SUM(p.money_fen) / 100.0 as total_amount
                     FROM incomes p
                     LEFT JOIN income_categorys ic ON p.category_pid = ic.id
                     WHERE p.note_date BETWEEN ? AND ?
@@ -245,7 +245,7 @@ class StatisticsFram_main(tb.Frame):
                     ORDER BY total_amount DESC
                 """
             else:
-                query = """                    SELECT '收入' as category_name, SUM(p.money) as total_amount
+                query = """                    SELECT '收入' as category_name, SUM(p.money_fen) / 100.0 as total_amount
                     FROM incomes p
                     WHERE p.note_date BETWEEN ? AND ?
                     AND p.is_delete = 0
@@ -278,7 +278,7 @@ class StatisticsFram_main(tb.Frame):
 
             if 'category_pid' in column_names:
                 query = """                    SELECT 
-                        p.id, p.note_date, p.title, p.remark, p.money,
+                        p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money,
                         a.title as account, s.title as seller,
                         ic_p.title as category_p, ic_c.title as category_c,
                         m.title as member
@@ -295,7 +295,7 @@ class StatisticsFram_main(tb.Frame):
                 """
                 cursor.execute(query, (start_date, end_date, category_name))
             else:
-                query = """                    SELECT p.id, p.note_date, p.title, p.remark, p.money,
+                query = """                    SELECT p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money,
                            a.title as account, s.title as seller,
                            '' as category_p, '' as category_c,
                            m.title as member
@@ -334,7 +334,7 @@ class StatisticsFram_main(tb.Frame):
             if category_name == '未分类':
                 # 查询未分类的记录
                 query = """
-                    SELECT id, note_date, title, remark, money, create_time 
+                    SELECT id, note_date, title, remark, money_fen / 100.0 AS money, create_time 
                     FROM payments 
                     WHERE note_date BETWEEN ? AND ? 
                     AND is_delete = 0
@@ -345,7 +345,7 @@ class StatisticsFram_main(tb.Frame):
             else:
                 # 查询指定分类的记录
                 query = """
-                    SELECT p.id, p.note_date, p.title, p.remark, p.money, p.create_time 
+                    SELECT p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money, p.create_time 
                     FROM payments p
                     LEFT JOIN pay_categorys pc ON p.category_pid = pc.id
                     WHERE p.note_date BETWEEN ? AND ? 
@@ -426,7 +426,7 @@ class StatisticsFram_main(tb.Frame):
             query = """
                 SELECT 
                     strftime('%m', note_date) as month, 
-                    SUM(money) as total_amount
+                    SUM(money_fen) / 100.0 as total_amount
                 FROM payments 
                 WHERE strftime('%Y', note_date) = ?
                 AND is_delete = 0
@@ -598,7 +598,7 @@ class StatisticsFram_main(tb.Frame):
     
     
     def get_monthly_expense_sum(self, year, month):
-        """返回指定年月的支出总额（payments.money 之和，is_delete=0）"""
+        """返回指定年月的支出总额（payments.money_fen 之和换算为元，is_delete=0）"""
         conn = self.get_db_connection()
         if not conn:
             return 0.0
@@ -608,7 +608,7 @@ class StatisticsFram_main(tb.Frame):
             start_date = f"{int(year)}-{int(month):02d}-01"
             end_date = f"{int(year)}-{int(month):02d}-{last_day:02d}"
             cur = conn.cursor()
-            cur.execute("""                SELECT COALESCE(SUM(money), 0) 
+            cur.execute("""                SELECT COALESCE(SUM(money_fen), 0) / 100.0 
                 FROM payments 
                 WHERE note_date BETWEEN ? AND ? AND is_delete=0
             """, (start_date, end_date))
@@ -1098,7 +1098,7 @@ class StatisticsFram_main(tb.Frame):
                 query = """
                     SELECT 
                         COALESCE(pc.title, '未分类') as category_name, 
-                        SUM(p.money) as total_amount
+                        SUM(p.money_fen) / 100.0 as total_amount
                     FROM payments p
                     LEFT JOIN pay_categorys pc ON p.category_pid = pc.id
                     WHERE p.note_date BETWEEN ? AND ? 
@@ -1163,7 +1163,7 @@ class StatisticsFram_main(tb.Frame):
                 # 查询指定月份和分类的详细记录
                 if category == '未分类':
                     query = """
-                        SELECT id, note_date, title, remark, money, create_time 
+                        SELECT id, note_date, title, remark, money_fen / 100.0 AS money, create_time 
                         FROM payments 
                         WHERE note_date BETWEEN ? AND ? 
                         AND is_delete = 0
@@ -1173,7 +1173,7 @@ class StatisticsFram_main(tb.Frame):
                     cursor.execute(query, (start_date, end_date))
                 else:
                     query = """
-                        SELECT p.id, p.note_date, p.title, p.remark, p.money, p.create_time 
+                        SELECT p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money, p.create_time 
                         FROM payments p
                         LEFT JOIN pay_categorys pc ON p.category_pid = pc.id
                         WHERE p.note_date BETWEEN ? AND ? 
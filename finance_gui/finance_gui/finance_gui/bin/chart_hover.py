@@ -0,0 +1,161 @@
+# 用于统计图表的悬停交互
+# 图表整体绘制后缓存静态背景，鼠标移动时只恢复背景并重绘提示框和高亮轮廓（blit），不重绘整个图表
+# 饼图按鼠标所在角度二分查找扇形，不逐个扇形做路径检测
+
+import math
+from bisect import bisect_right
+from matplotlib.patches import PathPatch
+
+FRAME_INTERVAL = 16  # 鼠标移动事件的最小处理间隔（毫秒），约为显示器刷新一帧的时间
+HIGHLIGHT_STYLE = dict(fill=False, edgecolor="black", linewidth=2)  # 高亮轮廓样式
+
+
+class BlitTooltip(object):
+    """图表悬停提示的局部重绘
+    hover = BlitTooltip(canvas, tooltip)
+    hover.connect(handler)            # handler(event) 每帧最多调用一次
+    hover.show(text, xy, artist)      # 显示提示框并高亮 artist（扇形或柱子）
+    hover.hide()                      # 隐藏提示框和高亮
+    """
+
+    def __init__(self, canvas, tooltip, highlight_style=None):
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.tooltip = tooltip
+        self.highlight_style = highlight_style or HIGHLIGHT_STYLE
+        self.background = None  # 不含提示框的图表背景
+        self.target = None  # 当前高亮的元素
+        self.overlay = None  # 高亮轮廓
+        self.cursor = None
+        self.handler = None
+        self.pending = None  # 本帧内最后一个鼠标事件
+        self.after_id = None
+        tooltip.set_animated(True)  # 提示框不参与整图绘制，只在 blit 时绘制
+        self.cids = [canvas.mpl_connect("draw_event", self.on_draw)]
+
+    def connect(self, handler):
+        """绑定鼠标移动事件，按帧节流后交给 handler 处理"""
+        self.handler = handler
+        self.cids.append(self.canvas.mpl_connect("motion_notify_event", self.on_motion))
+
+    def disconnect(self):
+        """解除事件绑定"""
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        self.cids = []
+        if self.after_id is not None:
+            self.canvas.get_tk_widget().after_cancel(self.after_id)
+            self.after_id = None
+
+    def on_draw(self, event):
+        """整图重绘（首次绘制、窗口缩放）后重新缓存背景"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_animated()
+
+    def on_motion(self, event):
+        """同一帧内只保留最后一个鼠标事件，到下一帧再处理"""
+        self.pending = event
+        if self.after_id is None:
+            self.after_id = self.canvas.get_tk_widget().after(FRAME_INTERVAL, self.flush)
+
+    def flush(self):
+        self.after_id = None
+        event, self.pending = self.pending, None
+        if event is None or self.handler is None:
+            return
+        if not self.canvas.get_tk_widget().winfo_exists():
+            return
+        self.handler(event)
+
+    def show(self, text, xy, artist=None):
+        """在 xy（数据坐标）处显示提示框，并高亮 artist"""
+        if self.tooltip.get_text() != text:
+            self.tooltip.set_text(text)
+        self.tooltip.xy = xy
+        self.tooltip.set_visible(True)
+        self.set_target(artist)
+        self.set_cursor("hand2")
+        self.update()
+
+    def hide(self):
+        """隐藏提示框和高亮，已隐藏时不重绘"""
+        self.set_cursor("arrow")
+        if not self.tooltip.get_visible() and self.target is None:
+            return
+        self.tooltip.set_visible(False)
+        self.set_target(None)
+        self.update()
+
+    def set_target(self, artist):
+        """设置高亮元素：按元素的轮廓生成一个只在 blit 时绘制的描边"""
+        if artist is self.target:
+            return
+        self.target = artist
+        self.overlay = None
+        if artist is not None:
+            self.overlay = PathPatch(artist.get_path(), transform=artist.get_transform(),
+                                     animated=True, **self.highlight_style)
+            self.overlay.set_figure(self.figure)
+
+    def set_cursor(self, cursor):
+        if cursor != self.cursor:
+            self.cursor = cursor
+            self.canvas.get_tk_widget().config(cursor=cursor)
+
+    def update(self):
+        """恢复背景后只重绘动态部分"""
+        if self.background is None:
+            self.canvas.draw()  # 触发 draw_event 缓存背景并绘制动态部分
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+
+    def draw_animated(self):
+        if self.overlay is not None:
+            self.figure.draw_artist(self.overlay)
+        if self.tooltip.get_visible():
+            self.figure.draw_artist(self.tooltip)
+        self.canvas.blit(self.figure.bbox)
+
+
+class PieHitTester(object):
+    """饼图扇形命中检测
+    按各扇形的起止角度建立累计角度表，鼠标位置换算为极坐标后二分查找所在扇形
+    pie = PieHitTester(wedges)
+    i = pie.hit(event)                # 命中的扇形序号，未命中为 None
+    """
+
+    def __init__(self, wedges):
+        self.wedges = list(wedges)
+        self.axes = self.wedges[0].axes if self.wedges else None
+        # 按起始角度排序（顺时针绘制的饼图扇形角度是递减的）
+        order = sorted(range(len(self.wedges)), key=lambda i: self.wedges[i].theta1)
+        self.order = order
+        self.starts = [self.wedges[i].theta1 for i in order]
+        self.ends = [self.wedges[i].theta2 for i in order]  # 累计角度表，单调递增
+        if self.wedges:
+            wedge = self.wedges[0]
+            self.center = wedge.center
+            self.radius = wedge.r
+            self.inner = wedge.r - wedge.width if wedge.width else 0  # 环形图的内径
+
+    def hit(self, event):
+        """返回鼠标所在扇形的序号"""
+        if not self.wedges or event.inaxes is not self.axes or event.xdata is None:
+            return None
+        return self.hit_point(event.xdata, event.ydata)
+
+    def hit_point(self, x, y):
+        """返回数据坐标 (x, y) 所在扇形的序号"""
+        dx = x - self.center[0]
+        dy = y - self.center[1]
+        r = math.hypot(dx, dy)
+        if r > self.radius or r < self.inner:
+            return None
+        # 角度换算到 [第一个扇形起始角, 起始角+360) 区间
+        start = self.starts[0]
+        angle = (math.degrees(math.atan2(dy, dx)) - start) % 360 + start
+        k = bisect_right(self.ends, angle)
+        if k >= len(self.ends) or angle < self.starts[k]:
+            return None
+        return self.order[k]
@@ -0,0 +1,175 @@
+# 用于管理图表画布的生命周期
+# 每个图表位置（统计页、主页支出饼图、主页收入饼图）只保留一个 Figure 和一个 FigureCanvasTkAgg：
+# 同类型图表切换年月时清空坐标轴后在原画布上重绘，不重建 Tk 控件；图表类型变化时才释放旧的 Figure
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+
+class ChartSlot(object):
+    """一个图表位置
+    slot = ChartSlot(parent, figsize=(4, 4), pack_options=dict(fill="both"))
+    fig, ax = slot.begin("monthly_pie")   # 获取清空后的坐标轴
+    ...                                    # 在 ax 上绘图
+    canvas = slot.show()                   # 刷新画布
+    slot.hover = BlitTooltip(canvas, tooltip)
+    slot.connect("button_press_event", handler)
+    """
+
+    def __init__(self, parent, figsize=(4, 4), dpi=100, pack_options=None):
+        self.parent = parent
+        self.figsize = figsize
+        self.dpi = dpi
+        self.pack_options = pack_options or {}
+        self.kind = None  # 当前图表类型
+        self.figure = None
+        self.canvas = None
+        self.hover = None  # 当前图表的悬停提示（BlitTooltip）
+        self.cids = []  # 当前图表绑定的其他事件
+
+    def begin(self, kind):
+        """开始绘制 kind 类型的图表，返回 (figure, ax)
+        同类型复用原有画布和坐标轴；类型不同时先释放旧图表"""
+        if self.canvas is not None and not self.canvas.get_tk_widget().winfo_exists():
+            # 画布控件已被外部销毁（如父容器被清空），只丢弃引用
+            self.figure.clear()
+            self.figure = self.canvas = self.hover = self.kind = None
+            self.cids = []
+        self.disconnect()
+        if self.canvas is not None and kind != self.kind:
+            self.release()
+        self.clear_placeholder()
+        if self.canvas is None:
+            self.figure = Figure(figsize=self.figsize, dpi=self.dpi)
+            self.canvas = FigureCanvasTkAgg(self.figure, self.parent)
+            self.canvas.get_tk_widget().pack(**self.pack_options)
+            ax = self.figure.add_subplot(111)
+        else:
+            ax = self.figure.axes[0]
+            ax.clear()
+        self.kind = kind
+        return self.figure, ax
+
+    def show(self):
+        """绘图完成后刷新画布"""
+        self.canvas.draw()
+        return self.canvas
+
+    def connect(self, event, handler):
+        """绑定当前图表的事件，下次绘图或释放时自动解除"""
+        self.cids.append(self.canvas.mpl_connect(event, handler))
+
+    def disconnect(self):
+        """解除当前图表绑定的所有事件"""
+        if self.hover is not None:
+            self.hover.disconnect()
+            self.hover = None
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        self.cids = []
+
+    def clear_placeholder(self):
+        """删除父容器中画布以外的控件（如“暂无数据”提示）"""
+        widget = self.canvas.get_tk_widget() if self.canvas is not None else None
+        for w in self.parent.winfo_children():
+            if w is not widget:
+                w.destroy()
+
+    def release(self):
+        """释放图表：解除事件、销毁画布控件并清空 Figure"""
+        self.disconnect()
+        if self.canvas is not None:
+            self.canvas.get_tk_widget().destroy()
+        if self.figure is not None:
+            self.figure.clear()
+        self.figure = None
+        self.canvas = None
+        self.kind = None
+
+
+def measure_switches(switches=100):
+    """用 tracemalloc 对比图表切换的内存占用：每次重建画布 与 复用画布（ChartSlot）
+    没有显示器时 Tk 无法启动，改用不带控件的 FigureCanvasAgg 对比同样的两种做法（复用时与 ChartSlot.begin 一样清空坐标轴），
+    此时不计 Tk 控件本身的内存"""
+    import tracemalloc
+    import tkinter as tk
+
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        root = None
+        print("没有可用的显示器，改用 FigureCanvasAgg 测量")
+    if root is not None:
+        root.withdraw()
+        frame = tk.Frame(root)
+        frame.pack()
+
+    def draw(ax, i):
+        amounts = [(i + j) % 7 + 1 for j in range(12)]
+        ax.pie(amounts, labels=["分类%d" % j for j in range(12)], autopct="%.1f%%", startangle=90)
+        ax.set_title("第%d次" % i)
+
+    def new_canvas():
+        fig = Figure(figsize=(4, 4), dpi=100)
+        if root is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            return FigureCanvasAgg(fig)
+        canvas = FigureCanvasTkAgg(fig, frame)
+        canvas.get_tk_widget().pack()
+        return canvas
+
+    current = {}
+
+    def recreate(i):
+        if root is not None:
+            for w in frame.winfo_children():
+                w.destroy()
+        canvas = current["canvas"] = new_canvas()
+        draw(canvas.figure.add_subplot(111), i)
+        canvas.draw()
+
+    slot = ChartSlot(frame, figsize=(4, 4)) if root is not None else None
+
+    def reuse(i):
+        if slot is not None:
+            fig, ax = slot.begin("pie")
+            draw(ax, i)
+            slot.show()
+            return
+        if "reused" not in current:
+            current["reused"] = new_canvas()
+            current["reused"].figure.add_subplot(111)
+        ax = current["reused"].figure.axes[0]
+        ax.clear()
+        draw(ax, i)
+        current["reused"].draw()
+
+    results = {}
+    for name, func in (("每次重建画布", recreate), ("复用画布", reuse)):
+        func(0)  # 预热：字体缓存等一次性开销不计入
+        if root is not None:
+            root.update()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(1, switches + 1):
+            func(i)
+            if root is not None:
+                root.update()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        grown = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        results[name] = (grown, peak)
+        print("%s：%d 次切换后内存增长 %.1f KB，峰值 %.1f KB" % (name, switches, grown / 1024, peak / 1024))
+        current.clear()
+        if root is not None:
+            slot.release()
+            for w in frame.winfo_children():
+                w.destroy()
+    if root is not None:
+        root.destroy()
+    return results
+
+
+if __name__ == '__main__':
+    measure_switches()
@@ -1,6 +1,8 @@
 
 import os
 import sys
+import time
+start_time = time.perf_counter()  # 启动计时，用于统计冷启动耗时
 from pathlib import Path
 import ttkbootstrap as tb
 base_dir = Path(__file__).resolve().parent.parent
@@ -17,6 +19,11 @@ project_root = os.path.dirname(current_dir)  # 获取项目根目录
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# 启动时升级数据库结构，升级前先备份数据库文件
+from conf import settings
+from core import migrate
+applied_migrations = migrate.upgrade(settings.DB_PATH, backup_dir=settings.BACKUP_DIR)
+
 # 现在尝试导入
 try:
     from bin.MainPage import *
@@ -39,8 +46,7 @@ if project_root not in sys.path:
 if bin_dir not in sys.path:
     sys.path.insert(0, bin_dir)
 
-# 尝试导入StatisticsFrame
-from bin.StatisticsFrame import StatisticsFrame
+# 统计模块（含 matplotlib）改为在 MainPage 中首次需要时才导入
 """修改结束"""
 """修改结束"""
 "测试用途"
@@ -53,8 +59,18 @@ root = tb.Window(themename="solar")  # 可选主题：darkly, flatly, cyborg, mi
 root.title('Finance for College Students')
 # root.iconbitmap(default='icon.ico')  # 如果有图标可放开
 
-MainPage(root)
+MainPage(root, start_time=start_time)
+# 本次合并交易表时部分记录的编号发生变化，写入日志并提示用户
+if 9 in applied_migrations:
+    id_notes = migrate.id_shift_notes(db.get_connection())
+    if id_notes:
+        logger.info("合并交易表后记录编号变更：%s" % "；".join(id_notes))
+        mBox.showinfo("记录编号变更", "各类交易已合并保存，为避免重复，以下记录的编号发生了变化：\n\n%s\n\n"
+                      "按编号定位旧记录时请使用新编号。" % "\n".join(id_notes))
 root.mainloop()
+# 退出时关闭所有数据库连接
+from core import db
+db.close_all()
 
 
 
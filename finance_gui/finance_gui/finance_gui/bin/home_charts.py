@@ -0,0 +1,191 @@
+# 用于主页的本月分类占比饼图（支出 / 收入）
+# 只依赖 ChartSlot、按月汇总表和明细索引，不需要统计页面：StatisticsFrame 在第一次切换到统计图表页时才创建
+# 分类明细查询、悬停提示文字和明细窗口由统计页面共用
+
+import calendar
+import tkinter as tk
+from tkinter import messagebox
+from matplotlib.backend_bases import MouseButton
+import ttkbootstrap as tb
+from core import db
+from core import analytics
+from core import monthly
+from core import categories
+from bin.chart_hover import BlitTooltip, PieHitTester
+from bin.chart_slot import ChartSlot
+
+
+def month_dates(year, month):
+    """某月的首日和末日，如 ('2025-01-01', '2025-01-31')"""
+    _, last_day = calendar.monthrange(year, month)
+    return f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+
+
+def category_records(conn, table, start_date, end_date, category_id, level=None):
+    """日期区间内某个分类（按分类 id，None 为未分类）的详细记录，level 为该分类所在统计的汇总层级"""
+    where, params = categories.group_condition(monthly.KIND_CATEGORY_TABLE[table], categories.leaf_sql("p"),
+                                               category_id, level)
+    query = """
+        SELECT p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money, p.create_time
+        FROM %s p
+        WHERE p.note_date BETWEEN ? AND ?
+        AND p.is_delete = 0
+        AND %s
+        ORDER BY p.note_date DESC
+    """ % (table, where)
+    return conn.execute(query, (start_date, end_date) + params).fetchall()
+
+
+def format_detail_tooltip(header, entry, empty_text="暂无详细记录", max_display=5):
+    """根据明细索引中的记录生成悬停提示文本"""
+    tooltip_text = header
+    if entry and entry.records:
+        for record in entry.records[:max_display]:
+            note_date = record[1]
+            title = record[2]
+            money = record[4]
+            parts = str(note_date).split('-')
+            short_date = f"{parts[1]}月{parts[2]}日" if len(parts) >= 3 else note_date
+            tooltip_text += f"{short_date} {title} {money}元\n"
+        if entry.count > max_display:
+            tooltip_text += f"...等{entry.count}条记录"
+    else:
+        tooltip_text += empty_text
+    return tooltip_text
+
+
+def show_category_details(parent, year, month, category_name, details):
+    """弹窗显示某月某分类的详细账目 details（category_records 的结果）"""
+    if not details:
+        messagebox.showinfo("无数据", f"{category_name}分类下暂无详细记录")
+        return
+
+    # 创建新窗口显示详情
+    detail_window = tk.Toplevel(parent)
+    detail_window.title(f"{year}年{month}月 - {category_name}分类详细账目")
+    detail_window.geometry("800x500")
+
+    # 创建Treeview控件显示详细记录
+    columns = ("id", "日期", "标题", "备注", "金额", "创建时间")
+    tree = tb.Treeview(detail_window, columns=columns, show="headings")
+
+    # 设置列宽和标题
+    tree.column("id", width=50, anchor="center")
+    tree.column("日期", width=100, anchor="center")
+    tree.column("标题", width=200, anchor="w")
+    tree.column("备注", width=250, anchor="w")
+    tree.column("金额", width=100, anchor="e")
+    tree.column("创建时间", width=200, anchor="center")
+
+    for col in columns:
+        tree.heading(col, text=col)
+
+    # 添加数据行
+    total_amount = 0
+    for row in details:
+        tree.insert("", "end", values=row)
+        total_amount += row[4]  # 金额在第5个位置（索引4）
+
+    # 添加滚动条
+    scrollbar = tb.Scrollbar(detail_window, orient="vertical", command=tree.yview)
+    tree.configure(yscroll=scrollbar.set)
+    scrollbar.pack(side="right", fill="y")
+    tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+    # 添加总计信息
+    total_frame = tb.Frame(detail_window)
+    total_frame.pack(fill="x", padx=10, pady=10, anchor="e")
+    tb.Label(total_frame, text=f"总计: {total_amount:.2f} 元", font=("SimHei", 12, "bold")).pack()
+
+    # 添加关闭按钮
+    button_frame = tb.Frame(detail_window)
+    button_frame.pack(fill="x", padx=10, pady=10, anchor="center")
+    tb.Button(button_frame, text="关闭", command=detail_window.destroy).pack(pady=5)
+
+
+class HomePie(object):
+    """主页的一个分类占比环形图，始终复用同一个画布
+    pie = HomePie(parent, "payments", "支出", clickable=True)
+    pie.render(year, month)
+    """
+
+    def __init__(self, parent, table, name, level=None, label="category", clickable=False):
+        self.parent = parent
+        self.table = table
+        self.name = name  # 支出 或 收入
+        self.level = level  # 分类汇总层级（见 monthly.category_totals）
+        self.label = label  # 悬停明细的分组方式（见 analytics.get_detail_index）
+        self.clickable = clickable  # 点击扇形时弹出分类明细
+        self.slot = ChartSlot(parent, figsize=(3.2, 3.2), pack_options=dict(padx=2, pady=2))
+
+    def render(self, year, month):
+        """绘制 year 年 month 月的分类占比，无数据时显示提示"""
+        conn = db.get_connection()
+        year_month = f"{year}-{month:02d}"
+        data = monthly.category_totals(conn, self.table, year_month, year_month, self.level)
+        if not data:
+            # 无数据时释放画布，显示占位提示
+            self.slot.release()
+            self.slot.clear_placeholder()
+            tb.Label(self.parent, text=f"{year}年{month}月暂无{self.name}数据", anchor="center").pack(
+                fill=tb.BOTH, expand=True, padx=10, pady=10)
+            return None
+
+        category_ids = [row[0] for row in data]
+        category_names = [row[1] for row in data]
+        amounts = [row[2] for row in data]
+
+        fig, ax = self.slot.begin("pie")
+        total = sum(amounts)
+
+        def autopct_fmt(pct):
+            val = pct * total / 100.0
+            return f"{pct:.1f}%\n{val:.0f}"
+
+        wedges, texts, autotexts = ax.pie(
+            amounts,
+            labels=category_names,
+            autopct=autopct_fmt,
+            startangle=90,
+            pctdistance=0.75,
+            textprops=dict(color="black", fontsize=9),
+            wedgeprops=dict(width=0.45)  # 环形更清爽
+        )
+        ax.set_title(f"{year}年{month}月{self.name}分类占比", fontsize=12)
+        ax.axis("equal")
+        fig.tight_layout()
+
+        # 鼠标悬停提示框（与统计页一致的样式）
+        tooltip = ax.annotate('', xy=(0.5, 0.5), xytext=(0.5, 0.5),
+                              bbox=dict(boxstyle="round,pad=0.3", fc="white", ec="gray", alpha=0.85),
+                              arrowprops=dict(arrowstyle="->"), va="center", ha="center", fontsize=9)
+        tooltip.set_visible(False)
+
+        canvas = self.slot.show()
+
+        # 明细索引在绘图时一次加载，悬停时只在内存中查找（上一次绑定的事件已在 slot.begin 中解除）
+        start_date, end_date = month_dates(year, month)
+        detail_index = analytics.get_detail_index(conn, self.table, start_date, end_date, self.label)
+        hover = self.slot.hover = BlitTooltip(canvas, tooltip)
+        pie = PieHitTester(wedges)
+
+        def on_hover(event):
+            i = pie.hit(event)
+            if i is None:
+                hover.hide()
+                return
+            text = format_detail_tooltip(f"{category_names[i]}\n", detail_index.get(category_ids[i]))
+            hover.show(text, (event.xdata, event.ydata), pie.wedges[i])
+
+        def on_click(event):
+            if event.button != MouseButton.LEFT:
+                return
+            i = pie.hit(event)
+            if i is not None:
+                details = category_records(conn, self.table, start_date, end_date, category_ids[i], self.level)
+                show_category_details(self.parent, year, month, category_names[i], details)
+
+        hover.connect(on_hover)
+        if self.clickable:
+            self.slot.connect('button_press_event', on_click)
+        return canvas
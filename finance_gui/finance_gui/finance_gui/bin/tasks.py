@@ -0,0 +1,144 @@
+# 用于把数据库查询放到后台线程执行
+# 每个任务从连接池借用连接，结果放入队列，由界面线程定时取出后显示；
+# 新任务会使旧任务过期：旧任务正在执行的查询被 interrupt() 中断，已完成的结果直接丢弃
+
+import queue
+import threading
+from tkinter import messagebox
+from core import db
+
+
+class TaskCancelled(Exception):
+    """后台任务已被新的请求取代"""
+
+
+class TaskScheduler(object):
+    """后台任务调度，每个页面一个
+    数据查询在后台线程中执行（使用连接池中的连接），结果通过 after() 交回界面线程显示；
+    提交新任务时取消尚未完成的旧任务，并中断其正在执行的查询
+    status_label 用于显示进度，可以为 None
+    """
+    POLL_INTERVAL = 30  # 界面线程检查后台结果的间隔（毫秒）
+
+    def __init__(self, widget, status_label=None):
+        self.widget = widget
+        self.status_label = status_label
+        self.generation = 0  # 最新任务的编号，编号较小的任务均已过期
+        self.lock = threading.Lock()
+        self.results = queue.Queue()  # 后台线程 -> 界面线程：(编号, 类型, 内容)
+        self.conns = {}  # 正在执行的任务使用的连接 {编号: 连接}
+        self.active = 0  # 尚未结束的后台线程数
+        self.polling = False
+        self.local = threading.local()
+
+    def submit(self, fetch, render, *args, on_error=None):
+        """提交任务：fetch(progress, *args) 在后台线程执行，返回值交给 render(data) 在界面线程执行
+        on_error(error) 在界面线程处理 fetch 抛出的异常，为 None 时弹窗提示"""
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.active += 1
+            self._interrupt_stale()
+        threading.Thread(target=self._run, args=(generation, fetch, render, args, on_error), daemon=True).start()
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.POLL_INTERVAL, self._poll)
+
+    def cancel(self):
+        """取消所有未完成的任务"""
+        with self.lock:
+            self.generation += 1
+            self._interrupt_stale()
+
+    def set_status(self, text):
+        if self.status_label is not None:
+            self.status_label.config(text=text)
+
+    def connection(self):
+        """当前后台线程借用的连接，界面线程中为 None"""
+        return getattr(self.local, "conn", None)
+
+    def _interrupt_stale(self):
+        for generation, conn in self.conns.items():
+            if generation != self.generation:
+                conn.interrupt()  # 中断正在执行的查询
+
+    def _run(self, generation, fetch, render, args, on_error=None):
+        def progress(text):
+            """报告进度，任务已过期时抛出 TaskCancelled 结束任务"""
+            if generation != self.generation:
+                raise TaskCancelled()
+            self.results.put((generation, "progress", text))
+
+        try:
+            with db.worker_connection() as conn:
+                with self.lock:
+                    if generation != self.generation:
+                        raise TaskCancelled()
+                    self.conns[generation] = conn
+                self.local.conn = conn
+                try:
+                    data = fetch(progress, *args)
+                finally:
+                    self.local.conn = None
+                    with self.lock:
+                        self.conns.pop(generation, None)
+            if generation != self.generation:
+                raise TaskCancelled()
+            self.results.put((generation, "done", (render, data)))
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            if generation == self.generation:
+                self.results.put((generation, "error", (on_error, e)))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def _poll(self):
+        """界面线程：处理后台线程交回的进度与结果，过期任务的结果直接丢弃
+        显示结果出错时同样提示错误，并且总会重新安排检查或清除 polling，之后提交的任务仍能显示"""
+        if not self.widget.winfo_exists():
+            self.polling = False
+            return
+        try:
+            while True:
+                try:
+                    generation, kind, payload = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if generation != self.generation:
+                    continue
+                if kind == "progress":
+                    self.set_status(payload)
+                elif kind == "done":
+                    render, data = payload
+                    try:
+                        render(data)
+                    except Exception as e:
+                        self.report_error("显示错误", "显示结果失败", e)
+                else:
+                    on_error, error = payload
+                    if on_error is None:
+                        self.report_error("查询错误", "数据查询失败", error)
+                        continue
+                    try:
+                        on_error(error)
+                    except Exception as e:
+                        self.report_error("显示错误", "显示错误信息失败", e)
+        finally:
+            with self.lock:
+                busy = self.active > 0
+            if busy or not self.results.empty():
+                self.widget.after(self.POLL_INTERVAL, self._poll)
+            else:
+                self.polling = False
+
+    def report_error(self, title, text, error):
+        """界面线程：提示后台任务的错误"""
+        print(f"后台任务{title}: {error}")
+        try:
+            messagebox.showerror(title, f"{text}: {error}")
+        except Exception:
+            pass
+        self.set_status("查询失败")
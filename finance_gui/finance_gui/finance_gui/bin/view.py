@@ -1,6 +1,5 @@
 import os
 import sys
-import sqlite3
 import time
 import traceback
 import tkinter as tk
@@ -13,18 +12,58 @@ import json
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(base_dir)
 from conf import settings
-from core.Mytools import changeStrToDate
+from core.Mytools import changeStrToDate, to_fen
 from core import excel
+from core import importer
+from core import exporter
+from core import monthly
+from core import balances
+from core import loans
+from core import search
+from core import dims
+from core.query import LedgerQuery
+from core import db
 from core.logger import logger
+from core.summary import LedgerSummary, kind_totals
+from bin.virtual_list import VirtualList
+from bin.tasks import TaskScheduler
 
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 
-"""这是修改的"""
-from bin.StatisticsFrame import StatisticsFrame
-"""修改结束"""
+SEARCH_DELAY = 300  # 搜索框停止输入多久后开始搜索（毫秒）
+
+# 各数据表变化时在顶层窗口上触发的虚拟事件，由主页面的刷新协调器决定哪些页面需要刷新
+CHANGE_EVENTS = {
+    "payments": "<<PaymentsChanged>>",
+    "incomes": "<<IncomesChanged>>",
+    "borrows": "<<BorrowsChanged>>",
+    "lends": "<<LendsChanged>>",
+    "repayments": "<<RepaymentsChanged>>",
+    "notes": "<<NotesChanged>>",
+    "dimensions": "<<DimensionsChanged>>",  # 账户、交易方、分类、成员
+}
+
+
+def notify_changed(widget, *tables):
+    """数据表写入提交后，通知其他页面该表数据已变化"""
+    try:
+        toplevel = widget.winfo_toplevel()
+        for table in tables:
+            toplevel.event_generate(CHANGE_EVENTS[table])
+    except Exception as e:
+        print("通知数据变化失败:%s" % e)
+
 class BaseFrame(tb.LabelFrame):
     """所有功能模块的父类"""
+    # 记录列表的列：(视图字段, 标题, 宽度)
+    list_columns = [("id", "ID", 40), ("note_date", "日期", 80), ("title", "事项", 110), ("remark", "备注", 110),
+                    ("money", "金额", 60), ("account", "账户/支付方式", 80), ("seller", "交易方", 80)]
+    # 交易分析汇总的分组字段及标题
+    summary_fields = ["account", "seller"]
+    summary_titles = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计：", "category_p": "按一级分类 统计：",
+                      "category_c": "按二级分类 统计：", "member": "按使用者 统计："}
+
     def __init__(self, master=None):
         tb.LabelFrame.__init__(self, master)
         # 创建聊天记录查看页面
@@ -53,9 +92,13 @@ class BaseFrame(tb.LabelFrame):
         self.order_option.set("asc")
         self.entry_flag = tb.BooleanVar()  # 刷新输入区  True 每次提交完都会将输入区内容清空， 如果要重复输入重复日期 就很不方便
         self.entry_flag.set(True)
+        self.count_text = "当前共有 %s 条记账记录！"  # 记录数提示
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()  # 所有页面共用界面线程的长连接
         self.c = self.conn.cursor()
+        self.tasks = TaskScheduler(self.root)  # 搜索在后台线程执行
+        self.search_after = None  # 等待执行的输入即搜索
+        self.counting = None  # 正在后台统计的搜索条件 (where, params)，统计完成前有写入时重新统计
         # self.createPage()
 
     def createPage(self):
@@ -101,9 +144,11 @@ class BaseFrame(tb.LabelFrame):
         self.label_notes_info = tb.Label(self.f_content)  # 所有记录总数信息
         self.label_notes_info.grid(row=0, column=0, columnspan=2, pady=5)
         # 记录显示区
-        # 详情
-        self.txt_note = ScrolledText(self.f_content, wrap=tb.WORD, width=100, height=32)
-        self.txt_note.grid(row=1, column=0)
+        # 详情：只加载可见附近几页记录，双击记录定位修改
+        self.note_list = VirtualList(self.f_content, self.list_columns, height=30)
+        self.note_list.grid(row=1, column=0, sticky=tb.NSEW)
+        self.note_list.bind_select(self.selectNote)
+        self.summary = LedgerSummary(self.conn, self.db_v, self.summary_fields)
         # 总体分析
         self.info_note = ScrolledText(self.f_content, wrap=tb.WORD, width=35, height=32)
         self.info_note.grid(row=1, column=1)
@@ -128,6 +173,7 @@ class BaseFrame(tb.LabelFrame):
 
         tb.Label(self.f_bottom, text="搜索内容:").grid(row=1, column=0)
         tb.Entry(self.f_bottom, textvariable=self.search_key, width=50).grid(row=1, column=1, columnspan=4)
+        self.search_key.trace_add("write", self.onSearchKeyChanged)  # 输入即搜索
         tb.Button(self.f_bottom, text="搜索", command=self.searchNotes,bootstyle="info-outline").grid(row=1, column=5)
         tb.Button(self.f_bottom, text="查看所有", command=self.showAll,bootstyle="primary-outline").grid(row=1, column=6)
         tb.Label(self.f_bottom, text="定位编号:").grid(row=2, column=0)
@@ -147,15 +193,20 @@ class BaseFrame(tb.LabelFrame):
     def ensure_income_other_options(self):
         """确保收入模块下拉框中存在“其他”（账户/支付方式、收入分类）"""
         try:
+            added = []  # 提交后并入维度缓存
             # 账户/支付方式：添加“其他”
-            self.c.execute("select 1 from accounts where title=?", ("其他",))
-            if not self.c.fetchone():
+            if dims.cache.table(self.conn, "accounts").id_of("其他") is None:
                 self.c.execute("insert into accounts (title) values (?)", ("其他",))
+                added.append(("accounts", self.c.lastrowid, "其他"))
             # 收入分类（一级分类）：添加“其他”
-            self.c.execute("select 1 from income_categorys where title=? and pid is null", ("其他",))
-            if not self.c.fetchone():
+            if dims.cache.table(self.conn, "income_categorys").child_id("其他", None) is None:
                 self.c.execute("insert into income_categorys (title) values (?)", ("其他",))
+                added.append(("income_categorys", self.c.lastrowid, "其他"))
             self.conn.commit()
+            for item in added:
+                dims.cache.add(*item)
+            if added:
+                notify_changed(self.root, "dimensions")
         except Exception:
             try:
                 self.conn.rollback()
@@ -163,19 +214,13 @@ class BaseFrame(tb.LabelFrame):
                 pass
 
     def get_combox_values_from_db(self, table_name):
-        """用于从数据库获取下拉框的值"""
-        self.c.execute("select title from %s" % table_name)
-        result = []
-        # [('日常',), ('交通',), ('住房',)]
-        for item in self.c.fetchall():
-            result.append(item[0])
-        return tuple(result)
+        """用于获取下拉框的值，从维度缓存读取"""
+        return dims.cache.table(self.conn, table_name).titles()
 
     def set_combox_values(self):
         # 用于设置下拉框的values
         accounts = self.get_combox_values_from_db("accounts")
         sellers = self.get_combox_values_from_db("sellers")
-        members = self.get_combox_values_from_db("members")
         self.chosen_account['values'] = accounts
         self.chosen_seller['values'] = sellers
         comboxs = [self.chosen_account, self.chosen_seller]
@@ -183,6 +228,10 @@ class BaseFrame(tb.LabelFrame):
             item.current(0)  # 设置初始显示值，值为元组['values']的下标
             item.config(state='readonly')  # 设为只读模式
 
+    def extra_values(self):
+        """子类额外保存的列 {列名: 值}，如还款所还的借款"""
+        return {}
+
     def addNote(self):
         """新增/修改记账记录"""
         # list = [self.title, self.note_date, self.remark, self.money, self.account, self.seller]
@@ -202,108 +251,133 @@ class BaseFrame(tb.LabelFrame):
         except Exception:
             mBox.showerror('数据格式错误', '金额输入数据格式错误！')
             return
-        self.c.execute("select id from accounts where title=?", (self.account.get(),))
-        account_id = self.c.fetchall()[0][0]
-        self.c.execute("select id from sellers where title=?", (self.seller.get(),))
-        seller_id = self.c.fetchall()[0][0]
+        account_id = dims.cache.table(self.conn, "accounts").id_of(self.account.get())
+        seller_id = dims.cache.table(self.conn, "sellers").id_of(self.seller.get())
+        old_row = self.note_list.fetch(self.current_id)  # 修改前的记录，用于增量更新列表和汇总
+        extra = self.extra_values()
+        columns = ["note_date", "title", "remark", "money_fen", "account_id", "seller_id"] + list(extra)
+        values = [note_date, title, remark, to_fen(money), account_id, seller_id] + list(extra.values())
         if not self.current_id:
             # 新增
-            sql = "insert into %s(note_date, title, remark, money, account_id, seller_id, create_time) values(?,?,?,?,?,?,?)" % self.db_table
-            self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id, time_now))
+            sql = "insert into ledger(kind, %s, create_time) values(?,%s,?)" % (",".join(columns), ",".join("?" * len(columns)))
+            self.c.execute(sql, [self.db_table] + values + [time_now])
         else:
             # 修改
-            sql = "update %s set note_date=?,title=?,remark=?,money=?,account_id=?,seller_id=?,modify_time=? where id=?" % self.db_table
-            self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id, time_now, self.current_id))
+            sql = "update ledger set %s,modify_time=? where id=?" % ",".join("%s=?" % column for column in columns)
+            self.c.execute(sql, values + [time_now, self.current_id])
         self.conn.commit()
+        row_id = self.current_id or self.c.lastrowid
         self.clearMsg()
-        self.showAll()
-
- # 通知预算页面数据已变化，触发刷新
-        try:
-            toplevel = self.root.winfo_toplevel()
-            toplevel.event_generate('<<PaymentsChanged>>')
-        except Exception:
-            pass
-        # 通知预算页面数据已变化，触发刷新
-        try:
-            toplevel = self.root.winfo_toplevel()
-            toplevel.event_generate('<<PaymentsChanged>>')
-        except Exception:
-            pass
-
+        self.applyChange(row_id, old_row)
+        notify_changed(self.root, self.db_table)
 
     def showAll(self):
         """展示所有交易记录"""
-        # print(self.db_v, self.db_table)
-        # 显示交易分析汇总信息
-        order_mode = self.order_mode.get()  # 根据什么排序
-        order_key = self.order_option.get()  # 排序
-        self.c.execute("select count(money),sum(money),avg(money),max(money),min(money) from %s order by %s %s;" % (self.db_v, order_mode, order_key))
-        result = self.c.fetchone()  # 总信息
-        # print(result)
-        self.info_note.delete("0.0", END)
-        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % result)
-        show_dict = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计："}
-        for item in ["account", "seller"]:
-            sql = "select %s,count(money),sum(money),avg(money),max(money),min(money) from %s group by %s;" % (item, self.db_v, item)
-            # print(sql)
-            self.c.execute(sql)
-            results = self.c.fetchall()
-            self.info_note.insert(tb.INSERT, "\n%s\n" % show_dict[item])
-            for result in results:
-                self.info_note.insert(tb.INSERT, "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result)
-        # 显示交易详情
-        self.txt_note.delete("0.0", END)  # 清空显示区
-        sql = "select id,note_date,title,remark,money,account,seller from %s order by %s %s;" % (self.db_v, order_mode, order_key)
-        self.c.execute(sql)
-        result = self.c.fetchall()
-        for item in result:
-            msg = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s\n\n" % item
-            self.txt_note.insert(tb.INSERT, msg)
-        self.clearMsg()
-        self.label_notes_info.config(text="当前共有 %s 条记账记录！" % len(result))  # 显示记账记录数
+        self.count_text = "当前共有 %s 条记账记录！"
+        self.showRecords()
+
+    def onSearchKeyChanged(self, *args):
+        """搜索框内容变化后等待 SEARCH_DELAY 毫秒，期间继续输入则重新计时，只搜索最后一次输入"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY, self.searchNotes)
+
+    def cancelSearch(self):
+        """取消等待执行和正在后台执行的搜索"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+            self.search_after = None
+        self.tasks.cancel()
+        self.counting = None
 
     def searchNotes(self):
-        """用于搜索便签"""
+        """用于搜索便签
+        查询在后台线程执行：先显示第一页记录，再显示记录数和汇总信息；新的搜索会中断尚未完成的旧搜索"""
+        self.cancelSearch()
         # 获取搜索关键字
         search_key = self.search_key.get()  # 搜索词
         search_mode = self.search_mode.get()  # 搜索模式  “content” 事项和备注 “note_date” 时间
         order_mode = self.order_mode.get()  # 根据什么排序
         order_key = self.order_option.get()  # 排序
-        # 显示交易详情
-        self.txt_note.delete("0.0", END)
-        self.info_note.delete("0.0", END)
-        # 获取交易分析汇总信息
-        sql = """select count(money),sum(money),avg(money),max(money),min(money) from %s
-                where %s like ? order by %s %s;""" % (self.db_v, search_mode, order_mode, order_key)
-        self.c.execute(sql, ("%%%s%%" % search_key,))
-        result = self.c.fetchone()  # 总信息
-        self.info_note.delete("0.0", END)
-        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % result)
-        show_dict = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计："}
-        for item in ["account", "seller"]:
-            sql = """select %s,count(money),sum(money),avg(money),max(money),min(money) from %s
-              where %s like ? group by %s""" % (item, self.db_v, search_mode, item)
-            self.c.execute(sql, ("%%%s%%" % search_key,))
-            results = self.c.fetchall()
-            self.info_note.insert(tb.INSERT, "\n%s\n" % show_dict[item])
-            for result in results:
-                msg = "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result
-                self.info_note.insert(tb.INSERT, msg)
-        # 获取交易详情
-        sql = """select id,note_date,title,remark,money,account,seller
-                from %s where %s like ? order by %s %s;""" % (self.db_v, search_mode, order_mode, order_key)
-        self.c.execute(sql, ("%%%s%%" % search_key,))
-        # 显示交易详情信息
-        result = self.c.fetchall()
+        if search_key:
+            self.count_text = "共搜索到符合条件的 %s 条记账记录！"
+        else:
+            self.count_text = "当前共有 %s 条记账记录！"  # 清空搜索框时显示所有记录
+        self.label_notes_info.config(text="正在搜索...")
+        self.tasks.submit(self.fetchPage, self.showPage, search_mode, search_key, order_mode, order_key)
+
+    def fetchPage(self, progress, search_mode, search_key, order_mode, order_key):
+        """后台线程：查询第一页记录"""
+        conn = self.tasks.connection()
+        where, params = search.keyword_condition(conn, self.db_v, search_mode, search_key) if search_key else ("", ())
+        pager = self.note_list.make_pager(conn, self.db_v, order_mode, order_key, where, params)
+        return pager, pager.first()
+
+    def showPage(self, data):
+        """界面线程：显示第一页记录，再到后台统计记录数和汇总信息"""
+        pager, rows = data
+        self.note_list.show(pager, rows, len(rows), self.conn)
+        self.clearMsg()
+        self.label_notes_info.config(text="正在统计...")
+        self.counting = (pager.where, pager.params)
+        self.tasks.submit(self.fetchSummary, self.showSearchSummary, *self.counting)
+
+    def fetchSummary(self, progress, where, params):
+        """后台线程：统计记录数和汇总信息"""
+        conn = self.tasks.connection()
+        total = self.note_list.make_pager(conn, self.db_v, where=where, params=params).count()
+        summary = LedgerSummary(conn, self.db_v, self.summary_fields)
+        summary.load(where, params)
+        summary.conn = self.conn  # 之后的增量更新在界面线程执行
+        return total, summary
+
+    def showSearchSummary(self, data):
+        """界面线程：显示记录数和汇总信息"""
+        self.counting = None
+        self.note_list.total, self.summary = data
+        self.showSummary()
+        self.showCount()
+
+    def showRecords(self, where="", params=()):
+        """按条件查询并显示交易分析汇总信息和交易详情"""
+        self.cancelSearch()
+        order_mode = self.order_mode.get()  # 根据什么排序
+        order_key = self.order_option.get()  # 排序
+        self.summary.load(where, params)
+        self.showSummary()
+        self.note_list.load(self.conn, self.db_v, order_mode, order_key, where, params)
         self.clearMsg()
-        if not result:  # 没有搜索到结果
+        self.showCount()
+
+    def showSummary(self):
+        """显示交易分析汇总信息"""
+        self.info_note.delete("0.0", END)
+        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % self.summary.overall())
+        for item in self.summary_fields:
+            self.info_note.insert(tb.INSERT, "\n%s\n" % self.summary_titles[item])
+            for result in self.summary.groups(item):
+                self.info_note.insert(tb.INSERT, "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result)
+
+    def showCount(self):
+        """显示记录数"""
+        if not self.note_list.total and self.note_list.pager.where:  # 没有搜索到结果
             self.label_notes_info.config(text="未搜索到符合条件的记账记录！")
         else:
-            self.label_notes_info.config(text="共搜索到符合条件的 %s 条记账记录！" % len(result))  # 显示找到多少条
-            for item in result:
-                msg = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s\n\n" % item
-                self.txt_note.insert(tb.INSERT, msg)
+            self.label_notes_info.config(text=self.count_text % self.note_list.total)
+
+    def applyChange(self, row_id, old_row=None):
+        """新增/修改/删除一条记录后，只更新列表中的这一行和汇总统计，不重新查询全部记录
+        old_row 为写入前从列表取得的记录，新增时为 None
+        记录数和汇总仍在后台统计时，统计可能读到写入前的数据，重新提交统计（旧的统计随之作废）"""
+        new_row = self.note_list.patch(row_id, old_row)
+        if self.counting is not None:
+            self.label_notes_info.config(text="正在统计...")
+            self.tasks.submit(self.fetchSummary, self.showSearchSummary, *self.counting)
+            return
+        columns = self.note_list.columns
+        self.summary.apply(old_row and dict(zip(columns, old_row)), new_row and dict(zip(columns, new_row)))
+        self.showSummary()
+        self.showCount()
 
     def locateNote(self):
         """用于通过id定位便签并将其填充到对应控件内"""
@@ -323,33 +397,41 @@ class BaseFrame(tb.LabelFrame):
             self.account.set(note_item[5])
             self.seller.set(note_item[6])
             self.buttun_create_note.config(text="修改")
-            self.txt_note.delete("0.0", END)
+            self.note_list.locate(select_id)  # 在列表中选中该记录
             self.info_note.delete("0.0", END)
             self.label_notes_info.config(text="正在修改id为%s的记账记录！" % select_id)
         else:
             self.clearMsg()
-            self.txt_note.delete("0.0", END)
+            self.note_list.clear_selection()
             self.info_note.delete("0.0", END)
             self.buttun_create_note.config(text="创建")
             self.label_notes_info.config(text="数据库中未找到id为:%s的记账记录！" % select_id)
 
+    def selectNote(self, select_id):
+        """双击列表中的记录时定位该记录"""
+        self.select_id.set(select_id)
+        self.locateNote()
+
     def cancelUpdate(self):
         """用于取消修改便签内容操作"""
         # 还原标签状态为新增便签
         self.clearMsg()
-        self.txt_note.delete("0.0", END)
+        self.note_list.clear_selection()
         self.buttun_create_note.config(text="创建")
 
     def delNote(self):
         """用于删除记账记录"""
+        row_id = self.current_id
+        old_row = self.note_list.fetch(row_id)
         # 只进行逻辑删除
-        sql = "update %s set is_delete=1 where id=?" % self.db_table
-        self.c.execute(sql, (self.current_id,))
+        sql = "update ledger set is_delete=1 where id=?"
+        self.c.execute(sql, (row_id,))
         self.conn.commit()
-        print("删除id:%s 的记账记录！" % self.current_id)
+        print("删除id:%s 的记账记录！" % row_id)
         self.clearMsg()
-        # 刷新结果
-        self.showAll()
+        # 只从列表和汇总中移除这条记录
+        self.applyChange(row_id, old_row)
+        notify_changed(self.root, self.db_table)
 
     def clearMsg(self):
         """用于将显示区的控件信息恢复最初状态"""
@@ -367,12 +449,15 @@ class BaseFrame(tb.LabelFrame):
 
 class BaseFrameFull(BaseFrame):
     """支出和收入功能模块的父类"""
+    list_columns = BaseFrame.list_columns + [("category_p", "一级分类", 60), ("category_c", "二级分类", 60),
+                                             ("member", "使用者", 50)]
+    summary_fields = ["account", "seller", "category_p", "category_c", "member"]
 
     def createPage(self):
         super().createPage()
-        # 在收入模块加载前，确保存在“其他”选项（账户/支付方式、收入分类）
+        # 确保存在“其他”选项（账户/支付方式、收入分类）；窗口建好后执行，新增的选项才能通知到其他页面的下拉框
         if self.db_table == "incomes":
-            self.ensure_income_other_options()
+            self.root.after_idle(self.ensure_income_other_options)
         tb.Label(self.f_title, text="交易对象").grid(row=2, column=2)  # 格式：'%Y-%m-%d %H:%M:%S'
         tb.Label(self.f_title, text="分类").grid(row=2, column=3, columnspan=2)
         tb.Label(self.f_title, text="成员/使用者").grid(row=2, column=5)
@@ -400,15 +485,6 @@ class BaseFrameFull(BaseFrame):
         self.set_combox_values()
         self.showAll()
 
-    def get_combox_values_from_db(self, table_name):
-        """用于从数据库获取下拉框的值"""
-        self.c.execute("select title from %s" % table_name)
-        result = []
-        # [('日常',), ('交通',), ('住房',)]
-        for item in self.c.fetchall():
-            result.append(item[0])
-        return tuple(result)
-
     def set_combox_values(self):
         # 用于设置下拉框的values
         accounts = self.get_combox_values_from_db("accounts")
@@ -418,23 +494,13 @@ class BaseFrameFull(BaseFrame):
             category_table = "pay_categorys"
         else:
             category_table = "income_categorys"
-        self.c.execute("select title from %s where pid is null" % category_table)
-        categorys_p = []
-        result = self.c.fetchall()
-        if result:
-            for item in result:
-                categorys_p.append(item[0])
-        categorys_p = tuple(categorys_p)
+        categorys = dims.cache.table(self.conn, category_table)
+        categorys_p = categorys.child_titles(None)  # 一级分类
         # print("categorys_p:", categorys_p)
         if categorys_p:
-            self.c.execute("select id from %s where title=?" % category_table, (categorys_p[0],))
-            pid = self.c.fetchall()[0][0]
+            pid = categorys.id_of(categorys_p[0])
             # print("pid:", pid)
-            self.c.execute("select title from %s where pid=?" % category_table, (pid,))
-            categorys_c = []
-            for item in self.c.fetchall():
-                categorys_c.append(item[0])
-            categorys_c = tuple(categorys_c)
+            categorys_c = categorys.child_titles(pid)
             if not categorys_c:
                 categorys_c = ("",)
         else:
@@ -462,14 +528,10 @@ class BaseFrameFull(BaseFrame):
         else:
             category_table = "income_categorys"
         if category_p:
-            self.c.execute("select id from %s where title=?" % category_table, (category_p,))
-            pid = self.c.fetchone()[0]
+            categorys = dims.cache.table(self.conn, category_table)
+            pid = categorys.id_of(category_p)
             logger.debug("pid: type:%s ,value:%s" % (type(pid), pid))
-            self.c.execute("select title from %s where pid is ?" % category_table, (pid,))
-            categorys_c = []
-            for item in self.c.fetchall():
-                categorys_c.append(item[0])
-            categorys_c = tuple(categorys_c)
+            categorys_c = categorys.child_titles(pid)
             if not categorys_c:
                 categorys_c = ("",)
         else:
@@ -498,117 +560,31 @@ class BaseFrameFull(BaseFrame):
         except Exception:
             mBox.showerror('数据格式错误', '金额输入数据格式错误！')
             return
-        self.c.execute("select id from accounts where title=?", (self.account.get(),))
-        account_id = self.c.fetchall()[0][0]
-        self.c.execute("select id from sellers where title=?", (self.seller.get(),))
-        temp = self.c.fetchall()
-        if temp:
-            seller_id = temp[0][0]
-        else:
-            seller_id = None
+        # 名称从维度缓存解析为 id，不查询数据库
+        account_id = dims.cache.table(self.conn, "accounts").id_of(self.account.get())
+        seller_id = dims.cache.table(self.conn, "sellers").id_of(self.seller.get())
         if self.db_table == "payments":
             category_table = "pay_categorys"
         else:
             category_table = "income_categorys"
-
-        self.c.execute("select id from %s where title=?" % category_table, (self.category_p.get(),))
-        category_pid = self.c.fetchall()[0][0]
-        self.c.execute("select id from %s where title=? and pid=?" % category_table, (self.category_c.get(), category_pid))
-        categorys_cid = self.c.fetchall()
-        if categorys_cid:
-            # 有内容
-            category_cid = categorys_cid[0][0]
-        else:
-            # 数据库中无
-            category_cid = None
-            # category_cid = 0
-        self.c.execute("select id from members where title=?", (self.member.get(),))
-        member_id = self.c.fetchall()[0][0]
+        categorys = dims.cache.table(self.conn, category_table)
+        category_pid = categorys.id_of(self.category_p.get())
+        category_cid = categorys.child_id(self.category_c.get(), category_pid)  # 没有二级分类时为 None
+        member_id = dims.cache.table(self.conn, "members").id_of(self.member.get())
+        old_row = self.note_list.fetch(self.current_id)  # 修改前的记录，用于增量更新列表和汇总
         if not self.current_id:
             # 新增
-            sql = "insert into %s(note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id, create_time) values(?,?,?,?,?,?,?,?,?,?)" % self.db_table
-            self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id, time_now))
+            sql = "insert into ledger(kind, note_date, title, remark, money_fen, account_id, seller_id, category_pid, category_cid, member_id, create_time) values(?,?,?,?,?,?,?,?,?,?,?)"
+            self.c.execute(sql, (self.db_table, note_date, title, remark, to_fen(money), account_id, seller_id, category_pid, category_cid, member_id, time_now))
         else:
             # 修改
-            sql = "update %s set note_date=?,title=?,remark=?,money=?,account_id=?,seller_id=?,category_pid=?,category_cid=?,member_id=?,modify_time=? where id=?" % self.db_table
-            self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id, time_now, self.current_id))
+            sql = "update ledger set note_date=?,title=?,remark=?,money_fen=?,account_id=?,seller_id=?,category_pid=?,category_cid=?,member_id=?,modify_time=? where id=?"
+            self.c.execute(sql, (note_date, title, remark, to_fen(money), account_id, seller_id, category_pid, category_cid, member_id, time_now, self.current_id))
         self.conn.commit()
+        row_id = self.current_id or self.c.lastrowid
         self.clearMsg()
-        self.showAll()
-
-    def showAll(self):
-        """展示所有交易记录"""
-        # print(self.db_v, self.db_table)
-        # 显示交易分析汇总信息
-        order_mode = self.order_mode.get()  # 根据什么排序
-        order_key = self.order_option.get()  # 排序
-        self.c.execute("select count(money),sum(money),avg(money),max(money),min(money) from %s order by %s %s;" % (self.db_v, order_mode, order_key))
-        result = self.c.fetchone()  # 总信息
-        # print(result)
-        self.info_note.delete("0.0", END)
-        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % result)
-        show_dict = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计：", "category_p": "按一级分类 统计：", "category_c": "按二级分类 统计：", "member": "按使用者 统计："}
-        for item in ["account", "seller", "category_p", "category_c", "member"]:
-            sql = "select %s,count(money),sum(money),avg(money),max(money),min(money) from %s group by %s;" % (item, self.db_v, item)
-            # print(sql)
-            self.c.execute(sql)
-            results = self.c.fetchall()
-            self.info_note.insert(tb.INSERT, "\n%s\n" % show_dict[item])
-            for result in results:
-                self.info_note.insert(tb.INSERT, "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result)
-        # 显示交易详情
-        self.txt_note.delete("0.0", END)  # 清空显示区
-        sql = "select id,note_date,title,remark,money,account,seller,category_p,category_c,member from %s order by %s %s;" % (self.db_v, order_mode, order_key)
-        self.c.execute(sql)
-        result = self.c.fetchall()
-        for item in result:
-            msg = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s, 一级分类:%s, 二级分类:%s, 使用者:%s\n\n" % item
-            self.txt_note.insert(tb.INSERT, msg)
-        self.clearMsg()
-        self.label_notes_info.config(text="当前共有 %s 条记账记录！" % len(result))  # 显示记账记录数
-
-    def searchNotes(self):
-        """用于搜索便签"""
-        # 获取搜索关键字
-        search_key = self.search_key.get()  # 搜索词
-        search_mode = self.search_mode.get()  # 搜索模式  “content” 事项和备注 “note_date” 时间
-        order_mode = self.order_mode.get()  # 根据什么排序
-        order_key = self.order_option.get()  # 排序
-        # 显示交易详情
-        self.txt_note.delete("0.0", END)
-        self.info_note.delete("0.0", END)
-        # 获取交易分析汇总信息
-        sql = """select count(money),sum(money),avg(money),max(money),min(money) from %s where %s like ? """ % (self.db_v, search_mode)
-        self.c.execute(sql, ("%%%s%%" % search_key,))
-        result = self.c.fetchone()  # 总信息
-        self.info_note.delete("0.0", END)
-        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % result)
-        show_dict = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计：", "category_p": "按一级分类 统计：",
-                     "category_c": "按二级分类 统计：", "member": "按使用者 统计："}
-        for item in ["account", "seller", "category_p", "category_c", "member"]:
-            sql = """select %s,count(money),sum(money),avg(money),max(money),min(money) from %s
-              where %s like ? group by %s""" % (item, self.db_v, search_mode, item)
-            self.c.execute(sql, ("%%%s%%" % search_key,))
-            results = self.c.fetchall()
-            self.info_note.insert(tb.INSERT, "\n%s\n" % show_dict[item])
-            for result in results:
-                msg = "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result
-                self.info_note.insert(tb.INSERT, msg)
-        # 获取交易详情
-        sql = """select id,note_date,title,remark,money,account,seller,category_p,category_c,member 
-                from %s where %s like ? order by %s %s;""" % (self.db_v, search_mode, order_mode, order_key)
-        logger.debug("搜索sql:%s " % sql)
-        self.c.execute(sql, ("%%%s%%" % search_key,))
-        # 显示交易详情信息
-        result = self.c.fetchall()
-        self.clearMsg()
-        if not result:  # 没有搜索到结果
-            self.label_notes_info.config(text="未搜索到符合条件的记账记录！")
-        else:
-            self.label_notes_info.config(text="共搜索到符合条件的 %s 条记账记录！" % len(result))  # 显示找到多少条
-            for item in result:
-                msg = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s, 一级分类:%s, 二级分类:%s, 使用者:%s\n\n" % item
-                self.txt_note.insert(tb.INSERT, msg)
+        self.applyChange(row_id, old_row)
+        notify_changed(self.root, self.db_table)
 
     def locateNote(self):
         """用于通过id定位便签并将其填充到对应控件内"""
@@ -633,12 +609,12 @@ class BaseFrameFull(BaseFrame):
             self.category_c.set(note_item[8])
             self.member.set(note_item[9])
             self.buttun_create_note.config(text="修改")
-            self.txt_note.delete("0.0", END)
+            self.note_list.locate(select_id)  # 在列表中选中该记录
             self.info_note.delete("0.0", END)
             self.label_notes_info.config(text="正在修改id为%s的记账记录！" % select_id)
         else:
             self.clearMsg()
-            self.txt_note.delete("0.0", END)
+            self.note_list.clear_selection()
             self.info_note.delete("0.0", END)
             self.buttun_create_note.config(text="创建")
             self.label_notes_info.config(text="数据库中未找到id为:%s的记账记录！" % select_id)
@@ -653,7 +629,7 @@ class IndexFrame(tb.LabelFrame):
         self.pwin = master  # 父容器对象引用，方便后面调用父容器实例方法
         self.root.grid()
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
         self.createPage()
         self.show_infos()
@@ -687,20 +663,80 @@ class IndexFrame(tb.LabelFrame):
     def show_infos(self, event=None):
         # 显示交易分析汇总信息
         # print("show_infos 函数运行，event:", event)
-        db_views = ["v_payments_info", "v_incomes_info", "v_borrows_info", "v_lends_info", "v_repayments_info"]
-        count = 0
-        # 显示交易汇总信息
-        for db_v in db_views:
-            self.c.execute("select count(money),sum(money),avg(money),max(money),min(money) from %s" % db_v)
-            result = self.c.fetchone()  # 总信息
+        # 显示交易汇总信息：各类交易在统一交易表上一次按类型分组统计
+        totals = kind_totals(self.conn)
+        for count, kind in enumerate(["payments", "incomes", "borrows", "lends", "repayments"]):
+            result = totals[kind]  # 总信息
             self.labels[count].config(text="共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result)
-            count += 1
         # 显示记录汇总信息
         self.c.execute("select id,note_date,title,remark,remark2 from v_notes_info;")
         result = self.c.fetchall()
         self.l_note.config(text="当前共有 %s 条记事记录！" % len(result))  # 显示记录数
 
 
+class BalanceFrame(tb.LabelFrame):
+    """首页账户余额：当前余额读取最近的月末快照加其后各月净额，并可设置账户期初余额"""
+    def __init__(self, master=None):
+        tb.LabelFrame.__init__(self, master)
+        self.root = tb.LabelFrame(master, text='账户余额')
+        self.pwin = master
+        self.root.grid()
+        self.conn = db.get_connection()
+        self.accounts = {}  # 账户名称 -> id
+        # 余额列表
+        self.list_frame = tb.Frame(self.root)
+        self.list_frame.grid(row=0, column=0, padx=10, pady=(10, 4), sticky=tb.W)
+        # 设置期初余额
+        edit_frame = tb.Frame(self.root)
+        edit_frame.grid(row=1, column=0, padx=10, pady=(4, 10), sticky=tb.W)
+        self.account = tb.StringVar()
+        self.chosen_account = tb.Combobox(edit_frame, width=14, textvariable=self.account, state="readonly")
+        self.chosen_account.grid(row=0, column=0, padx=2)
+        self.opening_input = tb.StringVar()
+        tb.Entry(edit_frame, textvariable=self.opening_input, width=12).grid(row=0, column=1, padx=2)
+        tb.Button(edit_frame, text="设置期初余额", command=self.set_opening,
+                  bootstyle="success-outline").grid(row=0, column=2, padx=2)
+        tb.Button(edit_frame, text="刷新", command=self.show_infos,
+                  bootstyle="success-outline").grid(row=0, column=3, padx=2)
+        self.show_infos()
+
+    def show_infos(self, event=None):
+        """显示各账户余额，只读取不写入（已结束月份的快照由 MainPage.checkpoint_balances 补建）"""
+        rows = balances.current_balances(self.conn)
+        for widget in self.list_frame.winfo_children():
+            widget.destroy()
+        for col, text in enumerate(["账户", "期初余额", "当前余额"]):
+            tb.Label(self.list_frame, text=text, width=14).grid(row=0, column=col, padx=2, pady=2)
+        for i, (account_id, title, opening_fen, balance_fen, snapshot_month) in enumerate(rows, 1):
+            tb.Label(self.list_frame, text=title, width=14).grid(row=i, column=0, padx=2)
+            tb.Label(self.list_frame, text="¥%.2f" % (opening_fen / 100), width=14).grid(row=i, column=1, padx=2)
+            tb.Label(self.list_frame, text="¥%.2f" % (balance_fen / 100), width=14,
+                     foreground="red" if balance_fen < 0 else None).grid(row=i, column=2, padx=2)
+        tb.Label(self.list_frame, text="合计", width=14).grid(row=len(rows) + 1, column=0, padx=2, pady=2)
+        tb.Label(self.list_frame, text="¥%.2f" % (sum(row[3] for row in rows) / 100),
+                 width=14).grid(row=len(rows) + 1, column=2, padx=2, pady=2)
+        self.accounts = {row[1]: row[0] for row in rows}
+        self.chosen_account['values'] = list(self.accounts)
+
+    def set_opening(self):
+        """设置所选账户的期初余额"""
+        account_id = self.accounts.get(self.account.get())
+        if account_id is None:
+            mBox.showwarning("提示", "请先选择账户！")
+            return
+        try:
+            opening_fen = to_fen(self.opening_input.get().strip())
+        except Exception:
+            opening_fen = None
+        if opening_fen is None:
+            mBox.showwarning("提示", "请输入有效的期初余额！")
+            return
+        balances.set_opening(self.conn, account_id, opening_fen)
+        logger.info("set opening balance of account %s to %s" % (account_id, opening_fen))
+        self.opening_input.set("")
+        self.show_infos()
+
+
 class PaymentFrame(BaseFrameFull):
     """支出记录"""
     def __init__(self, master=None):
@@ -741,15 +777,96 @@ class LendFrame(BaseFrame):
 
 
 class RepaymentFrame(BaseFrame):
-    """还款记录"""
+    """还款记录，可关联所还的借入或借出"""
     def __init__(self, master=None):
         super().__init__(master)
         self.root.config(text="还款记录")
         self.db_v = "v_repayments_info"  # 数据库视图名称
         self.db_table = "repayments"  # 数据库表名
+        self.loan = tb.StringVar()  # 所还借款下拉框数据
+        self.loan_ids = {}  # 下拉框文字 -> 借款 id
         self.createPage()
         self.set_combox_values()
 
+    def createPage(self):
+        super().createPage()
+        tb.Label(self.f_title, text="所还借款").grid(row=2, column=3, columnspan=2)
+        self.chosen_loan = tb.Combobox(self.f_title, textvariable=self.loan, state="readonly")
+        self.chosen_loan.grid(row=3, column=3, columnspan=2, sticky=tb.EW, padx=2)
+        self.chosen_seller.bind("<<ComboboxSelected>>", self.set_loan_values)  # 只列出该交易方的借款
+
+    def set_combox_values(self):
+        super().set_combox_values()
+        self.set_loan_values()
+
+    def set_loan_values(self, event=None, loan_id=None):
+        """所还借款下拉框：当前交易方未结清的借入、借出，loan_id 为需要一并列出并选中的借款"""
+        seller_id = dims.cache.table(self.conn, "sellers").id_of(self.seller.get())
+        self.loan_ids = {"不关联": None}
+        selected = "不关联"
+        for loan in loans.open_loans(self.conn, seller_id, loan_id):
+            label = loans.loan_label(self.conn, loan)
+            self.loan_ids[label] = loan[0]
+            if loan[0] == loan_id:
+                selected = label
+        self.chosen_loan['values'] = list(self.loan_ids)
+        self.loan.set(selected)
+
+    def extra_values(self):
+        return loans.link_values(self.conn, self.loan_ids.get(self.loan.get()))
+
+    def locateNote(self):
+        super().locateNote()
+        if self.current_id:
+            row = self.c.execute("select loan_id from ledger where id=?", (self.current_id,)).fetchone()
+            self.set_loan_values(loan_id=row[0] if row else None)
+
+    def clearMsg(self):
+        super().clearMsg()
+        if self.entry_flag.get() is True and hasattr(self, "chosen_loan"):
+            self.set_loan_values()
+
+
+class LoanFrame(tb.LabelFrame):
+    """借贷往来：各交易方未结清的借入、借出及账龄，均从借款表一次查询得到"""
+    def __init__(self, master=None):
+        tb.LabelFrame.__init__(self, master)
+        self.root = tb.LabelFrame(master, text='借贷往来')
+        self.pwin = master
+        self.root.grid()
+        self.conn = db.get_connection()
+        self.createPage()
+        self.show_infos()
+
+    def createPage(self):
+        tb.Label(self.root, text="按交易方（未结清）").grid(row=0, column=0, padx=10, pady=(10, 2), sticky=tb.W)
+        columns = ["交易方", "笔数", "借入未还", "借出未收", "净额"]
+        self.overview = ttk.Treeview(self.root, columns=columns, show="headings", height=10)
+        for column in columns:
+            self.overview.heading(column, text=column)
+            self.overview.column(column, width=110, anchor=tb.CENTER)
+        self.overview.grid(row=1, column=0, padx=10, pady=2, sticky=tb.NSEW)
+        tb.Label(self.root, text="账龄（按借款日期至今天数）").grid(row=2, column=0, padx=10, pady=(10, 2), sticky=tb.W)
+        columns = ["交易方", "类型", "笔数", "未结清"] + [name for high, name in loans.AGING_BUCKETS]
+        self.aging = ttk.Treeview(self.root, columns=columns, show="headings", height=12)
+        for column in columns:
+            self.aging.heading(column, text=column)
+            self.aging.column(column, width=90, anchor=tb.CENTER)
+        self.aging.grid(row=3, column=0, padx=10, pady=2, sticky=tb.NSEW)
+        tb.Button(self.root, text="刷新", command=self.show_infos,
+                  bootstyle="success-outline").grid(row=4, column=0, padx=10, pady=10, sticky=tb.W)
+
+    def show_infos(self, event=None):
+        """重新读取各交易方汇总与账龄"""
+        self.overview.delete(*self.overview.get_children())
+        for seller_id, title, count, borrowed, lent in loans.seller_overview(self.conn):
+            self.overview.insert("", END, values=(title, count, "%.2f" % (borrowed / 100), "%.2f" % (lent / 100),
+                                                  "%.2f" % ((lent - borrowed) / 100)))
+        self.aging.delete(*self.aging.get_children())
+        for seller_id, title, kind, count, outstanding, buckets in loans.aging(self.conn):
+            self.aging.insert("", END, values=[title, loans.KIND_TITLES[kind], count, "%.2f" % (outstanding / 100)]
+                              + ["%.2f" % (amount / 100) for amount in buckets])
+
 
 class NewTagFrame(tb.LabelFrame):
     """用于创建新的类别标签"""
@@ -760,11 +877,76 @@ class NewTagFrame(tb.LabelFrame):
         self.temp = tb.LabelFrame(self.pwin, text='新增标签')  # 创建新Frame用于新增标签
         self.temp.grid()  # 显示修改标签页
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
         self.addChosenTag()
 
-        
+    def addChosenTag(self):
+        """用于新增下拉框的标签"""
+        tb.Label(self.temp, text="选择要新增的标签类型：").grid(row=0, column=0)
+        self.mode = tb.StringVar()  # 要新增的标签类型
+        self.mode.set("pay_categorys")
+        title = tb.StringVar()  # 要新增的标签title
+        remark = tb.StringVar()  # 要新增的标签描述，如果新增类别（category）标签 则进行转换为pid
+        tb.Radiobutton(self.temp, text="账户/支付方式", value="accounts", variable=self.mode, command=self.redisplayLabel).grid(row=0, column=1)
+        tb.Radiobutton(self.temp, text="交易对象", value="sellers", variable=self.mode, command=self.redisplayLabel).grid(row=0, column=2)
+        tb.Radiobutton(self.temp, text="支出分类", value="pay_categorys", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=3)
+        tb.Radiobutton(self.temp, text="收入分类", value="income_categorys", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=4)
+        tb.Radiobutton(self.temp, text="成员/使用者", value="members", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=5)
+        tb.Label(self.temp, text="请输入要新增的信息:").grid(row=1, column=0)
+        self.label_input1 = tb.Label(self.temp, text="内容/新增分类")
+        self.label_input1.grid(row=1, column=1)
+        self.label_input2 = tb.Label(self.temp, text="备注/所属上级分类")
+        self.label_input2.grid(row=1, column=2)
+        tb.Entry(self.temp, textvariable=title).grid(row=2, column=1)
+        tb.Entry(self.temp, textvariable=remark).grid(row=2, column=2)
+        tb.Button(self.temp, text="新增", command=lambda: self.doAddChosenTag(self.mode, title, remark),bootstyle="info-outline").grid(row=3, column=1)
+        # tb.Button(self.temp, text="返回上一页", command=self.returnPrePage).grid(row=3, column=4)
+        # 批量调整控件布局
+        for child in self.temp.winfo_children():
+            child.grid_configure(sticky=tb.EW, padx=2, pady=5)
+
+    def redisplayLabel(self):
+        """更新显示内容/新增分类以及备注/所属上级分类"""
+        if self.mode.get() in ["pay_categorys", "income_categorys"]:
+            self.label_input1.config(text="本级分类")
+            self.label_input2.config(text="上级分类")
+        else:
+            self.label_input1.config(text="内容")
+            self.label_input2.config(text="备注")
+
+    def doAddChosenTag(self, mode, title, remark):
+        """将获取到的信息插入数据库"""
+        mode = mode.get()
+        title = title.get()
+        remark = remark.get()
+        # 判断是否已存在数据库
+        cached = dims.cache.table(self.conn, mode)
+        if cached.id_of(title) is not None:
+            print("%s已存在%s数据库中" % (title, mode))
+            mBox.showwarning("失败", message="数据已存在数据库！")
+            return
+        # 新增标签，写入数据库表数据
+        try:
+            if mode in ["pay_categorys", "income_categorys"]:
+                pid = cached.id_of(remark)  # 上级分类，没有时为一级分类
+                # print("pid, type:%s, value:%s" % (type(pid), pid))
+                self.c.execute("insert into %s (title, pid) values (?,?)" % mode, (title, pid))
+                self.conn.commit()
+            else:
+                pid = None
+                sql_dict = {"accounts": "insert into accounts (title, remark) values (?,?)",
+                            "sellers": "insert into sellers (title, remark) values (?,?)",
+                            "members": "insert into members (title, remark) values (?,?)"}
+                self.c.execute(sql_dict[mode], (title, remark))
+                self.conn.commit()
+            dims.cache.add(mode, self.c.lastrowid, title, pid)
+            notify_changed(self.pwin, "dimensions")
+            mBox.showinfo("成功", message="新建标签成功！")
+        except Exception:
+            mBox.showerror("失败", '新建标签失败！')
+
+
 class BudgetFrame(tb.LabelFrame):
     """预算页面：显示本月预算、已支出、剩余额度，并允许保存预算到 budget.json"""
     def __init__(self, master=None):
@@ -805,16 +987,10 @@ class BudgetFrame(tb.LabelFrame):
         tb.Button(self.budget_frame, text="保存预算", command=self.set_budget_save,bootstyle="success-outline").grid(row=5, column=0, pady=2)
         
         # db
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
-        # 初始化显示
+        # 初始化显示，支出变化后由主页面的刷新协调器在预算所在页面可见时刷新
         self.show_infos()
-        # 绑定全局事件，当有支出/收入变更时刷新预算显示
-        try:
-            top = self.root.winfo_toplevel()
-            top.bind('<<PaymentsChanged>>', lambda e: self.show_infos())
-        except Exception:
-            pass
 
     def show_infos(self, event=None):
         """更新预算显示：从文件读取预算并计算当月已支出"""
@@ -831,9 +1007,7 @@ class BudgetFrame(tb.LabelFrame):
             budget_amount = float(budget_data.get('amount', budget_data.get('monthly_budget', 0) or 0) or 0)
             # 计算当月已支出
             try:
-                self.c.execute("select sum(money) from v_payments_info where substr(note_date,1,7)=?", (ym,))
-                r = self.c.fetchone()
-                spent = float(r[0]) if r and r[0] is not None else 0.0
+                spent = monthly.month_total(self.conn, "payments", ym)  # 读取按月汇总表
             except Exception:
                 spent = 0.0
             remaining = budget_amount - spent
@@ -901,76 +1075,13 @@ class BudgetFrame(tb.LabelFrame):
         except Exception as e:
             mBox.showerror("保存失败", str(e))
 
-    def addChosenTag(self):
-        """用于新增下拉框的标签"""
-        tb.Label(self.temp, text="选择要新增的标签类型：").grid(row=0, column=0)
-        self.mode = tb.StringVar()  # 要新增的标签类型
-        self.mode.set("pay_categorys")
-        title = tb.StringVar()  # 要新增的标签title
-        remark = tb.StringVar()  # 要新增的标签描述，如果新增类别（category）标签 则进行转换为pid
-        tb.Radiobutton(self.temp, text="账户/支付方式", value="accounts", variable=self.mode, command=self.redisplayLabel).grid(row=0, column=1)
-        tb.Radiobutton(self.temp, text="交易对象", value="sellers", variable=self.mode, command=self.redisplayLabel).grid(row=0, column=2)
-        tb.Radiobutton(self.temp, text="支出分类", value="pay_categorys", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=3)
-        tb.Radiobutton(self.temp, text="收入分类", value="income_categorys", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=4)
-        tb.Radiobutton(self.temp, text="成员/使用者", value="members", variable=self.mode, width=20, command=self.redisplayLabel).grid(row=0, column=5)
-        tb.Label(self.temp, text="请输入要新增的信息:").grid(row=1, column=0)
-        self.label_input1 = tb.Label(self.temp, text="内容/新增分类")
-        self.label_input1.grid(row=1, column=1)
-        self.label_input2 = tb.Label(self.temp, text="备注/所属上级分类")
-        self.label_input2.grid(row=1, column=2)
-        tb.Entry(self.temp, textvariable=title).grid(row=2, column=1)
-        tb.Entry(self.temp, textvariable=remark).grid(row=2, column=2)
-        tb.Button(self.temp, text="新增", command=lambda: self.doAddChosenTag(self.mode, title, remark),bootstyle="info-outline").grid(row=3, column=1)
-        # tb.Button(self.temp, text="返回上一页", command=self.returnPrePage).grid(row=3, column=4)
-        # 批量调整控件布局
-        for child in self.temp.winfo_children():
-            child.grid_configure(sticky=tb.EW, padx=2, pady=5)
-
-    def redisplayLabel(self):
-        """更新显示内容/新增分类以及备注/所属上级分类"""
-        if self.mode.get() in ["pay_categorys", "income_categorys"]:
-            self.label_input1.config(text="本级分类")
-            self.label_input2.config(text="上级分类")
-        else:
-            self.label_input1.config(text="内容")
-            self.label_input2.config(text="备注")
-
-    def doAddChosenTag(self, mode, title, remark):
-        """将获取到的信息插入数据库"""
-        mode = mode.get()
-        title = title.get()
-        remark = remark.get()
-        # 判断是否已存在数据库
-        self.c.execute("select count(*) from %s where title=?" % mode, (title,))
-        if self.c.fetchone()[0]:
-            print("%s已存在%s数据库中" % (title, mode))
-            mBox.showwarning("失败", message="数据已存在数据库！")
-            return
-        # 新增标签，写入数据库表数据
-        try:
-            if mode in ["pay_categorys", "income_categorys"]:
-                self.c.execute("select id from %s where title=?" % mode, (remark,))
-                pid = self.c.fetchall()
-                if pid:
-                    pid = pid[0][0]
-                else:
-                    pid = None
-                # print("pid, type:%s, value:%s" % (type(pid), pid))
-                self.c.execute("insert into %s (title, pid) values (?,?)" % mode, (title, pid))
-                self.conn.commit()
-            else:
-                sql_dict = {"accounts": "insert into accounts (title, remark) values (?,?)",
-                            "sellers": "insert into sellers (title, remark) values (?,?)",
-                            "members": "insert into members (title, remark) values (?,?)"}
-                self.c.execute(sql_dict[mode], (title, remark))
-                self.conn.commit()
-            mBox.showinfo("成功", message="新建标签成功！")
-        except Exception:
-            mBox.showerror("失败", '新建标签失败！')
-
 
 class NoteFrame(tb.LabelFrame):
     """记录模块"""
+    # 记录列表的列：(视图字段, 标题, 宽度)
+    list_columns = [("id", "ID", 50), ("note_date", "日期", 90), ("title", "事项", 200), ("remark", "备注", 250),
+                    ("remark2", "额外备注", 300)]
+
     def __init__(self, master=None):
         tb.LabelFrame.__init__(self, master)
         # 创建聊天记录查看页面
@@ -981,6 +1092,7 @@ class NoteFrame(tb.LabelFrame):
         self.current_id = None  # 用于记录当前选中id
         self.db_v = "v_notes_info"  # 数据库视图名称
         self.db_table = "notes"  # 数据库表名
+        self.count_text = "当前共有 %s 条记事记录！"  # 记录数提示
         self.title = tb.StringVar()  # 事项
         self.note_date = tb.StringVar()  # 日期
         self.remark = tb.StringVar()  # 操作后余量
@@ -995,8 +1107,11 @@ class NoteFrame(tb.LabelFrame):
         self.entry_flag = tb.BooleanVar()  # 刷新输入区  True 每次提交完都会将输入区内容清空， 如果要重复输入重复日期 就很不方便
         self.entry_flag.set(True)
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
+        self.tasks = TaskScheduler(self.root)  # 搜索在后台线程执行
+        self.search_after = None  # 等待执行的输入即搜索
+        self.counting = None  # 正在后台统计的搜索条件 (where, params)，统计完成前有写入时重新统计
         self.createPage()
 
     def createPage(self):
@@ -1028,9 +1143,10 @@ class NoteFrame(tb.LabelFrame):
 
         self.label_notes_info = tb.Label(f_content)  # 所有记录总数信息
         self.label_notes_info.grid(row=0, column=0, columnspan=2, pady=5)
-        # 记录显示区
-        self.txt_note = ScrolledText(f_content, wrap=tb.WORD, width=130, height=38)
-        self.txt_note.grid(row=1, column=0)
+        # 记录显示区：只加载可见附近几页记录，双击记录定位修改
+        self.note_list = VirtualList(f_content, self.list_columns, height=34)
+        self.note_list.grid(row=1, column=0, sticky=tb.NSEW)
+        self.note_list.bind_select(self.selectNote)
 
         f_radios = tb.Frame(f_bottom)  # 防止单选项区域  即根据什么搜索的选项
         f_radios.grid(row=0, columnspan=9)
@@ -1049,6 +1165,7 @@ class NoteFrame(tb.LabelFrame):
 
         tb.Label(f_bottom, text="搜索内容:").grid(row=1, column=0)
         tb.Entry(f_bottom, textvariable=self.search_key, width=50).grid(row=1, column=1, columnspan=4)
+        self.search_key.trace_add("write", self.onSearchKeyChanged)  # 输入即搜索
         tb.Button(f_bottom, text="搜索", command=self.searchNotes,bootstyle="info-outline").grid(row=1, column=5)
         tb.Button(f_bottom, text="查看所有", command=self.showAll,bootstyle="primary-outline").grid(row=1, column=6)
         tb.Label(f_bottom, text="定位编号:").grid(row=2, column=0)
@@ -1078,6 +1195,7 @@ class NoteFrame(tb.LabelFrame):
         title = self.title.get()
         remark = self.remark.get()
         remark2 = self.remark2.get()
+        old_row = self.note_list.fetch(self.current_id)  # 修改前的记录，用于增量更新列表和汇总
         if not self.current_id:
             # 新增
             sql = "insert into %s(note_date, title, remark, remark2, create_time) values(?,?,?,?,?)" % self.db_table
@@ -1087,44 +1205,94 @@ class NoteFrame(tb.LabelFrame):
             sql = "update %s set note_date=?,title=?,remark=?,remark2=?,modify_time=? where id=?" % self.db_table
             self.c.execute(sql, (note_date, title, remark, remark2, time_now, self.current_id))
         self.conn.commit()
+        row_id = self.current_id or self.c.lastrowid
         self.clearMsg()
-        self.showAll()
+        self.applyChange(row_id, old_row)
+        notify_changed(self.root, self.db_table)
 
     def showAll(self):
         """展示所有交易记录"""
-        # 显示详情
-        order_mode = self.order_mode.get()  # 根据什么排序
-        order_key = self.order_option.get()  # 排序
-        self.txt_note.delete("0.0", END)  # 清空显示区
-        sql = "select id,note_date,title,remark,remark2 from %s order by %s %s;" % (self.db_v, order_mode, order_key)
-        self.c.execute(sql)
-        result = self.c.fetchall()
-        for item in result:
-            msg = "id:%s\n日期:%s, 事项:%s, \n备注:%s, 额外备注:%s\n\n" % item
-            self.txt_note.insert(tb.INSERT, msg)
-        self.clearMsg()
-        self.label_notes_info.config(text="当前共有 %s 条记事记录！" % len(result))  # 显示记录数
+        self.count_text = "当前共有 %s 条记事记录！"
+        self.showRecords()
+
+    def onSearchKeyChanged(self, *args):
+        """搜索框内容变化后等待 SEARCH_DELAY 毫秒，期间继续输入则重新计时，只搜索最后一次输入"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY, self.searchNotes)
+
+    def cancelSearch(self):
+        """取消等待执行和正在后台执行的搜索"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+            self.search_after = None
+        self.tasks.cancel()
+        self.counting = None
 
     def searchNotes(self):
-        """用于搜索便签"""
+        """用于搜索便签，查询在后台线程执行：先显示第一页记录，再显示记录数"""
+        self.cancelSearch()
         # 获取搜索关键字
         search_key = self.search_key.get()  # 搜索词
         search_mode = self.search_mode.get()  # 搜索模式  “content” 事项和备注 “note_date” 时间
         order_mode = self.order_mode.get()  # 根据什么排序
         order_key = self.order_option.get()  # 排序
-        # 显示交易详情
-        self.txt_note.delete("0.0", END)
-        sql = """select id,note_date,title,remark,remark2 from %s where %s like ?  order by %s %s;""" % (self.db_v, search_mode, order_mode, order_key)
-        self.c.execute(sql, ("%%%s%%" % search_key,))
-        result = self.c.fetchall()
+        if search_key:
+            self.count_text = "共搜索到符合条件的 %s 条记录！"
+        else:
+            self.count_text = "当前共有 %s 条记事记录！"  # 清空搜索框时显示所有记录
+        self.label_notes_info.config(text="正在搜索...")
+        self.tasks.submit(self.fetchPage, self.showPage, search_mode, search_key, order_mode, order_key)
+
+    def fetchPage(self, progress, search_mode, search_key, order_mode, order_key):
+        """后台线程：查询第一页记录"""
+        conn = self.tasks.connection()
+        where, params = search.keyword_condition(conn, self.db_v, search_mode, search_key) if search_key else ("", ())
+        pager = self.note_list.make_pager(conn, self.db_v, order_mode, order_key, where, params)
+        return pager, pager.first()
+
+    def showPage(self, data):
+        """界面线程：显示第一页记录，再到后台统计记录数"""
+        pager, rows = data
+        self.note_list.show(pager, rows, len(rows), self.conn)
         self.clearMsg()
-        if not result:  # 没有搜索到结果
+        self.label_notes_info.config(text="正在统计...")
+        self.counting = (pager.where, pager.params)
+        self.tasks.submit(self.fetchCount, self.showSearchCount, *self.counting)
+
+    def fetchCount(self, progress, where, params):
+        """后台线程：统计记录数"""
+        return self.note_list.make_pager(self.tasks.connection(), self.db_v, where=where, params=params).count()
+
+    def showSearchCount(self, total):
+        self.counting = None
+        self.note_list.total = total
+        self.showCount()
+
+    def showRecords(self, where="", params=()):
+        """按条件查询并显示记录"""
+        self.cancelSearch()
+        order_mode = self.order_mode.get()  # 根据什么排序
+        order_key = self.order_option.get()  # 排序
+        self.note_list.load(self.conn, self.db_v, order_mode, order_key, where, params)
+        self.clearMsg()
+        self.showCount()
+
+    def showCount(self):
+        """显示记录数"""
+        if not self.note_list.total and self.note_list.pager.where:  # 没有搜索到结果
             self.label_notes_info.config(text="未搜索到符合条件的记录！")
         else:
-            self.label_notes_info.config(text="共搜索到符合条件的 %s 条记录！" % len(result))  # 显示找到多少条
-            for item in result:
-                msg = "id:%s\n日期:%s, 事项:%s, \n备注:%s, 额外备注:%s\n\n" % item
-                self.txt_note.insert(tb.INSERT, msg)
+            self.label_notes_info.config(text=self.count_text % self.note_list.total)
+
+    def applyChange(self, row_id, old_row=None):
+        """新增/修改/删除一条记录后，只更新列表中的这一行；记录数仍在后台统计时重新统计"""
+        self.note_list.patch(row_id, old_row)
+        if self.counting is not None:
+            self.label_notes_info.config(text="正在统计...")
+            self.tasks.submit(self.fetchCount, self.showSearchCount, *self.counting)
+            return
+        self.showCount()
 
     def locateNote(self):
         """用于通过id定位便签并将其填充到对应控件内"""
@@ -1142,31 +1310,39 @@ class NoteFrame(tb.LabelFrame):
             self.remark.set(note_item[3])
             self.remark2.set(note_item[4])
             self.buttun_create_note.config(text="修改")
-            self.txt_note.delete("0.0", END)
+            self.note_list.locate(select_id)  # 在列表中选中该记录
             self.label_notes_info.config(text="正在修改id为%s的记录！" % select_id)
         else:
             self.clearMsg()
-            self.txt_note.delete("0.0", END)
+            self.note_list.clear_selection()
             self.buttun_create_note.config(text="创建")
             self.label_notes_info.config(text="数据库中未找到id为:%s的记录！" % select_id)
 
+    def selectNote(self, select_id):
+        """双击列表中的记录时定位该记录"""
+        self.select_id.set(select_id)
+        self.locateNote()
+
     def cancelUpdate(self):
         """用于取消修改便签内容操作"""
         # 还原标签状态为新增便签
         self.clearMsg()
-        self.txt_note.delete("0.0", END)
+        self.note_list.clear_selection()
         self.buttun_create_note.config(text="创建")
 
     def delNote(self):
         """用于删除记账记录"""
+        row_id = self.current_id
+        old_row = self.note_list.fetch(row_id)
         # 只进行逻辑删除
         sql = "update %s set is_delete=1 where id=?" % self.db_table
-        self.c.execute(sql, (self.current_id,))
+        self.c.execute(sql, (row_id,))
         self.conn.commit()
-        print("删除id:%s 的记录！" % self.current_id)
+        print("删除id:%s 的记录！" % row_id)
         self.clearMsg()
-        # 刷新结果
-        self.showAll()
+        # 只从列表和汇总中移除这条记录
+        self.applyChange(row_id, old_row)
+        notify_changed(self.root, self.db_table)
 
     def clearMsg(self):
         """用于将显示区的控件信息恢复最初状态"""
@@ -1182,6 +1358,7 @@ class NoteFrame(tb.LabelFrame):
 
 class QueryFrame(tb.LabelFrame):
     """用于查询数据，主要实现多种条件查询"""
+    DETAIL_PAGE = 100  # 先显示的详情条数，其余详情在汇总统计之后追加
 
     def __init__(self, master=None):
         tb.LabelFrame.__init__(self, master)
@@ -1210,8 +1387,10 @@ class QueryFrame(tb.LabelFrame):
         self.entry_flag = tb.BooleanVar()  # 刷新输入区  True 每次提交完都会将输入区内容清空， 如果要重复输入重复日期 就很不方便
         self.entry_flag.set(True)
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
+        self.tasks = TaskScheduler(self.root)  # 查询在后台线程执行
+        self.search_after = None  # 等待执行的输入即查询
         self.createPage()
 
     def createPage(self):
@@ -1235,9 +1414,9 @@ class QueryFrame(tb.LabelFrame):
             child.grid_configure(padx=2, pady=4, sticky=tb.EW)
         # 标签
         tb.Label(self.f_title, text="事项").grid(row=0, column=1)
-        tb.Label(self.f_title, text="日期").grid(row=0, column=2)  # 格式：'%Y-%m-%d %H:%M:%S'
+        tb.Label(self.f_title, text="日期(2024-03 或 起~止)").grid(row=0, column=2)  # 格式：'%Y-%m-%d'
         tb.Label(self.f_title, text="备注").grid(row=0, column=3, columnspan=2)
-        tb.Label(self.f_title, text="金额").grid(row=0, column=5)
+        tb.Label(self.f_title, text="金额(如 10~100)").grid(row=0, column=5)
         tb.Label(self.f_title, text="账户/支付方式").grid(row=2, column=1)
         tb.Label(self.f_title, text="交易对象").grid(row=2, column=2)  # 格式：'%Y-%m-%d %H:%M:%S'
         tb.Label(self.f_title, text="一级分类").grid(row=2, column=3)  # 格式：'%Y-%m-%d %H:%M:%S'
@@ -1293,111 +1472,95 @@ class QueryFrame(tb.LabelFrame):
 
         for child in self.f_radios.winfo_children():
             child.grid_configure(padx=2, pady=4, sticky=tb.EW)
+        # 输入查询条件时自动查询
+        for item in [self.title, self.note_date, self.remark, self.money, self.account, self.seller, self.category_p,
+                     self.category_c, self.member]:
+            item.trace_add("write", self.onKeyChanged)
 
-    def searchNotes(self):
-        """用于搜索"""
-        # 获取搜索关键字
-        title = self.title.get()
-        note_date = self.note_date.get()
-        note_date = changeStrToDate(note_date)  # 自动转换为标准格式
-        remark = self.remark.get()
-        money = self.money.get()
-        # 判断是否有输入金额，无输入或者输入非纯数字则money置为None
-        try:
-            money = float(money)
-        except Exception:
-            money = None
+    def onKeyChanged(self, *args):
+        """查询条件变化后等待 SEARCH_DELAY 毫秒，期间继续输入则重新计时，只查询最后一次输入"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+        self.search_after = self.root.after(SEARCH_DELAY, self.searchNotes)
 
-        account = self.account.get()
-        seller = self.seller.get()
-        category_p = self.category_p.get()
-        category_c = self.category_c.get()
-        member = self.member.get()
-        keys = {"title": title, "note_date": note_date, "remark": remark, "money": money, "account": account,
-                "seller": seller, "category_p": category_p, "category_c": category_c, "member": member}  # 关键字
+    def searchNotes(self):
+        """用于搜索
+        查询在后台线程执行：先显示记录数和前 DETAIL_PAGE 条详情，再显示汇总统计和其余详情；新的查询会中断尚未完成的旧查询"""
+        if self.search_after is not None:
+            self.root.after_cancel(self.search_after)
+            self.search_after = None
+        # 获取搜索关键字：事项、备注为文本；日期、金额为区间；账户等为名称
+        keys = {"title": self.title.get(), "remark": self.remark.get(), "note_date": self.note_date.get(),
+                "money": self.money.get(), "account": self.account.get(), "seller": self.seller.get(),
+                "category_p": self.category_p.get(), "category_c": self.category_c.get(),
+                "member": self.member.get()}  # 关键字
         db_v = self.db_v.get()  # 搜索视图
         order_mode = self.order_mode.get()  # 根据什么排序
         order_key = self.order_option.get()  # 排序
-
-        # 显示交易详情
+        self.label_notes_info.config(text="正在查询...")
+        self.tasks.submit(self.fetchDetails, self.showDetails, keys, db_v, order_mode, order_key)
+
+    def fetchDetails(self, progress, keys, db_v, order_mode, order_key):
+        """后台线程：生成查询条件，查询记录数和前 DETAIL_PAGE 条详情"""
+        query = LedgerQuery(self.tasks.connection(), db_v)
+        for key in ["title", "remark"]:
+            query.add_text(key, keys[key])
+        query.add_date_range(keys["note_date"])
+        query.add_money_range(keys["money"])
+        for key in ["account", "seller", "category_p", "category_c", "member"]:
+            query.add_dimension(key, keys[key])
+        logger.debug("sql:%s values:%s" % (query.cte(), query.params))
+        count, details = query.details(order_mode, order_key, limit=self.DETAIL_PAGE)
+        return query, order_mode, order_key, count, details
+
+    def showDetails(self, data):
+        """界面线程：显示记录数和前 DETAIL_PAGE 条详情，再到后台查询汇总统计和其余详情"""
+        query, order_mode, order_key, count, details = data
         self.txt_note.delete("0.0", END)
         self.info_note.delete("0.0", END)
-        # 拼接查询条件
-        sub_sql = ""  # sql语句条件部分
-        values = []  # sql条件对应值
-        for key, value in keys.items():
-            # logger.debug("搜索关键字：key:%s, value:%s" % (key, value))
-            if value:
-                # 判断是否出现money不填，不填或者输入非纯数字，则匹配所有金额
-                if value == "money":
-                    if money is None:
-                        continue
-                # 拼接所有条件，与
-                if sub_sql.endswith(") "):
-                    sub_sql += "and "
-                sub_sql += "(%s like ?) " % key
-                values.append("%%%s%%" % value)  # 直接拼接，like %?% 需要用%% 转义%
-        logger.debug("sub_sql:%s " % sub_sql)
-        logger.debug("values:%s " % values)
-        values = tuple(values)  # 转为元组方便后面传参到函数
-        logger.debug("tuple(values):%s " % str(values))
-        # 获取交易分析汇总信息
-        sql = """select count(money),sum(money),avg(money),max(money),min(money) from %s""" % db_v
-        if sub_sql:
-            sql += """ where %s;""" % sub_sql
-        logger.debug("sql:%s" % sql)
-        self.c.execute(sql, values)
-        result = self.c.fetchone()  # 总信息
-        self.info_note.delete("0.0", END)
-        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % result)
+        if not count:  # 没有搜索到结果
+            self.label_notes_info.config(text="未搜索到符合条件的记账记录！")
+        else:
+            self.label_notes_info.config(text="共搜索到符合条件的 %s 条记账记录！" % count)  # 显示找到多少条
+            self.insertDetails(query.fields, details)
+        rest = count > len(details)
+        self.tasks.submit(self.fetchSummary, self.showSummary, query, order_mode, order_key, rest)
+
+    def fetchSummary(self, progress, query, order_mode, order_key, rest):
+        """后台线程：查询交易分析汇总信息、分组统计和其余详情"""
+        query.conn = self.tasks.connection()
+        summary = query.summary()
+        details = query.details(order_mode, order_key, offset=self.DETAIL_PAGE)[1] if rest else []
+        return query.fields, summary, details
+
+    def showSummary(self, data):
+        """界面线程：显示交易分析汇总信息，并追加其余详情"""
+        columns, summary, details = data
         show_dict = {"account": "按账户/支付方式 统计：", "seller": "按交易方 统计：", "category_p": "按一级分类 统计：",
                      "category_c": "按二级分类 统计：", "member": "按使用者 统计："}
-        if db_v in ["v_payments_info", "v_incomes_info"]:
-            columns = ["account", "seller", "category_p", "category_c", "member"]  # 标签分类
-        else:
-            columns = ["account", "seller"]
-
+        self.info_note.delete("0.0", END)
+        self.info_note.insert(tb.INSERT, "共进行了 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n\n" % summary.overall())
         for item in columns:
-            sql = """select %s,count(money),sum(money),avg(money),max(money),min(money) from %s """ % (item, db_v)
-            if sub_sql:
-                sql += """ where %s group by %s;""" % (sub_sql, item)
-            else:
-                sql += """ group by %s;""" % item
-            logger.debug("sql:%s" % sql)
-            self.c.execute(sql, values)
-            results = self.c.fetchall()
             self.info_note.insert(tb.INSERT, "\n%s\n" % show_dict[item])
-            for result in results:
+            for result in summary.groups(item):
                 msg = "%s 相关共 %s 笔交易\n交易总金额:%s \n平均交易金额:%s \n最大交易金额:%s \n最小交易金额:%s \n" % result
                 self.info_note.insert(tb.INSERT, msg)
-        # 获取交易详情
-        sql = """select id,note_date,title,remark,money"""
-        for item in columns:
-            sql += ",%s" % item
-        sql += """ from %s """ % db_v
-        if sub_sql:
-            sql += """ where %s order by %s %s;""" % (sub_sql, order_mode, order_key)
-        else:
-            sql += """ order by %s %s;""" % (order_mode, order_key)
-        logger.debug("sql:%s" % sql)
-        self.c.execute(sql, values)
-        # 显示交易详情信息
-        result = self.c.fetchall()
-        # self.clearMsg()
-        if not result:  # 没有搜索到结果
-            self.label_notes_info.config(text="未搜索到符合条件的记账记录！")
+        self.insertDetails(columns, details)
+
+    def insertDetails(self, columns, details):
+        """在详情区末尾追加记录"""
+        if len(columns) > 2:
+            fmt = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s, 一级分类:%s, 二级分类:%s, 使用者:%s\n\n"
         else:
-            self.label_notes_info.config(text="共搜索到符合条件的 %s 条记账记录！" % len(result))  # 显示找到多少条
-            for item in result:
-                msg = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s, 一级分类:%s, 二级分类:%s, 使用者:%s\n\n" % item
-                self.txt_note.insert(tb.INSERT, msg)
+            fmt = "id:%s\n日期:%s, 事项:%s, 备注:%s, 金额:%s, \n账户/支付方式:%s, 交易方:%s\n\n"
+        self.txt_note.insert(END, "".join(fmt % item for item in details))
 
     def clearMsg(self):
         """用于清空输入区内容"""
-        keys = [self.title, self.note_date, self.remark, self.account, self.category_p, self.category_c, self.member]
+        keys = [self.title, self.note_date, self.remark, self.money, self.account, self.seller, self.category_p,
+                self.category_c, self.member]
         for item in keys:
             item.set("")
-        self.money.set(0.0)
 
     def check(self):
         """用于检测选择的是什么查询"""
@@ -1426,7 +1589,7 @@ class BackupFrame(tb.LabelFrame):
         self.option = tb.Frame(self.root)
         self.option.grid()
         # 链接数据库
-        self.conn = sqlite3.connect(settings.DB_PATH)
+        self.conn = db.get_connection()
         self.c = self.conn.cursor()
         # excel 文件路径
         self.excel_path1 = tb.StringVar()  # 导入文件路径
@@ -1434,13 +1597,19 @@ class BackupFrame(tb.LabelFrame):
         tb.Label(self.top, text="excel文件路径:").grid(row=0, column=0)
         tb.Entry(self.top, textvariable=self.excel_path1, width=100).grid(row=0, column=1)
         tb.Button(self.top, text="浏览", command=self.select_filepath_1,bootstyle="info-outline").grid(row=0, column=2)
-        tb.Button(self.top, text="导入到数据库", command=self.insert_db,bootstyle="success-outline").grid(row=0, column=3)
+        self.button_import = tb.Button(self.top, text="导入到数据库", command=self.insert_db,bootstyle="success-outline")
+        self.button_import.grid(row=0, column=3)
         # tb.Button(self.top, text="导入到数据库", command=self.get_ids_from_db).grid(row=0, column=3)
 
         tb.Label(self.top, text="导出路径:").grid(row=1, column=0)
         tb.Entry(self.top, textvariable=self.excel_path2, width=100).grid(row=1, column=1)
         tb.Button(self.top, text="浏览", command=self.select_filepath_2,bootstyle="info-outline").grid(row=1, column=2)
-        tb.Button(self.top, text="导出到excel", command=self.export_excel,bootstyle="success-outline").grid(row=1, column=3)
+        self.button_export = tb.Button(self.top, text="导出到excel", command=self.export_excel,bootstyle="success-outline")
+        self.button_export.grid(row=1, column=3)
+        self.task_status = tb.Label(self.top, text="")  # 导入、导出进度
+        self.task_status.grid(row=2, column=1, sticky="w")
+        # 导入、导出在后台线程中使用连接池的连接执行，界面保持响应
+        self.tasks = TaskScheduler(self.root, self.task_status)
 
     def select_filepath_1(self):
         """用于通过浏览按钮获取导入文件路径"""
@@ -1456,313 +1625,85 @@ class BackupFrame(tb.LabelFrame):
         # file_path = asksaveasfilename()
         self.excel_path2.set(file_path)
 
+    def set_busy(self, busy):
+        """导入或导出进行中时禁用两个按钮，同一时间只执行一个任务"""
+        state = "disabled" if busy else "normal"
+        self.button_import.config(state=state)
+        self.button_export.config(state=state)
+
     def insert_db(self):
-        """用于将数据从excel表中插入到数据库"""
-        start_time = time.time()
+        """在后台线程中把excel表中的数据导入数据库，界面保持响应并显示进度"""
         file_path = self.excel_path1.get()
         logger.info("导入的excel文件路径:%s" % file_path)
-        self.get_ids_from_db()
-        # sheet_names = ["支出", "收入", "借入", "借出", "还款", "记录"]
+        self.set_busy(True)
+        self.task_status.config(text="正在读取excel文件...")
+        self.tasks.submit(self._import_fetch, self._import_done, file_path, time.time(),
+                          on_error=lambda e: self._import_failed(file_path, e))
+
+    def _import_fetch(self, progress, file_path, start_time):
+        """后台线程：边读取 excel文件内容边写入，整个导入在一个事务内完成，出错时不写入任何数据"""
+        def sheets(reader):
+            for sheet in reader.iter_sheets():
+                progress("正在导入%s" % sheet[0])
+                yield sheet
+
+        logger.info("正在读取excel文件内容")
+        r = excel.ReadExcel(file_path)
         try:
-            # 读取 excel文件内容
-            logger.info("正在读取excel文件内容")
-            r = excel.ReadExcel(file_path)
-            result = r.read_data()
-            # logger.debug("result: %s" % result)
-            func_dict = {"支出": self.insert_db_payment,
-                         "收入": self.insert_db_income,
-                         "借入": self.insert_db_borrow,
-                         "借出": self.insert_db_lend,
-                         "还款": self.insert_db_repayment,
-                         "记录": self.insert_db_note
-                         }
-            for sheet in result:
-                self.data_list = result[sheet]
-                for data in self.data_list:
-                    func_dict[sheet](data)
-        except Exception as e:
-            print(traceback.print_exc())
-            logger.error("导入excel数据出错%s" % e)
-            mBox.showerror("失败", message="从%s 恢复到数据库失败！" % file_path)
-        else:
-            logger.info("导入excel数据成功!")
-            logger.info("导入%s到数据库完成，用时%ss" % (file_path, time.time() - start_time))
-            mBox.showinfo("成功", message="从%s 恢复到数据库完成！" % file_path)
-
-    def get_id_db(self, sql, paras):
-        """用于从数据库中查找id
-        sql :sql语句
-        paras : 元组参数
-        """
-        self.c.execute(sql, paras)
-        results = self.c.fetchall()
-        if results:
-            return results[0][0]
-        else:
-            return
-
-    def get_id_from_result(self, search_table, search_para):
-        """从已经查好的数据中直接获取id"""
-        if search_table not in self.result:
-            # 搜索内容不在result结果集key中
-            return
-
-        if search_table in ["pay_categorys", "income_categorys"]:
-            for item in self.result[search_table]:
-                if search_para[0] == item and search_para[1] == self.result[search_table][item][1]:
-                    return self.result[search_table][item][0]
-            else:  # 如果数据库没有，则新建避免数据被设置为null丢失源信息数据
-                if search_para[0] is None:
-                    return
-                logger.info("insert into %s (title,pid) " % search_table + "values (%s,%s)" % (search_para))
-                self.c.execute("insert into %s (title,pid) values (?,?)" % search_table, (search_para[0], search_para[1]))
-                self.conn.commit()
-        else:
-            if search_para in self.result[search_table]:
-                return self.result[search_table][search_para]
-            else:  # 如果数据库没有，则新建避免数据被设置为null丢失源信息数据
-                if search_para is None:  # 如果title为None则不插入
-                    return
-                self.c.execute("insert into %s (title) values (?)" % search_table, (search_para,))
-                self.conn.commit()
-                logger.info("insert into %s (title) " % search_table + "values (%s)" % search_para)
-        self.get_ids_from_db()  # 更新数据
-        return self.get_id_from_result(search_table, search_para)  # 重新调用查询，以获取本次插入数据库的id
-
-    def get_data(self, key, data):
-        """data : excel中每一行的数据字典"""
-        # 从excel读取的数据中提取所需数据 用于避免 比如excel"收入"表中没有"交易方"这一列导致直接data["交易方"] 报KeyError: '交易方'
-        if key in data:
-            return data[key]
-        else:
-            return
-
-    def get_ids_from_db(self):
-        """从数据库中一次查询获取所有id，避免每次都查询数据库"""
-        self.result = {
-            "accounts": {},
-            "sellers": {},
-            "pay_categorys": {},
-            "income_categorys": {},
-            "members": {}}
-
-        self.c.execute("select title,id from accounts")
-        ret = self.c.fetchall()
-        logger.debug("ret:%s" % ret)
-        for title, id_value in ret:
-            self.result["accounts"][title] = id_value
-
-        self.c.execute("select title,id from sellers")
-        ret = self.c.fetchall()
-        logger.debug("ret:%s" % ret)
-        for title, id_value in ret:
-            self.result["sellers"][title] = id_value
-
-        self.c.execute("select title,id,pid from pay_categorys")
-        ret = self.c.fetchall()
-        logger.debug("ret:%s" % ret)
-        for title, nid, pid in ret:
-            self.result["pay_categorys"][title] = (nid, pid)
-
-        self.c.execute("select title,id,pid from income_categorys")
-        ret = self.c.fetchall()
-        logger.debug("ret:%s" % ret)
-        for title, nid, pid in ret:
-            self.result["income_categorys"][title] = (nid, pid)
-
-        self.c.execute("select title,id from members")
-        ret = self.c.fetchall()
-        logger.debug("ret:%s" % ret)
-        for title, id_value in ret:
-            self.result["members"][title] = id_value
-
-        # logger.debug("result:%s" % self.result)
-
-    def insert_db_payment(self, data):
-        # 用于将excel文件中支出的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = data["事项"]
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("备注", data)
-        money = self.get_data("支出金额", data)
-        account = self.get_data("支出途径", data)
-        seller = self.get_data("交易方", data)
-        category_p = self.get_data("一级分类", data)
-        category_c = self.get_data("二级分类", data)
-        member = self.get_data("对象", data)
-        # account_id = self.get_id_db("select id from accounts where title=?", (account,))
-        # seller_id = self.get_id_db("select id from sellers where title=?", (seller,))
-        # category_pid = self.get_id_db("select id from pay_categorys where title=?", (category_p,))
-        # category_cid = self.get_id_db("select id from pay_categorys where title=? and pid=?", (category_c, category_pid))
-        # member_id = self.get_id_db("select id from members where title=?", (member,))
-        account_id = self.get_id_from_result("accounts", account)
-        seller_id = self.get_id_from_result("sellers", seller)
-        category_pid = self.get_id_from_result("pay_categorys", (category_p, None))
-        category_cid = self.get_id_from_result("pay_categorys", (category_c, category_pid))
-        member_id = self.get_id_from_result("members", member)
-        sql = "insert into payments(note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id,create_time,modify_time) values(?,?,?,?,?,?,?,?,?,?,?)"
-        self.c.execute(sql, (
-            note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id, create_time, modify_time))
-        self.conn.commit()
-
-    def insert_db_income(self, data):
-        # 用于将excel文件中收入的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = data["事项"]
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("备注", data)
-        money = self.get_data("收入金额", data)
-        account = self.get_data("收入途径", data)
-        seller = self.get_data("交易方", data)
-        category_p = self.get_data("一级分类", data)
-        category_c = self.get_data("二级分类", data)
-        member = self.get_data("对象", data)
-        # account_id = self.get_id_db("select id from accounts where title is ?", (account,))
-        # seller_id = self.get_id_db("select id from sellers where title is ?", (seller,))
-        # category_pid = self.get_id_db("select id from income_categorys where title is ?", (category_p,))
-        # category_cid = self.get_id_db("select id from income_categorys where title is ? and pid is ?",
-        #                                (category_c, category_pid))
-        # member_id = self.get_id_db("select id from members where title=?", (member,))
-
-        account_id = self.get_id_from_result("accounts", account)
-        seller_id = self.get_id_from_result("sellers", seller)
-        category_pid = self.get_id_from_result("income_categorys", (category_p, None))
-        category_cid = self.get_id_from_result("income_categorys", (category_c, category_pid))
-        member_id = self.get_id_from_result("members", member)
-        sql = "insert into incomes(note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id,create_time,modify_time) values(?,?,?,?,?,?,?,?,?,?,?)"
-        self.c.execute(sql, (
-            note_date, title, remark, money, account_id, seller_id, category_pid, category_cid, member_id,create_time,modify_time))
-        self.conn.commit()
-
-    def insert_db_borrow(self, data):
-        # 用于将excel文件中支出的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = data["事项"]
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("备注", data)
-        money = self.get_data("金额", data)
-        account = self.get_data("账户", data)
-        seller = self.get_data("交易方", data)
-        # account_id = self.get_id_db("select id from accounts where title=?", (account,))
-        # seller_id = self.get_id_db("select id from sellers where title=?", (seller,))
-        account_id = self.get_id_from_result("accounts", account)
-        seller_id = self.get_id_from_result("sellers", seller)
-        sql = "insert into borrows(note_date, title, remark, money, account_id, seller_id,create_time,modify_time) values(?,?,?,?,?,?,?,?)"
-        self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id,create_time,modify_time))
-        self.conn.commit()
-
-    def insert_db_lend(self, data):
-        # 用于将excel文件中支出的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = data["事项"]
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("备注", data)
-        money = self.get_data("金额", data)
-        account = self.get_data("账户", data)
-        seller = self.get_data("交易方", data)
-        # account_id = self.get_id_db("select id from accounts where title=?", (account,))
-        # seller_id = self.get_id_db("select id from sellers where title=?", (seller,))
-        account_id = self.get_id_from_result("accounts", account)
-        seller_id = self.get_id_from_result("sellers", seller)
-        sql = "insert into lends(note_date, title, remark, money, account_id, seller_id,create_time,modify_time) values(?,?,?,?,?,?,?,?)"
-        self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id,create_time,modify_time))
-        self.conn.commit()
-
-    def insert_db_repayment(self, data):
-        # 用于将excel文件中支出的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = data["事项"]
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("备注", data)
-        money = self.get_data("金额", data)
-        account = self.get_data("账户", data)
-        seller = self.get_data("交易方", data)
-        # account_id = self.get_id_db("select id from accounts where title=?", (account,))
-        # seller_id = self.get_id_db("select id from sellers where title=?", (seller,))
-        account_id = self.get_id_from_result("accounts", account)
-        seller_id = self.get_id_from_result("sellers", seller)
-        sql = "insert into repayments(note_date, title, remark, money, account_id, seller_id,create_time,modify_time) values(?,?,?,?,?,?,?,?)"
-        self.c.execute(sql, (note_date, title, remark, money, account_id, seller_id,create_time,modify_time))
-        self.conn.commit()
-
-    def insert_db_note(self, data):
-        # 用于将excel文件中支出的信息记录到数据库中
-        create_time = self.get_data("创建时间", data)
-        modify_time = self.get_data("修改时间", data)
-        if not create_time:
-            create_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 当前时间
-        note_date = changeStrToDate(data["日期"])
-        title = self.get_data("事项", data)
-        if title is None:
-            # 防止空单元格导致写入数据库报错
-            return
-        remark = self.get_data("记录", data)
-        # if remark:
-        #     remark = "充值后" + remark
-        remark2 = self.get_data("额外备注", data)
-        sql = "insert into notes(note_date, title, remark, remark2,create_time,modify_time) values(?,?,?,?,?,?)"
-        self.c.execute(sql, (note_date, title, remark, remark2, create_time, modify_time))
-        self.conn.commit()
+            stats = importer.ExcelImporter(self.tasks.connection()).run(sheets(r))
+        finally:
+            r.close()
+        return file_path, start_time, stats
+
+    def _import_done(self, data):
+        """界面线程：导入完成后通知各页面刷新并提示结果"""
+        file_path, start_time, stats = data
+        self.set_busy(False)
+        logger.info("导入excel数据成功!")
+        logger.info("导入%s到数据库完成，用时%ss，%s" % (file_path, time.time() - start_time, importer.format_stats(stats)))
+        self.task_status.config(text="导入完成，共 %s 行" % sum(count for name, count, seconds in stats))
+        notify_changed(self.root, *CHANGE_EVENTS)  # 含导入时新建的账户、分类等
+        mBox.showinfo("成功", message="从%s 恢复到数据库完成！" % file_path)
+
+    def _import_failed(self, file_path, error):
+        """界面线程：导入出错（已整体回滚）"""
+        self.set_busy(False)
+        traceback.print_exception(type(error), error, error.__traceback__)
+        logger.error("导入excel数据出错%s" % error)
+        self.task_status.config(text="导入失败")
+        mBox.showerror("失败", message="从%s 恢复到数据库失败！" % file_path)
 
     def export_excel(self):
-        """从数据库获取所有交易记录并写出到excel文件"""
-        # 显示交易详情
+        """在后台线程中把所有记录流式写出到excel文件，界面保持响应并显示进度"""
         file_path = self.excel_path2.get()
-        logger.info("导出的excel文件路径:%s" % file_path)
-        result = {}
-        sql = "select note_date,title,money,account,remark,seller,category_p,category_c,member,create_time,modify_time from v_payments_info order by note_date;"
-        self.c.execute(sql)
-        result["支出"] = self.c.fetchall()
-        sql = "select note_date,title,money,account,remark,seller,category_p,category_c,member,create_time,modify_time from v_incomes_info order by note_date;"
-        self.c.execute(sql)
-        result["收入"] = self.c.fetchall()
-        sql = "select note_date,title,money,account,remark,seller,create_time,modify_time from v_borrows_info order by note_date;"
-        self.c.execute(sql)
-        result["借入"] = self.c.fetchall()
-        sql = "select note_date,title,money,account,remark,seller,create_time,modify_time from v_lends_info order by note_date;"
-        self.c.execute(sql)
-        result["借出"] = self.c.fetchall()
-        sql = "select note_date,title,money,account,remark,seller,create_time,modify_time from v_repayments_info order by note_date;"
-        self.c.execute(sql)
-        result["还款"] = self.c.fetchall()
-        sql = "select note_date,title,remark,remark2,create_time,modify_time from v_notes_info order by note_date;"
-        self.c.execute(sql)
-        result["记录"] = self.c.fetchall()
-        # print(result)
+        if not file_path:
+            mBox.showwarning("提示", message="请先选择导出路径！")
+            return
         logger.info("导出数据到excel文件:%s" % file_path)
-        w = excel.WriteExcel(file_path, result)
-        w.write_data()
-        logger.info("导出数据到excel成功！")
+        self.set_busy(True)
+        self.task_status.config(text="正在导出...")
+        self.tasks.submit(self._export_fetch, self._export_done, file_path, on_error=self._export_failed)
+
+    def _export_fetch(self, progress, file_path):
+        """后台线程：使用任务借用的连接导出"""
+        stats = exporter.export_excel(self.tasks.connection(), file_path,
+                                      lambda sheet_name, done, total: progress(
+                                          "正在导出%s %s/%s" % (sheet_name, done, total)))
+        return file_path, stats
+
+    def _export_done(self, data):
+        """界面线程：导出结束后提示结果"""
+        file_path, stats = data
+        self.set_busy(False)
+        logger.info("导出数据到excel成功！%s" % importer.format_stats(stats))
+        self.task_status.config(text="导出完成，共 %s 行" % sum(count for name, count, seconds in stats))
         mBox.showinfo("成功", message="导出到%s 完成！" % file_path)
 
+    def _export_failed(self, error):
+        """界面线程：导出出错"""
+        self.set_busy(False)
+        logger.error("导出数据到excel失败:%s" % error)
+        self.task_status.config(text="导出失败")
+        mBox.showerror("错误", message="导出失败:%s" % error)
+
 
@@ -0,0 +1,216 @@
+# 用于显示大量记录的虚拟列表
+# 基于 Treeview，按键集分页（core.paging.KeysetPager）只保留当前位置附近的几页记录：
+# 滚动接近底部/顶部时加载下一页/上一页，并丢弃另一端超出的旧页，内存占用与记录总数无关
+
+import ttkbootstrap as tb
+from core.paging import KeysetPager
+
+PAGE_SIZE = 100  # 每页记录数
+MAX_PAGES = 3  # 最多同时保留的页数
+LOAD_MARGIN = 0.1  # 可见区域距顶部/底部小于该比例时加载相邻页
+
+
+class VirtualList(tb.Frame):
+    """记录列表
+    lst = VirtualList(parent, [("id", "ID", 50), ("note_date", "日期", 90), ...])
+    lst.load(conn, "v_payments_info", "note_date", "desc")   # 返回记录总数
+    lst.load(conn, "v_payments_info", "id", "asc", where="title like ?", params=("%饭%",))
+    pager = lst.make_pager(worker_conn, ...); lst.show(pager, pager.first(), pager.count(), conn)   # 后台线程查询第一页
+    lst.locate(row_id)          # 跳到指定 id 的记录并选中
+    old = lst.fetch(row_id)     # 修改/删除记录前取出原记录
+    new = lst.patch(row_id, old)  # 写入后只更新这一行
+    lst.bind_select(handler)    # 双击记录时调用 handler(row_id)
+    """
+
+    def __init__(self, master, columns, height=30, page_size=PAGE_SIZE, max_pages=MAX_PAGES):
+        super().__init__(master)
+        self.columns = [column[0] for column in columns]
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.pager = None
+        self.rows = []  # 当前保留的记录（数据库原始值，用于计算分页键）
+        self.total = 0
+        self.at_start = True  # 已保留第一条记录
+        self.at_end = True  # 已保留最后一条记录
+        self.after_id = None
+
+        self.tree = tb.Treeview(self, columns=self.columns, show="headings", height=height, selectmode="browse")
+        for name, text, width in columns:
+            self.tree.heading(name, text=text)
+            self.tree.column(name, width=width, minwidth=40, stretch=name in ("title", "remark"))
+        self.scrollbar = tb.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_view_changed)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+    def load(self, conn, source, order_mode="id", order_key="asc", where="", params=()):
+        """按新的查询条件从第一页开始显示，返回符合条件的记录总数"""
+        pager = self.make_pager(conn, source, order_mode, order_key, where, params)
+        return self.show(pager, pager.first(), pager.count())
+
+    def make_pager(self, conn, source, order_mode="id", order_key="asc", where="", params=()):
+        """按本列表的列创建分页器，可在后台线程中用该线程的连接查询第一页和总数，再交给 show 显示"""
+        return KeysetPager(conn, source, self.columns, order_mode, order_key, where, params, self.page_size)
+
+    def show(self, pager, rows, total, conn=None):
+        """显示已查询好的第一页 rows，之后翻页使用 pager；conn 不为空时翻页改用该连接（界面线程的连接）"""
+        if conn is not None:
+            pager.conn = conn
+        self.pager = pager
+        self.total = total
+        self.reset(rows)
+        self.at_start = True
+        return self.total
+
+    def reset(self, rows):
+        self.clear()
+        self.append(rows)
+        self.at_start = False
+        self.at_end = len(rows) < self.page_size
+        self.tree.yview_moveto(0)
+
+    def clear(self):
+        """清空列表（查询条件保留）"""
+        if self.rows:
+            self.tree.delete(*self.tree.get_children())
+        self.rows = []
+        self.at_start = self.at_end = True
+
+    def item_id(self, row):
+        return str(row[self.pager.id_index])
+
+    def append(self, rows):
+        for row in rows:
+            self.tree.insert("", "end", iid=self.item_id(row), values=["" if v is None else v for v in row])
+        self.rows.extend(rows)
+
+    def prepend(self, rows):
+        for i, row in enumerate(rows):
+            self.tree.insert("", i, iid=self.item_id(row), values=["" if v is None else v for v in row])
+        self.rows[:0] = rows
+
+    def on_view_changed(self, first, last):
+        """Treeview 滚动时更新滚动条，并在空闲时检查是否需要加载相邻页"""
+        self.scrollbar.set(first, last)
+        if self.after_id is None and self.pager is not None:
+            self.after_id = self.after_idle(self.load_adjacent)
+
+    def load_adjacent(self):
+        self.after_id = None
+        if not self.rows:
+            return
+        first, last = self.tree.yview()
+        if last > 1 - LOAD_MARGIN and not self.at_end:
+            self.load_next()
+        elif first < LOAD_MARGIN and not self.at_start:
+            self.load_previous()
+
+    def load_next(self):
+        """加载下一页，超出保留页数时丢弃顶部的旧记录"""
+        rows = self.pager.after(self.rows[-1])
+        self.at_end = len(rows) < self.page_size
+        if not rows:
+            return
+        top = self.top_index()
+        self.append(rows)
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*[self.item_id(row) for row in self.rows[:excess]])
+            del self.rows[:excess]
+            self.at_start = False
+            top -= excess
+        self.scroll_to(top)
+
+    def load_previous(self):
+        """加载上一页，超出保留页数时丢弃底部的旧记录"""
+        rows = self.pager.before(self.rows[0])
+        self.at_start = len(rows) < self.page_size
+        if not rows:
+            return
+        top = self.top_index() + len(rows)
+        self.prepend(rows)
+        excess = len(self.rows) - self.max_rows
+        if excess > 0:
+            self.tree.delete(*[self.item_id(row) for row in self.rows[-excess:]])
+            del self.rows[-excess:]
+            self.at_end = False
+        self.scroll_to(top)
+
+    def top_index(self):
+        """当前可见区域第一条记录在保留记录中的位置"""
+        return round(self.tree.yview()[0] * len(self.rows))
+
+    def scroll_to(self, index):
+        """增删记录后保持原来可见的记录位置不变"""
+        if self.rows:
+            self.tree.yview_moveto(max(index, 0) / len(self.rows))
+
+    def fetch(self, row_id):
+        """按当前查询条件获取一条记录，不存在或不符合条件返回 None"""
+        if self.pager is None or row_id is None:
+            return None
+        return self.pager.fetch(row_id)
+
+    def patch(self, row_id, old_row=None):
+        """记录 row_id 新增/修改/删除后只更新这一行，old_row 为写入前 fetch 得到的记录，返回写入后的记录"""
+        new_row = self.fetch(row_id)
+        if old_row is None and new_row is not None:
+            self.total += 1
+        elif old_row is not None and new_row is None:
+            self.total -= 1
+        if new_row is None:
+            self.remove_row(row_id)
+        else:
+            self.put_row(new_row)
+        return new_row
+
+    def put_row(self, row):
+        """新增或修改一条记录：在已加载的范围内时放到排序位置，否则只从列表中移除（滚动到该处时再加载）"""
+        iid = self.item_id(row)
+        self.remove_row(iid)
+        index = len(self.rows)
+        for i, other in enumerate(self.rows):
+            if self.pager.precedes(row, other):
+                index = i
+                break
+        # 排在已加载记录之外，且那一侧还有未加载的记录
+        if (index == 0 and not self.at_start) or (index == len(self.rows) and not self.at_end):
+            return
+        self.tree.insert("", index, iid=iid, values=["" if v is None else v for v in row])
+        self.rows.insert(index, row)
+
+    def remove_row(self, row_id):
+        """从列表中移除一条记录"""
+        iid = str(row_id)
+        if not self.tree.exists(iid):
+            return False
+        self.tree.delete(iid)
+        self.rows = [row for row in self.rows if self.item_id(row) != iid]
+        return True
+
+    def locate(self, row_id):
+        """定位并选中 id 为 row_id 的记录，不在当前页时从该记录开始重新加载，找不到返回 False"""
+        if self.pager is None:
+            return False
+        iid = str(row_id)
+        if not self.tree.exists(iid):
+            rows = self.pager.starting_at(row_id)
+            if not rows:
+                return False
+            self.reset(rows)
+        self.tree.selection_set(iid)
+        self.tree.see(iid)
+        return True
+
+    def clear_selection(self):
+        self.tree.selection_remove(*self.tree.selection())
+
+    def bind_select(self, handler):
+        """双击记录时以记录 id 调用 handler"""
+        def on_double_click(event):
+            iid = self.tree.identify_row(event.y)
+            if iid:
+                handler(int(iid))
+        self.tree.bind("<Double-1>", on_double_click)
@@ -12,6 +12,7 @@ LOG_DIR = os.path.join(BASE_DIR, "log")  # 保存日志的目录
 
 LOG_PATH = os.path.join(LOG_DIR, "info.log")  # 日志文件
 DB_PATH = os.path.join(DB_DIR, "finance.db")  # 数据库文件
+BACKUP_DIR = os.path.join(DB_DIR, "backup")  # 数据库结构升级前的备份
 
 
 def my_init():
@@ -23,6 +24,7 @@ def my_init():
     # 创建数据库并初始化
     if not os.path.exists(DB_PATH):
         create_db.create()
+    # 数据库结构升级会改写数据，只在程序启动时显式执行（见 bin/finance_GUI.py），导入本模块不会升级
 
 
 # 初始化程序环境
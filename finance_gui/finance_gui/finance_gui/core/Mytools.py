@@ -1,4 +1,5 @@
 import re
+from decimal import Decimal, ROUND_HALF_UP
 
 
 def changeStrToDate(time_str):
@@ -73,3 +74,11 @@ def changeStrToTime(time_str):
     time_d = time_d.zfill(2)
     new_time_str = "-".join((time_y, time_m, time_d))
     return new_time_str
+
+
+def to_fen(money):
+    """用于将金额（元，数字或字符串）转为整数分，数据库中金额以分为单位保存，None 返回 None"""
+    if money is None or money == "":
+        return None
+    # 经十进制转换，避免 0.1 * 100 之类的二进制浮点误差
+    return int((Decimal(str(money).strip()) * 100).to_integral_value(ROUND_HALF_UP))
@@ -0,0 +1,188 @@
+# 用于统计分析的数据查询，供统计图表使用
+# 所有函数第一个参数为数据库连接，便于在界面线程或后台线程中调用
+
+import numpy as np
+from core.monthly import KIND_CATEGORY_TABLE
+from core import categories
+
+
+class YearPivot(object):
+    """全年 月份×分类 金额矩阵
+    values[i][j] 为 (i+1) 月 keys[j] 分类的金额（整数分），各取值方法返回元；
+    按分类统计时 keys 为分类 id（未分类为 None），labels 为显示名称；按事项统计时两者都是事项
+    """
+
+    def __init__(self, year, keys, labels, values):
+        self.year = year
+        self.months = list(range(1, 13))  # 行标签
+        self.keys = keys  # 列，按全年金额从大到小排列
+        self.labels = labels  # 各列的显示名称
+        self.values = values  # numpy 整数数组，形状 (12, len(keys))，单位为分
+
+    def month_totals(self):
+        """各月合计，长度12"""
+        return self.values.sum(axis=1) / 100
+
+    def label_totals(self):
+        """各分类全年合计"""
+        return self.values.sum(axis=0) / 100
+
+    def label_of(self, key):
+        """列的显示名称"""
+        return self.labels[self.keys.index(key)]
+
+    def month_dict(self, month):
+        """指定月份 {分类: 金额}，不含金额为0的分类"""
+        row = self.values[month - 1]
+        return {key: int(row[j]) / 100 for j, key in enumerate(self.keys) if row[j]}
+
+    def get(self, month, key):
+        """指定月份指定分类的金额"""
+        try:
+            j = self.keys.index(key)
+        except ValueError:
+            return 0.0
+        return int(self.values[month - 1][j]) / 100
+
+
+def yearly_pivot(conn, year, table="payments", label="category", level=None):
+    """一次分组查询获取全年 月份×分类 矩阵
+    table : payments 或 incomes
+    label : category 按分类汇总（读取按月汇总表）；title 按事项汇总（扫描交易表）
+    level : 按分类汇总时汇总到第几级分类，None 为记录最细一级的分类
+    """
+    if label == "category":
+        category_table = KIND_CATEGORY_TABLE[table]
+        query = """
+            SELECT CAST(substr(m.year_month, 6, 2) AS INTEGER) AS month,
+                cc.ancestor AS category_id,
+                SUM(m.sum_fen) AS total_fen
+            FROM monthly_totals m
+            %s
+            WHERE m.kind = ? AND m.year_month BETWEEN ? AND ?
+            GROUP BY month, category_id
+        """ % categories.rollup_join(category_table, categories.leaf_sql("m"), level)
+        rows = conn.execute(query, (table, "%s-01" % year, "%s-12" % year)).fetchall()
+    else:
+        query = """
+            SELECT CAST(strftime('%%m', p.note_date) AS INTEGER) AS month,
+                p.title AS category_label,
+                SUM(p.money_fen) AS total_fen
+            FROM %s p
+            WHERE p.is_delete = 0 AND p.note_date BETWEEN ? AND ?
+            GROUP BY month, category_label
+        """ % table
+        rows = conn.execute(query, ("%s-01-01" % year, "%s-12-31" % year)).fetchall()
+    # 列按全年金额从大到小排列
+    totals = {}
+    for _, category, amount in rows:
+        totals[category] = totals.get(category, 0) + (amount or 0)
+    keys = sorted(totals, key=lambda k: totals[k], reverse=True)
+    if label == "category":
+        labels = [categories.label(conn, category_table, key) for key in keys]
+    else:
+        labels = list(keys)
+    index = {category: j for j, category in enumerate(keys)}
+    values = np.zeros((12, len(keys)), dtype=np.int64)
+    for month, category, amount in rows:
+        if month and 1 <= month <= 12:
+            values[month - 1, index[category]] = amount or 0
+    return YearPivot(year, keys, labels, values)
+
+
+# 明细索引的分组方式：按分类分组时取汇总到的层级（分组键为分类 id），其余为分组表达式
+DETAIL_LEVELS = {
+    "category": None,  # 记录最细一级的分类
+    "parent": 1,  # 一级分类
+}
+DETAIL_LABELS = {
+    "title": "p.title",  # 事项
+    "all": "'全部'",  # 不分组，整体
+}
+
+_detail_cache = {}  # {查询参数: (数据版本, DetailIndex)}
+
+
+class DetailEntry(object):
+    """某个分组的明细：笔数、合计及最近的前 N 条记录"""
+
+    def __init__(self, count, total, records):
+        self.count = count
+        self.total = total
+        self.records = records  # [(id, note_date, title, remark, money, create_time)]
+
+
+class DetailIndex(object):
+    """图表悬停用的明细索引，悬停时只在内存中查找，不访问数据库"""
+
+    def __init__(self, entries, version):
+        self.entries = entries  # {(月份或0, 分组键): DetailEntry}，按分类分组时分组键为分类 id
+        self.version = version  # 构建时的数据版本
+
+    def get(self, label, month=0):
+        """按分组键（及月份）获取明细，没有记录返回 None"""
+        return self.entries.get((month or 0, label))
+
+
+def data_version(conn):
+    """数据库的数据版本 (PRAGMA data_version, 连接上的写入次数)，账目有变化时随之改变
+    PRAGMA data_version 在其他连接（后台导入、连接池）提交写入后改变，total_changes 计入本连接自己的写入"""
+    return conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+
+def load_detail_index(conn, table, start_date, end_date, label="category", by_month=False, top_n=5):
+    """一次分组查询构建明细索引
+    label : 分组方式，见 DETAIL_LEVELS 与 DETAIL_LABELS
+    by_month : 是否再按月份分组（年度柱状图使用）
+    """
+    joins = ""
+    if label in DETAIL_LEVELS:
+        joins = categories.rollup_join(KIND_CATEGORY_TABLE[table], categories.leaf_sql("p"), DETAIL_LEVELS[label])
+        group_sql = "cc.ancestor"
+    else:
+        group_sql = DETAIL_LABELS[label]
+    month_sql = "CAST(strftime('%m', p.note_date) AS INTEGER)" if by_month else "0"
+    query = """
+        SELECT month, group_key, id, note_date, title, remark, money, create_time, cnt, total
+        FROM (
+            SELECT *,
+                ROW_NUMBER() OVER (PARTITION BY month, group_key ORDER BY note_date DESC, id DESC) AS rn,
+                COUNT(*) OVER (PARTITION BY month, group_key) AS cnt,
+                SUM(money_fen) OVER (PARTITION BY month, group_key) / 100.0 AS total
+            FROM (
+                SELECT %s AS month, %s AS group_key,
+                    p.id, p.note_date, p.title, p.remark, p.money_fen / 100.0 AS money, p.create_time, p.money_fen
+                FROM %s p
+                %s
+                WHERE p.is_delete = 0 AND p.note_date BETWEEN ? AND ?
+            )
+        )
+        WHERE rn <= ?
+        ORDER BY month, group_key, rn
+    """ % (month_sql, group_sql, table, joins)
+    entries = {}
+    for row in conn.execute(query, (start_date, end_date, top_n)):
+        key = (row[0], row[1])
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = DetailEntry(row[8], row[9] or 0, [])
+        entry.records.append(row[2:8])
+    return DetailIndex(entries, data_version(conn))
+
+
+def get_detail_index(conn, table, start_date, end_date, label="category", by_month=False, top_n=5):
+    """获取明细索引，conn 上的账目未变化时直接使用缓存（数据版本只在同一连接上可比较）"""
+    version = data_version(conn)
+    key = (table, start_date, end_date, label, by_month, top_n)
+    cached = _detail_cache.get(key)
+    if cached is not None and cached.version == version:
+        return cached
+    index = load_detail_index(conn, table, start_date, end_date, label, by_month, top_n)
+    index.version = version
+    _detail_cache[key] = index
+    return index
+
+
+def invalidate_detail_cache():
+    """清空明细索引缓存"""
+    _detail_cache.clear()
@@ -0,0 +1,135 @@
+# 用于账户余额：期初余额 + 各账户每月净额（account_monthly）+ 月末余额快照（account_snapshots）
+# 每月净额与快照由统一交易表上的触发器同步增减（见 migrate.balance_triggers），
+# 当前余额 = 最近一个快照 + 快照之后各月的净额，不再扫描交易记录；余额走势图直接读取快照；
+# 已结束的月份在程序运行时由 checkpoint 补建快照
+
+import datetime
+from core.migrate import account_monthly_select_sql, balance_amount_sql
+
+# 当前余额：最近快照（没有快照时为期初余额）加上其后各月净额，各表均按主键查找
+CURRENT_SQL = """
+    SELECT a.id, a.title, a.opening_fen,
+           ifnull(s.balance_fen, a.opening_fen) + ifnull((SELECT sum(am.net_fen) FROM account_monthly am
+               WHERE am.account_id = a.id AND am.year_month > ifnull(s.year_month, '')), 0),
+           s.year_month
+    FROM accounts a
+    LEFT JOIN account_snapshots s ON s.account_id = a.id
+        AND s.year_month = (SELECT max(year_month) FROM account_snapshots WHERE account_id = a.id)
+    ORDER BY a.id
+"""
+
+
+def next_month(year_month):
+    """下一个月份，如 2025-12 -> 2026-01"""
+    year, month = int(year_month[:4]), int(year_month[5:7])
+    return "%04d-%02d" % (year + month // 12, month % 12 + 1)
+
+
+def last_closed_month(today=None):
+    """today（默认今天）之前最近一个已结束的月份"""
+    today = today or datetime.date.today()
+    first = today.replace(day=1) - datetime.timedelta(days=1)
+    return first.strftime("%Y-%m")
+
+
+def walk(opening_fen, snapshots, nets, first, last):
+    """自 first 至 last 逐月推算月末余额 [(月份, 余额分)]：有快照的月份以快照为准，其余月份在上月余额上加当月净额
+    snapshots、nets 为 {月份: 分}，first 之前的净额须已计入 opening_fen"""
+    balance = opening_fen
+    result = []
+    month = first
+    while month <= last:
+        balance = snapshots[month] if month in snapshots else balance + nets.get(month, 0)
+        result.append((month, balance))
+        month = next_month(month)
+    return result
+
+
+def checkpoint(conn, today=None):
+    """为已结束的月份补建月末余额快照（每个账户自第一笔记录所在月份起逐月连续），返回新建的快照数"""
+    until = last_closed_month(today)
+    created = []
+    for account_id, opening_fen in conn.execute("select id, opening_fen from accounts").fetchall():
+        snapshots = dict(conn.execute("select year_month, balance_fen from account_snapshots "
+                                      "where account_id=? and year_month <= ?", (account_id, until)))
+        nets = dict(conn.execute("select year_month, net_fen from account_monthly where account_id=? and year_month <= ?",
+                                 (account_id, until)))
+        if not nets and not snapshots:
+            continue
+        first = min(list(nets) + list(snapshots))
+        if len(snapshots) == len(range_months(first, until)):
+            continue  # 快照已完整
+        created += [(account_id, month, balance)
+                    for month, balance in walk(opening_fen, snapshots, nets, first, until) if month not in snapshots]
+    if created:
+        with conn:
+            conn.executemany("insert into account_snapshots (account_id, year_month, balance_fen) values (?,?,?)",
+                             created)
+    return len(created)
+
+
+def range_months(first, last):
+    """[first, last] 内的全部月份"""
+    months = []
+    while first <= last:
+        months.append(first)
+        first = next_month(first)
+    return months
+
+
+def current_balances(conn):
+    """各账户的当前余额 [(账户 id, 账户名称, 期初余额分, 当前余额分, 最近快照月份)]"""
+    return conn.execute(CURRENT_SQL).fetchall()
+
+
+def set_opening(conn, account_id, opening_fen):
+    """修改账户期初余额，已有快照由触发器同步调整"""
+    with conn:
+        conn.execute("update accounts set opening_fen=? where id=?", (opening_fen, account_id))
+
+
+def history(conn, start_month, end_month):
+    """[起始月份, 结束月份] 内各账户的月末余额：返回 (月份列表, [(账户 id, 账户名称, [余额分])])
+    已建快照的月份直接读取快照，只有第一个快照之前与最近快照之后的月份才累加每月净额"""
+    months = range_months(start_month, end_month)
+    result = []
+    for account_id, title, opening_fen in conn.execute("select id, title, opening_fen from accounts order by id").fetchall():
+        snapshots = dict(conn.execute("select year_month, balance_fen from account_snapshots "
+                                      "where account_id=? and year_month <= ?", (account_id, end_month)))
+        low, high = (min(snapshots), max(snapshots)) if snapshots else ("9999", "")
+        nets = dict(conn.execute("select year_month, net_fen from account_monthly where account_id=? "
+                                 "and year_month <= ? and (year_month < ? or year_month > ?)",
+                                 (account_id, end_month, low, high)))
+        first = min(list(nets) + list(snapshots) + [start_month])
+        balances = walk(opening_fen, snapshots, nets, first, end_month)
+        result.append((account_id, title, [balance for month, balance in balances if month >= start_month]))
+    return months, result
+
+
+def rebuild(conn, today=None):
+    """从统一交易表重新统计每月净额并重建全部快照（在一个事务内完成），返回快照数"""
+    with conn:
+        conn.execute("DELETE FROM account_monthly")
+        conn.execute("INSERT INTO account_monthly (account_id, year_month, count, net_fen) " + account_monthly_select_sql())
+        conn.execute("DELETE FROM account_snapshots")
+    return checkpoint(conn, today)
+
+
+def check(conn):
+    """将每月净额、快照和当前余额与直接扫描交易记录的结果比较，返回不一致的 [(项目, 扫描结果, 保存的值)]"""
+    diffs = []
+    expected = {row[:2]: row[2:] for row in conn.execute(account_monthly_select_sql())}
+    actual = {row[:2]: row[2:] for row in conn.execute("select account_id, year_month, count, net_fen from account_monthly")}
+    diffs += [(key, expected.get(key), actual.get(key)) for key in sorted(set(expected) | set(actual))
+              if expected.get(key) != actual.get(key)]
+    scan = "select a.opening_fen + ifnull((select sum(%s) from ledger l where l.is_delete = 0 and l.account_id = a.id " \
+           "and substr(l.note_date, 1, 7) <= ?), 0) from accounts a where a.id = ?" % balance_amount_sql("l")
+    for account_id, year_month, balance_fen in conn.execute("select * from account_snapshots").fetchall():
+        balance = conn.execute(scan, (year_month, account_id)).fetchone()[0]
+        if balance != balance_fen:
+            diffs.append(((account_id, year_month), balance, balance_fen))
+    for account_id, title, opening_fen, balance_fen, snapshot_month in current_balances(conn):
+        balance = conn.execute(scan, ("9999", account_id)).fetchone()[0]
+        if balance != balance_fen:
+            diffs.append(((account_id, "当前"), balance, balance_fen))
+    return diffs
@@ -0,0 +1,63 @@
+# 用于按分类层级统计
+# 分类表通过 pid 指向上级分类，迁移 8 为每张分类表建立闭包表（见 migrate.closure_sql），记下每个分类的全部上级；
+# 交易记录与按月汇总的分类取最细的一级（有二级分类取二级，否则取一级），按任意层级汇总只需与闭包表按 id 连接一次，
+# 层级多于两级时查询也不需要修改；
+# 统计结果、明细索引与明细查询都以分类 id 区分分类，名称（各级名称以 —— 连接）只用于显示
+
+from core.migrate import closure_table
+from core import dims
+
+UNCATEGORIZED = "未分类"  # 没有分类（或分类已删除）的显示名称
+SEPARATOR = "——"  # 各级分类名称的连接符
+
+
+def leaf_sql(alias):
+    """alias 表（交易表或按月汇总表）中记录最细一级分类的 id，没有分类为 NULL"""
+    return "COALESCE(NULLIF({0}.category_cid, 0), NULLIF({0}.category_pid, 0))".format(alias)
+
+
+def level_condition(alias, level=None):
+    """闭包表 alias 中的行是否为分类汇总到第 level 级时所在的分组：
+    取分类在第 level 级的上级，分类本身不到 level 级时取自身；level 为 None 时不汇总，取自身"""
+    if level is None:
+        return "%s.depth = 0" % alias
+    return "(%s.ancestor_level = %d OR (%s.depth = 0 AND %s.ancestor_level < %d))" % (
+        alias, int(level), alias, alias, int(level))
+
+
+def rollup_join(category_table, leaf, level=None, alias="cc"):
+    """与闭包表的连接子句，每条记录连接到一行，alias.ancestor 为汇总后的分类 id（没有分类为 NULL）
+    leaf 为记录最细一级分类的表达式，见 leaf_sql"""
+    return "LEFT JOIN %s %s ON %s.descendant = %s AND %s" % (
+        closure_table(category_table), alias, alias, leaf, level_condition(alias, level))
+
+
+def group_condition(category_table, leaf, category_id, level=None):
+    """记录属于汇总分组 category_id（按第 level 级汇总，None 为未分类）的查询条件，返回 (where, params)"""
+    closure = closure_table(category_table)
+    if category_id is None:
+        return "(%s IS NULL OR %s NOT IN (SELECT descendant FROM %s))" % (leaf, leaf, closure), ()
+    return "%s IN (SELECT descendant FROM %s cc WHERE cc.ancestor = ? AND %s)" % (
+        leaf, closure, level_condition("cc", level)), (category_id,)
+
+
+def label(conn, category_table, category_id):
+    """分类的显示名称：自顶级分类起各级名称以 —— 连接，没有分类为 未分类"""
+    titles = [title for title in dims.cache.table(conn, category_table).path(category_id) if title]
+    return SEPARATOR.join(titles) if titles else UNCATEGORIZED
+
+
+def check_closure(conn, category_table):
+    """将闭包表与按 pid 逐级向上查找得到的层级关系比较，返回不一致的 [(分类 id, 上级 id, 闭包表中的行, 期望的行)]"""
+    parents = dict(conn.execute("select id, pid from %s" % category_table).fetchall())
+    expected = {}
+    for nid in parents:
+        chain = [nid]
+        while parents.get(chain[-1]) in parents and parents[chain[-1]] not in chain:
+            chain.append(parents[chain[-1]])
+        for depth, ancestor in enumerate(chain):
+            expected[(ancestor, nid)] = (depth, len(chain) - depth)
+    actual = {row[:2]: row[2:] for row in conn.execute(
+        "select ancestor, descendant, depth, ancestor_level from %s" % closure_table(category_table))}
+    return [(key[1], key[0], actual.get(key), expected.get(key))
+            for key in sorted(set(expected) | set(actual)) if actual.get(key) != expected.get(key)]
@@ -0,0 +1,86 @@
+# 用于统一管理数据库连接
+# 界面线程共用一个长连接；后台线程从连接池借用连接，用完归还
+# 所有连接使用相同的 PRAGMA 设置，并开启较大的语句缓存，避免重复解析 sql
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from conf import settings
+
+CACHED_STATEMENTS = 256  # 语句缓存条数，足够覆盖程序中全部查询语句
+POOL_SIZE = 4  # 后台线程连接池大小
+
+# 每个连接打开后执行的 PRAGMA
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",  # 读写不互相阻塞，后台线程读取时界面仍可写入
+    "PRAGMA synchronous=NORMAL",  # WAL 模式下足够安全，减少 fsync
+    "PRAGMA cache_size=-16000",  # 页缓存约 16MB（负数单位为 KB）
+    "PRAGMA mmap_size=268435456",  # 256MB 内存映射读取
+    "PRAGMA temp_store=MEMORY",  # 排序、分组使用的临时表放在内存
+]
+
+_local = threading.local()  # 每个线程各自的连接
+_pool = queue.Queue(maxsize=POOL_SIZE)  # 后台线程连接池
+_pool_lock = threading.Lock()
+_pool_created = 0  # 连接池已创建的连接数
+_all_conns = []  # 所有打开的连接，用于退出时关闭
+
+
+def connect(db_path=None):
+    """新建一个按统一设置配置好的连接"""
+    conn = sqlite3.connect(db_path or settings.DB_PATH, cached_statements=CACHED_STATEMENTS,
+                           check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    _all_conns.append(conn)
+    return conn
+
+
+def get_connection():
+    """获取当前线程的长连接（界面线程中所有页面共用同一个连接）"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _local.conn = conn
+    return conn
+
+
+@contextmanager
+def worker_connection():
+    """后台线程从连接池借用一个连接，使用完毕自动归还
+    with db.worker_connection() as conn:
+        ...
+    """
+    global _pool_created
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        with _pool_lock:
+            create = _pool_created < POOL_SIZE
+            if create:
+                _pool_created += 1
+        # 连接数已达上限时等待其他线程归还
+        conn = connect() if create else _pool.get()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put(conn)
+
+
+def close_all():
+    """关闭所有连接，程序退出时调用"""
+    global _pool_created
+    while _all_conns:
+        conn = _all_conns.pop()
+        try:
+            conn.execute("PRAGMA optimize")  # 按需更新统计信息，记录数变化较大后查询仍能选对索引
+            conn.close()
+        except Exception:
+            pass
+    _local.__dict__.clear()
+    while not _pool.empty():
+        _pool.get_nowait()
+    _pool_created = 0
@@ -0,0 +1,111 @@
+# 用于缓存账户、交易方、分类、成员等维度表
+# 各维度表在第一次使用时整表读入内存，之后按名称查 id、按 id 查名称、取下级分类都不再查询数据库；
+# 维度表只在新增标签、导入时自动新建、收入页补充“其他”时写入，这些写入提交后调用 cache.add 直接更新缓存，
+# 其他途径修改了维度表时调用 cache.invalidate 丢弃缓存，下次使用时重新读取
+
+import threading
+from core.migrate import CATEGORY_TABLES
+
+# 维度表，分类表（CATEGORY_TABLES）有上级分类 pid
+DIMENSION_TABLES = ["accounts", "sellers", "members"] + CATEGORY_TABLES
+
+
+class DimensionTable(object):
+    """一张维度表的缓存，按 id 顺序保存，同名时按名称查到的是 id 最小的一条（与 select id ... where title=? 一致）"""
+
+    def __init__(self, name, rows, lock):
+        self.name = name
+        self.lock = lock
+        self.names = {}  # id -> 名称
+        self.ids = {}  # 名称 -> id
+        self.keys = {}  # (名称, 上级 id) -> id
+        self.children = {}  # 上级 id -> [名称]，顶级分类的上级 id 为 None
+        self.parents = {}  # id -> 上级 id
+        for row in rows:
+            self.add(*row)
+
+    def add(self, nid, title, pid=None):
+        with self.lock:
+            self.names[nid] = title
+            self.ids.setdefault(title, nid)
+            self.keys.setdefault((title, pid), nid)
+            self.children.setdefault(pid, []).append(title)
+            self.parents[nid] = pid
+
+    def id_of(self, title):
+        """名称对应的 id，没有返回 None"""
+        return self.ids.get(title)
+
+    def child_id(self, title, pid):
+        """上级为 pid 的分类中名称为 title 的 id，没有返回 None"""
+        return self.keys.get((title, pid))
+
+    def title_of(self, nid):
+        return self.names.get(nid)
+
+    def path(self, nid):
+        """分类自顶级分类起的各级名称，不存在的分类返回空列表"""
+        titles = []
+        with self.lock:
+            while nid in self.names and len(titles) <= len(self.names):  # 防止上级关系成环
+                titles.append(self.names[nid])
+                nid = self.parents.get(nid)
+        return titles[::-1]
+
+    def titles(self):
+        """全部名称（下拉框选项）"""
+        with self.lock:
+            return tuple(self.names.values())
+
+    def child_titles(self, pid=None):
+        """上级为 pid 的分类名称，pid 为 None 时为顶级分类"""
+        with self.lock:
+            return tuple(self.children.get(pid, ()))
+
+    def matching_ids(self, key):
+        """名称包含 key 的 id（英文字母不区分大小写，与 like 一致）"""
+        key = key.lower()
+        with self.lock:
+            return [nid for nid, title in self.names.items() if title is not None and key in title.lower()]
+
+
+class DimensionCache(object):
+    """所有维度表的缓存，程序内共用一个：dims.cache
+    accounts = cache.table(conn, "accounts")
+    accounts.id_of("微信支付")
+    cache.add("accounts", new_id, "新账户")   # 写入维度表并提交后
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()  # 后台线程（查询页面）也会读取
+        self.tables = {}
+
+    def table(self, conn, name):
+        """维度表的缓存，第一次使用时用 conn 读取整表"""
+        with self.lock:
+            table = self.tables.get(name)
+            if table is None:
+                if name in CATEGORY_TABLES:
+                    sql = "select id, title, pid from %s order by id" % name
+                else:
+                    sql = "select id, title from %s order by id" % name
+                table = self.tables[name] = DimensionTable(name, conn.execute(sql).fetchall(), self.lock)
+            return table
+
+    def add(self, name, nid, title, pid=None):
+        """维度表新增一条记录（已提交）后更新缓存，尚未读取的表不需要处理"""
+        with self.lock:
+            table = self.tables.get(name)
+            if table is not None:
+                table.add(nid, title, pid)
+
+    def invalidate(self, name=None):
+        """丢弃某张表或全部表的缓存"""
+        with self.lock:
+            if name is None:
+                self.tables.clear()
+            else:
+                self.tables.pop(name, None)
+
+
+cache = DimensionCache()
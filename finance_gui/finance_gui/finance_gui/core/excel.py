@@ -11,45 +11,61 @@ class ReadExcel(object):
         :param file_name: 文件名 ---> str类型
         :param sheet_name: 表单名 ———> str类型
         """
-        # 打开文件
-        self.wb = openpyxl.load_workbook(file_name)
+        # 打开文件，只读模式按需解析行数据，不把整个工作簿载入内存
+        self.wb = openpyxl.load_workbook(file_name, read_only=True)
         self.sheets = ["支出", "收入", "借入", "借出", "还款", "记录"]
         self.sheets_names = self.wb.sheetnames  # 获取excel文档中所有工作簿表
 
-    def read_data(self):
-        result = {}
+    def iter_sheets(self):
+        """逐个工作表返回 (表名, 表头, 数据行迭代器, 数据行数)
+        数据行为单元格值的元组，边读边用，不保留已读过的行；数据行数未知时为 None"""
         for sheet_name in self.sheets:
-            logger.debug("reading %s" % sheet_name)
             if sheet_name not in self.sheets_names:
-                # 不在自己需要的表明则跳出本次循环，不进行数据获取否则会出错
                 continue
-            # 选择表单
-            self.sh = self.wb[sheet_name]
-            # 按行读取数据转化为列表
-            rows_data = list(self.sh.rows)
-            # print(rows_data)
-            # 获取表单的表头信息
-            titles = []
-            for title in rows_data[0]:
-                titles.append(title.value)
-            # print(titles)
+            sh = self.wb[sheet_name]
+            rows = sh.iter_rows(values_only=True)
+            titles = next(rows, None)
+            if titles is None:
+                continue
+            titles = list(titles)
             logger.info("读取到%s标题表头为：%s" % (sheet_name, titles))
-            # 定义一个空列表用来存储测试用例
-            cases = []
-            for case in rows_data[1:]:
-                # print(case)
-                data = []
-                for cell in case:
-                    # 获取一条测试用例数据
-                    data.append(cell.value)
-                    # print(cell.value, type(cell.value))
-                case_data = dict(list(zip(titles, data)))
-                cases.append(case_data)
-            result[sheet_name] = cases
-            logger.debug("%s : %s" % (sheet_name, cases))
+            size = sh.max_row - 1 if sh.max_row else None
+            yield sheet_name, titles, rows, size
+
+    def close(self):
+        self.wb.close()
+
+    def read_data(self):
+        """一次读取所有工作表，返回 {表名: [{表头: 值}]}（数据量大时使用 iter_sheets）"""
+        result = {}
+        for sheet_name, titles, rows, size in self.iter_sheets():
+            result[sheet_name] = [dict(zip(titles, row)) for row in rows]
+            logger.debug("%s : %s" % (sheet_name, result[sheet_name]))
         return result
 
 
+# 导出的表头
+SHEET_TITLES = {
+    "支出": ["日期", "事项", "支出金额", "支出途径", "备注", "交易方", "一级分类", "二级分类", "对象", "创建时间", "修改时间"],
+    "收入": ["日期", "事项", "收入金额", "收入途径", "备注", "交易方", "一级分类", "二级分类", "对象", "创建时间", "修改时间"],
+    "借入": ["日期", "事项", "金额", "账户", "备注", "交易方", "创建时间", "修改时间"],
+    "借出": ["日期", "事项", "金额", "账户", "备注", "交易方", "创建时间", "修改时间"],
+    "还款": ["日期", "事项", "金额", "账户", "备注", "交易方", "创建时间", "修改时间", "所还借款"],
+    "记录": ["日期", "事项", "记录", "额外备注", "创建时间", "修改时间"],
+}
+
+# 导出的列宽
+NOTE_COLUMN_WIDTHS = {"A": 13, "B": 20, "C": 30, "D": 30, "E": 35, "F": 25}
+LEDGER_COLUMN_WIDTHS = {"A": 13, "B": 50, "C": 15, "D": 20, "E": 40, "F": 10, "G": 10, "H": 10, "I": 10, "J": 20, "K": 20}
+
+
+def set_column_widths(sh, sheet_name):
+    """设置工作表列宽"""
+    widths = NOTE_COLUMN_WIDTHS if sheet_name == "记录" else LEDGER_COLUMN_WIDTHS
+    for column, width in widths.items():
+        sh.column_dimensions[column].width = width
+
+
 class WriteExcel(object):
     # 写出excel数据的类
     def __init__(self, file_name, result):
@@ -68,56 +84,45 @@ class WriteExcel(object):
         for sheet_name in self.result:
             self.sh = self.wb.create_sheet(sheet_name)
             # 设置列宽
-            if sheet_name == "记录":
-                self.sh.column_dimensions["A"].width = 13
-                self.sh.column_dimensions["B"].width = 20
-                self.sh.column_dimensions["C"].width = 30
-                self.sh.column_dimensions["D"].width = 30
-                self.sh.column_dimensions["E"].width = 35
-                self.sh.column_dimensions["F"].width = 25
-            else:
-                self.sh.column_dimensions["A"].width = 13
-                self.sh.column_dimensions["B"].width = 50
-                self.sh.column_dimensions["C"].width = 15
-                self.sh.column_dimensions["D"].width = 20
-                self.sh.column_dimensions["E"].width = 40
-                self.sh.column_dimensions["F"].width = 10
-                self.sh.column_dimensions["G"].width = 10
-                self.sh.column_dimensions["H"].width = 10
-                self.sh.column_dimensions["I"].width = 10
-                self.sh.column_dimensions["J"].width = 20
-                self.sh.column_dimensions["K"].width = 20
-            # 获取表单的表头信息
-            titles = []
-            if sheet_name == "支出":
-                titles = ["日期", "事项", "支出金额", "支出途径", "备注", "交易方", "一级分类", "二级分类", "对象", "创建时间", "修改时间"]
-            elif sheet_name == "收入":
-                titles = ["日期", "事项", "收入金额", "收入途径", "备注", "交易方", "一级分类", "二级分类", "对象", "创建时间", "修改时间"]
-            elif sheet_name in ["借入", "借出", "还款"]:
-                titles = ["日期", "事项", "金额", "账户", "备注", "交易方", "创建时间", "修改时间"]
-            else:
-                titles = ["日期", "事项", "记录", "额外备注", "创建时间", "修改时间"]
-            # print(sheet_name)
-            # print(titles)
-
+            set_column_widths(self.sh, sheet_name)
             # 插入表头
-            col = 1
-            row = 1
-            for title in titles:
-                self.sh.cell(row=row, column=col, value=title)
-                col += 1
-            data = self.result[sheet_name]
+            self.sh.append(SHEET_TITLES[sheet_name])
             # 插入数据
-            for note in data:
-                row += 1
-                col = 1
-                for i in note:
-                    # print(i)
-                    self.sh.cell(row=row, column=col, value=i)
-                    col += 1
+            for note in self.result[sheet_name]:
+                self.sh.append(note)
 
         self.wb.remove(self.wb["Sheet"])  # 删除默认创建的空工作簿
         # 保存到文件并关闭工作簿
         self.wb.save(self.file_name)
         self.wb.close()
 
+
+class StreamWriteExcel(object):
+    """流式写出excel：只写模式的工作簿，行数据写入后即序列化到临时文件，内存占用与行数无关
+    w = StreamWriteExcel(file_name)
+    w.write_sheet("支出", cursor)     # rows 可以是数据库游标等任意可迭代对象
+    w.save()
+    """
+
+    def __init__(self, file_name):
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.file_name = file_name
+
+    def write_sheet(self, sheet_name, rows, progress=None, every=5000):
+        """写出一个工作表，每写出 every 行调用一次 progress(已写行数)，返回写出的行数"""
+        sh = self.wb.create_sheet(sheet_name)
+        set_column_widths(sh, sheet_name)  # 只写模式下列宽须在写入数据前设置
+        sh.append(SHEET_TITLES[sheet_name])
+        count = 0
+        for row in rows:
+            sh.append(row)
+            count += 1
+            if progress is not None and count % every == 0:
+                progress(count)
+        if progress is not None and count % every:
+            progress(count)
+        return count
+
+    def save(self):
+        self.wb.save(self.file_name)
+        self.wb.close()
@@ -0,0 +1,45 @@
+# 用于将数据库中的记录导出到 excel 备份文件
+# 逐个视图用游标按行读取，直接追加到只写模式的工作簿，不把整个数据集读入内存；
+# 可在后台线程中调用（传入该线程的连接），通过 progress 回调报告进度
+
+import time
+from core import excel
+from core import loans
+from core.logger import logger
+
+# 导出的工作表：(工作表名, 视图, 列)，列顺序与 excel.SHEET_TITLES 一致
+LEDGER_COLUMNS = "note_date,title,money,account,remark,seller,create_time,modify_time"
+LEDGER_FULL_COLUMNS = "note_date,title,money,account,remark,seller,category_p,category_c,member,create_time,modify_time"
+# 还款另写出所还借款的类型（借入/借出），恢复备份后还款计入余额的正负不变；借款关联本身不导出
+REPAYMENT_COLUMNS = LEDGER_COLUMNS + ",case loan_kind %s end" % " ".join(
+    "when '%s' then '%s'" % item for item in loans.KIND_TITLES.items())
+EXPORT_SHEETS = [
+    ("支出", "v_payments_info", LEDGER_FULL_COLUMNS),
+    ("收入", "v_incomes_info", LEDGER_FULL_COLUMNS),
+    ("借入", "v_borrows_info", LEDGER_COLUMNS),
+    ("借出", "v_lends_info", LEDGER_COLUMNS),
+    ("还款", "v_repayments_info", REPAYMENT_COLUMNS),
+    ("记录", "v_notes_info", "note_date,title,remark,remark2,create_time,modify_time"),
+]
+
+
+def export_excel(conn, file_path, progress=None):
+    """导出所有记录到 file_path，progress(工作表名, 已写行数, 总行数) 报告进度
+    返回各工作表 [(工作表名, 行数, 用时秒)]"""
+    w = excel.StreamWriteExcel(file_path)
+    stats = []
+    for sheet_name, view, columns in EXPORT_SHEETS:
+        start = time.perf_counter()
+        total = conn.execute("select count(*) from %s" % view).fetchone()[0]
+        if progress is not None:
+            progress(sheet_name, 0, total)
+        cursor = conn.execute("select %s from %s order by note_date" % (columns, view))
+        try:
+            count = w.write_sheet(sheet_name, cursor,
+                                  progress=(lambda n, name=sheet_name, t=total: progress(name, n, t)) if progress else None)
+        finally:
+            cursor.close()
+        stats.append((sheet_name, count, time.perf_counter() - start))
+        logger.debug("导出%s %s 行" % (sheet_name, count))
+    w.save()
+    return stats
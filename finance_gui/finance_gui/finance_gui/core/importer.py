@@ -0,0 +1,212 @@
+# 用于从 excel 备份文件批量导入数据
+# 工作表逐行流式读取；账户、交易方、分类、成员从共享的维度缓存（core.dims）解析 id，表中没有时插入并直接记下新 id，
+# 导入提交后新建的记录再并入维度缓存；
+# 记录按批 executemany 写入，整个导入在一个事务内完成，出错时全部回滚；
+# 交易类工作表写入统一交易表 ledger（kind 列为原表名）；
+# 导入行数多于表中已有行数时，先删除该表的索引和全文索引的同步触发器，写完后再一次性重建，避免逐行维护索引
+
+import time
+from core.Mytools import changeStrToDate, to_fen
+from core import dims
+from core import loans
+from core.migrate import LEDGER
+from core.logger import logger
+
+BATCH_SIZE = 1000  # 每批写入的行数
+
+# 交易类工作表：工作表名 -> (数据表, 金额列, 账户列, 分类表)
+LEDGER_SHEETS = {
+    "支出": ("payments", "支出金额", "支出途径", "pay_categorys"),
+    "收入": ("incomes", "收入金额", "收入途径", "income_categorys"),
+    "借入": ("borrows", "金额", "账户", None),
+    "借出": ("lends", "金额", "账户", None),
+    "还款": ("repayments", "金额", "账户", None),
+}
+NOTE_SHEET = "记录"
+# 还款工作表“所还借款”列：借入/借出 -> 还款的 loan_kind（旧备份没有该列，还款均计为支出）
+LOAN_KINDS = {title: kind for kind, title in loans.KIND_TITLES.items()}
+
+
+class DimensionMap(object):
+    """导入时解析维度表 标题 -> id，先查共享的维度缓存，表中没有时插入新记录
+    新建的记录在导入提交前只记在本对象中（导入失败回滚时缓存不受影响），提交后调用 publish 并入缓存
+    accounts = DimensionMap(c, "accounts", dims.cache.table(conn, "accounts"))                 # 按 title 查找
+    categorys = DimensionMap(c, "pay_categorys", dims.cache.table(conn, "pay_categorys"), True) # 按 (title, pid) 查找
+    """
+
+    def __init__(self, cursor, table, cached, with_pid=False):
+        self.c = cursor
+        self.table = table
+        self.cached = cached
+        self.with_pid = with_pid
+        self.created = {}  # 本次导入新建的 {key: id}
+
+    def get(self, title, pid=None):
+        """获取 id，title 为空返回 None"""
+        if title is None:
+            return None
+        key = (title, pid) if self.with_pid else title
+        nid = self.created.get(key)
+        if nid is None:
+            nid = self.cached.child_id(title, pid) if self.with_pid else self.cached.id_of(title)
+        if nid is None:
+            # 数据库中没有则新建，避免源数据被设置为 null 丢失
+            if self.with_pid:
+                self.c.execute("insert into %s (title,pid) values (?,?)" % self.table, key)
+            else:
+                self.c.execute("insert into %s (title) values (?)" % self.table, (title,))
+            nid = self.created[key] = self.c.lastrowid
+            logger.info("insert into %s values %s" % (self.table, key))
+        return nid
+
+    def publish(self):
+        """导入提交后把新建的记录并入维度缓存"""
+        for key, nid in sorted(self.created.items(), key=lambda item: item[1]):
+            if self.with_pid:
+                dims.cache.add(self.table, nid, *key)
+            else:
+                dims.cache.add(self.table, nid, key)
+
+
+class ExcelImporter(object):
+    """批量导入
+    importer = ExcelImporter(conn)
+    stats = importer.run(excel.ReadExcel(path).iter_sheets())   # [(工作表名, 行数, 用时秒)]
+    """
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.dims = {}
+
+    def run(self, sheets):
+        """sheets 为 (工作表名, 表头, 数据行迭代器, 数据行数) 序列，整体在一个事务内导入"""
+        stats = []
+        isolation_level = self.conn.isolation_level
+        self.conn.isolation_level = None  # 手动控制事务
+        c = self.conn.cursor()
+        try:
+            c.execute("BEGIN")
+            self.dims = {table: DimensionMap(self.conn.cursor(), table, dims.cache.table(self.conn, table),
+                                             table in dims.CATEGORY_TABLES)
+                         for table in dims.DIMENSION_TABLES}
+            for sheet_name, titles, rows, size in sheets:
+                start = time.perf_counter()
+                count = self.import_sheet(c, sheet_name, titles, rows, size)
+                stats.append((sheet_name, count, time.perf_counter() - start))
+            c.execute("COMMIT")
+            for dimension in self.dims.values():
+                dimension.publish()
+            c.execute("PRAGMA optimize")  # 大量写入后更新查询优化器的统计信息，搜索等查询才能选对索引
+        except Exception:
+            if self.conn.in_transaction:
+                c.execute("ROLLBACK")
+            raise
+        finally:
+            self.conn.isolation_level = isolation_level
+            c.close()
+        return stats
+
+    def import_sheet(self, c, sheet_name, titles, rows, size=None):
+        """导入一个工作表，返回写入的行数"""
+        columns = {title: i for i, title in enumerate(titles) if title is not None}
+        for key in ("日期", "事项") if sheet_name != NOTE_SHEET else ("日期",):
+            if key not in columns:
+                raise KeyError("%s 表缺少“%s”列" % (sheet_name, key))
+
+        def get(row, key):
+            # 按表头取值，表中没有该列时为 None
+            i = columns.get(key)
+            return row[i] if i is not None and i < len(row) else None
+
+        if sheet_name == NOTE_SHEET:
+            table = "notes"
+            sql = "insert into notes(note_date, title, remark, remark2,create_time,modify_time) values(?,?,?,?,?,?)"
+            values = self.note_values(get, rows)
+        elif sheet_name in LEDGER_SHEETS:
+            kind, money_key, account_key, category_table = LEDGER_SHEETS[sheet_name]
+            table = LEDGER
+            if category_table:
+                sql = "insert into ledger(kind, note_date, title, remark, money_fen, account_id, seller_id, category_pid, category_cid, member_id,create_time,modify_time) values('%s',?,?,?,?,?,?,?,?,?,?,?)" % kind
+            elif kind == "repayments":
+                sql = "insert into ledger(kind, note_date, title, remark, money_fen, account_id, seller_id,create_time,modify_time,loan_kind) values('%s',?,?,?,?,?,?,?,?,?)" % kind
+            else:
+                sql = "insert into ledger(kind, note_date, title, remark, money_fen, account_id, seller_id,create_time,modify_time) values('%s',?,?,?,?,?,?,?,?)" % kind
+            values = self.ledger_values(get, rows, money_key, account_key, category_table, kind == "repayments")
+        else:
+            return 0
+
+        rebuild_sqls = self.drop_indexes(c, table, size)
+        count = 0
+        batch = []
+        for item in values:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                c.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            c.executemany(sql, batch)
+            count += len(batch)
+        for rebuild_sql in rebuild_sqls:
+            c.execute(rebuild_sql)
+        return count
+
+    def ledger_values(self, get, rows, money_key, account_key, category_table, loan_kind=False):
+        """交易类工作表每行要写入的值，loan_kind 为 True 时末尾加上所还借款的类型"""
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())  # 没有创建时间时使用当前时间
+        accounts = self.dims["accounts"]
+        sellers = self.dims["sellers"]
+        members = self.dims["members"]
+        categorys = self.dims[category_table] if category_table else None
+        for row in rows:
+            title = get(row, "事项")
+            if title is None:
+                # 防止空单元格导致写入数据库报错
+                continue
+            # 表格中的金额单位为元，数据库中以分保存
+            values = [changeStrToDate(get(row, "日期")), title, get(row, "备注"), to_fen(get(row, money_key)),
+                      accounts.get(get(row, account_key)), sellers.get(get(row, "交易方"))]
+            if categorys is not None:
+                category_pid = categorys.get(get(row, "一级分类"))
+                values += [category_pid, categorys.get(get(row, "二级分类"), category_pid),
+                           members.get(get(row, "对象"))]
+            values += [get(row, "创建时间") or now, get(row, "修改时间")]
+            if loan_kind:
+                values.append(LOAN_KINDS.get(get(row, "所还借款")))
+            yield values
+
+    def note_values(self, get, rows):
+        """记录工作表每行要写入的值"""
+        now = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+        for row in rows:
+            title = get(row, "事项")
+            if title is None:
+                continue
+            yield (changeStrToDate(get(row, "日期")), title, get(row, "记录"), get(row, "额外备注"),
+                   get(row, "创建时间") or now, get(row, "修改时间"))
+
+    def drop_indexes(self, c, table, size):
+        """导入行数多于（或无法确定）表中已有行数时删除表的索引及全文索引的新增触发器，返回重建的语句"""
+        if size is not None:
+            existing = c.execute("select count(*) from %s" % table).fetchone()[0]
+            if size <= existing:
+                return []
+        indexes = c.execute("select name, sql from sqlite_master where type='index' and tbl_name=? and sql is not null",
+                            (table,)).fetchall()
+        for name, index_sql in indexes:
+            c.execute('drop index "%s"' % name)
+        rebuild_sqls = [index_sql for name, index_sql in indexes]
+        trigger = c.execute("select name, sql from sqlite_master where type='trigger' and name=?",
+                            ("trg_%s_fts_insert" % table,)).fetchone()
+        if trigger is not None:
+            # 全文索引写完后整体重建
+            c.execute('drop trigger "%s"' % trigger[0])
+            rebuild_sqls += ["INSERT INTO %s_fts(%s_fts) VALUES ('rebuild')" % (table, table), trigger[1]]
+        return rebuild_sqls
+
+
+def format_stats(stats):
+    """各工作表导入速度，用于日志"""
+    return "，".join("%s %s 行 %.0f 行/秒" % (name, count, count / seconds if seconds else count)
+                    for name, count, seconds in stats)
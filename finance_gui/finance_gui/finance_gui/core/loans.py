@@ -0,0 +1,103 @@
+# 用于借款：借入、借出与所还的还款通过 ledger.loan_id 关联，借款表 loans 记下每笔借款的本金与已还金额
+# 借款表由统一交易表上的触发器同步增减（见 migrate.loan_triggers），按交易方汇总与账龄都只读取未结清的借款，
+# 一次查询得到，不再扫描全部借入、借出、还款记录
+
+import datetime
+from core.migrate import loans_select_sql
+from core import dims
+
+KIND_TITLES = {"borrows": "借入", "lends": "借出"}
+
+# 账龄区间：(上限天数, 名称)，最后一档没有上限
+AGING_BUCKETS = [(30, "30天内"), (60, "31-60天"), (90, "61-90天"), (None, "90天以上")]
+
+# 未结清的借款（走部分索引 idx_loans_open）
+OPEN = "principal_fen <> repaid_fen"
+
+
+def seller_title(conn, seller_id):
+    return dims.cache.table(conn, "sellers").title_of(seller_id) or "未填写"
+
+
+def open_loans(conn, seller_id=None, include=None):
+    """未结清的借款 [(借款 id, 类型, 日期, 交易方 id, 本金分, 已还分)]，按日期排列
+    seller_id 不为 None 时只取该交易方的借款；include 为需要一并列出的借款 id（如正在修改的还款已关联的借款）"""
+    conditions, params = [OPEN], []
+    if seller_id is not None:
+        conditions.append("seller_id = ?")
+        params.append(seller_id)
+    where = " and ".join(conditions)
+    if include is not None:
+        where = "(%s) or loan_id = ?" % where
+        params.append(include)
+    sql = "select loan_id, kind, note_date, seller_id, principal_fen, repaid_fen from loans where %s " \
+          "order by note_date, loan_id" % where
+    return conn.execute(sql, params).fetchall()
+
+
+def loan_label(conn, loan):
+    """下拉框中借款的显示文字，如 #12 借出 2025-01-02 张三 未还 ¥300.00"""
+    loan_id, kind, note_date, seller_id, principal_fen, repaid_fen = loan
+    return "#%s %s %s %s 未还 ¥%.2f" % (loan_id, KIND_TITLES[kind], note_date, seller_title(conn, seller_id),
+                                      (principal_fen - repaid_fen) / 100)
+
+
+def seller_overview(conn):
+    """各交易方未结清的借款 [(交易方 id, 交易方名称, 笔数, 借入未还分, 借出未收分)]，按未结清金额从大到小排列"""
+    sql = "select seller_id, count(*), " \
+          "sum(case when kind = 'borrows' then principal_fen - repaid_fen else 0 end) as borrowed, " \
+          "sum(case when kind = 'lends' then principal_fen - repaid_fen else 0 end) as lent " \
+          "from loans where %s group by seller_id order by abs(borrowed) + abs(lent) desc" % OPEN
+    return [(seller_id, seller_title(conn, seller_id), count, borrowed, lent)
+            for seller_id, count, borrowed, lent in conn.execute(sql).fetchall()]
+
+
+def aging(conn, today=None):
+    """账龄：各交易方、各类型未结清金额按借款天数分档 [(交易方 id, 交易方名称, 类型, 笔数, 未结清分, [各档分])]
+    today 默认为今天，档位见 AGING_BUCKETS"""
+    today = (today or datetime.date.today()).strftime("%Y-%m-%d")
+    buckets = []
+    low = None
+    for high, name in AGING_BUCKETS:
+        conditions = ([] if low is None else ["age > %d" % low]) + ([] if high is None else ["age <= %d" % high])
+        buckets.append("sum(case when %s then outstanding else 0 end)" % " and ".join(conditions))
+        low = high
+    sql = "select seller_id, kind, count(*), sum(outstanding), %s from (" \
+          "select seller_id, kind, principal_fen - repaid_fen as outstanding, " \
+          "julianday(?) - julianday(note_date) as age from loans where %s) " \
+          "group by seller_id, kind order by kind, 4 desc" % (", ".join(buckets), OPEN)
+    return [(row[0], seller_title(conn, row[0]), row[1], row[2], row[3], list(row[4:]))
+            for row in conn.execute(sql, (today,)).fetchall()]
+
+
+def link_values(conn, loan_id):
+    """还款关联借款 loan_id（None 为不关联）时写入的列 {列名: 值}：所还借款的 id 及类型
+    还款按 loan_kind 计入余额，借款记录不在后（如恢复备份）仍能区分收回借出的还款"""
+    row = conn.execute("select kind from ledger where id=?", (loan_id,)).fetchone() if loan_id is not None else None
+    return {"loan_id": loan_id, "loan_kind": row[0] if row else None}
+
+
+def link(conn, repayment_id, loan_id):
+    """设置还款所还的借款（loan_id 为 None 时取消关联）"""
+    values = link_values(conn, loan_id)
+    with conn:
+        conn.execute("update ledger set loan_id=?, loan_kind=? where id=? and kind='repayments'",
+                     (values["loan_id"], values["loan_kind"], repayment_id))
+
+
+def rebuild(conn):
+    """从统一交易表重新统计借款表（在一个事务内完成），返回借款数"""
+    with conn:
+        conn.execute("DELETE FROM loans")
+        conn.execute("INSERT INTO loans (loan_id, kind, seller_id, note_date, principal_fen, repaid_fen) "
+                     + loans_select_sql())
+    return conn.execute("select count(*) from loans").fetchone()[0]
+
+
+def check(conn):
+    """将借款表与直接扫描交易记录的结果逐行比较，返回不一致的 [(借款 id, 扫描结果, 借款表中的值)]"""
+    expected = {row[0]: row[1:] for row in conn.execute(loans_select_sql())}
+    actual = {row[0]: row[1:] for row in conn.execute(
+        "select loan_id, kind, seller_id, note_date, principal_fen, repaid_fen from loans")}
+    return [(key, expected.get(key), actual.get(key)) for key in sorted(set(expected) | set(actual))
+            if expected.get(key) != actual.get(key)]
@@ -0,0 +1,867 @@
+# 用于数据库结构的版本升级（以 PRAGMA user_version 作为版本号）
+# 每个迁移只执行一次，按版本号顺序在一个事务内完成；程序启动时（bin/finance_GUI.py）先备份 finance.db 再原地升级
+
+import os
+import sqlite3
+import time
+
+# 结构相同的交易表
+LEDGER_TABLES = ["payments", "incomes", "borrows", "lends", "repayments"]
+# 迁移 9 起各类交易保存在统一的交易表中，kind 列为原表名；原表名保留为只含该类交易的兼容视图
+LEDGER = "ledger"
+
+# 覆盖索引：日期区间 + 逻辑删除 是统计与视图查询的热点路径
+# 索引列顺序：is_delete 等值在前，note_date 区间在后，其余列用于覆盖查询避免回表
+covering_indexes = {
+    "idx_payments_date": "CREATE INDEX IF NOT EXISTS idx_payments_date ON payments"
+                         "(is_delete, note_date, category_pid, category_cid, money)",
+    "idx_incomes_date": "CREATE INDEX IF NOT EXISTS idx_incomes_date ON incomes"
+                        "(is_delete, note_date, category_pid, category_cid, money)",
+    "idx_borrows_date": "CREATE INDEX IF NOT EXISTS idx_borrows_date ON borrows"
+                        "(is_delete, note_date, account_id, seller_id, money)",
+    "idx_lends_date": "CREATE INDEX IF NOT EXISTS idx_lends_date ON lends"
+                      "(is_delete, note_date, account_id, seller_id, money)",
+    "idx_repayments_date": "CREATE INDEX IF NOT EXISTS idx_repayments_date ON repayments"
+                           "(is_delete, note_date, account_id, seller_id, money)",
+    "idx_notes_date": "CREATE INDEX IF NOT EXISTS idx_notes_date ON notes(is_delete, note_date)",
+}
+
+# 维度表索引：下拉框联动（pid）以及按名称查 id
+dimension_indexes = {
+    "idx_pay_categorys_pid": "CREATE INDEX IF NOT EXISTS idx_pay_categorys_pid ON pay_categorys(pid, title)",
+    "idx_income_categorys_pid": "CREATE INDEX IF NOT EXISTS idx_income_categorys_pid ON income_categorys(pid, title)",
+    "idx_accounts_title": "CREATE INDEX IF NOT EXISTS idx_accounts_title ON accounts(title)",
+    "idx_sellers_title": "CREATE INDEX IF NOT EXISTS idx_sellers_title ON sellers(title)",
+    "idx_members_title": "CREATE INDEX IF NOT EXISTS idx_members_title ON members(title)",
+}
+
+
+# 金额改为整数分（money_fen）后的交易表结构，{table} 为表名
+ledger_fen_table = """CREATE TABLE {table}(
+        id INTEGER PRIMARY KEY   AUTOINCREMENT NOT NULL,
+        note_date TEXT NOT NULL,
+        title VARCHAR(50) NOT NULL,
+        remark VARCHAR(100),
+        money_fen INTEGER NOT NULL, -- 金额，单位：分
+        account_id INT ,
+        seller_id INT ,
+        category_pid INT ,
+        category_cid INT ,
+        member_id INT ,
+        create_time TEXT NOT NULL,
+        modify_time TEXT,
+        is_delete bit default 0
+        )"""
+LEDGER_COLUMNS = "id,note_date,title,remark,{money},account_id,seller_id,category_pid,category_cid,member_id," \
+                 "create_time,modify_time,is_delete"
+
+# 覆盖索引（金额列为 money_fen），列顺序与 covering_indexes 相同
+fen_covering_indexes = {
+    "idx_payments_date": "CREATE INDEX IF NOT EXISTS idx_payments_date ON payments"
+                         "(is_delete, note_date, category_pid, category_cid, money_fen)",
+    "idx_incomes_date": "CREATE INDEX IF NOT EXISTS idx_incomes_date ON incomes"
+                        "(is_delete, note_date, category_pid, category_cid, money_fen)",
+    "idx_borrows_date": "CREATE INDEX IF NOT EXISTS idx_borrows_date ON borrows"
+                        "(is_delete, note_date, account_id, seller_id, money_fen)",
+    "idx_lends_date": "CREATE INDEX IF NOT EXISTS idx_lends_date ON lends"
+                      "(is_delete, note_date, account_id, seller_id, money_fen)",
+    "idx_repayments_date": "CREATE INDEX IF NOT EXISTS idx_repayments_date ON repayments"
+                           "(is_delete, note_date, account_id, seller_id, money_fen)",
+}
+
+# 交易表维度 id 索引：查询页面按账户、交易方、成员的 id 过滤，is_delete 等值在前，note_date 用于排序
+dimension_id_indexes = {}
+for _table in LEDGER_TABLES:
+    for _column in ["account_id", "seller_id"] + (["member_id"] if _table in ("payments", "incomes") else []):
+        dimension_id_indexes["idx_%s_%s" % (_table, _column[:-3])] = \
+            "CREATE INDEX IF NOT EXISTS idx_%s_%s ON %s(is_delete, %s, note_date)" % (_table, _column[:-3], _table, _column)
+
+# 视图仍以元为单位提供 money 列，兼容界面与 excel 导入导出；汇总统计请对 money_fen 求和
+ledger_views = {
+    "v_payments_info": """create view v_payments_info as
+      select p.id,p.note_date,p.title,p.remark,p.money_fen / 100.0 as money,a.title as account,s.title as seller,
+      c_p.title as category_p,c_c.title as category_c,m.title as member,p.create_time,p.modify_time,p.money_fen
+      from payments as p left join accounts as a on p.account_id = a.id
+      left join sellers as s on p.seller_id = s.id
+      left join pay_categorys as c_p on p.category_pid = c_p.id
+      left join pay_categorys as c_c on p.category_cid = c_c.id
+      left join members as m on p.member_id = m.id where is_delete=0""",
+    "v_incomes_info": """create view v_incomes_info as
+      select p.id,p.note_date,p.title,p.remark,p.money_fen / 100.0 as money,a.title as account,s.title as seller,
+      c_p.title as category_p,c_c.title as category_c,m.title as member,p.create_time,p.modify_time,p.money_fen
+      from incomes as p left join accounts as a on p.account_id = a.id
+      left join sellers as s on p.seller_id = s.id
+      left join income_categorys as c_p on p.category_pid = c_p.id
+      left join income_categorys as c_c on p.category_cid = c_c.id
+      left join members as m on p.member_id = m.id where is_delete=0""",
+}
+for _table in ["borrows", "lends", "repayments"]:
+    ledger_views["v_%s_info" % _table] = """create view v_{table}_info as
+      select p.id,p.note_date,p.title,p.remark,p.money_fen / 100.0 as money,a.title as account,s.title as seller
+      ,p.create_time,p.modify_time,p.money_fen
+      from {table} as p left join accounts as a on p.account_id = a.id
+      left join sellers as s on p.seller_id = s.id
+      where is_delete=0""".format(table=_table)
+
+
+# 统一交易表：各类交易合并在一张表中，kind 为原表名，id 在各类交易间唯一
+ledger_table = """CREATE TABLE ledger(
+        id INTEGER PRIMARY KEY   AUTOINCREMENT NOT NULL,
+        kind TEXT NOT NULL, -- 交易类型（原表名）：payments/incomes/borrows/lends/repayments
+        note_date TEXT NOT NULL,
+        title VARCHAR(50) NOT NULL,
+        remark VARCHAR(100),
+        money_fen INTEGER NOT NULL, -- 金额，单位：分
+        account_id INT ,
+        seller_id INT ,
+        category_pid INT ,
+        category_cid INT ,
+        member_id INT ,
+        create_time TEXT NOT NULL,
+        modify_time TEXT,
+        is_delete bit default 0
+        )"""
+
+# 统一交易表的索引：kind、is_delete 等值在前，note_date 区间在后，其余列用于覆盖查询避免回表；
+# 按账户、交易方、成员的 id 过滤的索引同样以 kind 开头
+ledger_indexes = {
+    "idx_ledger_kind_date": "CREATE INDEX IF NOT EXISTS idx_ledger_kind_date ON ledger"
+                            "(kind, is_delete, note_date, category_pid, category_cid, account_id, money_fen)",
+}
+for _column in ["account_id", "seller_id", "member_id"]:
+    ledger_indexes["idx_ledger_%s" % _column[:-3]] = \
+        "CREATE INDEX IF NOT EXISTS idx_ledger_%s ON ledger(kind, is_delete, %s, note_date)" % (_column[:-3], _column)
+
+
+def compat_view_sql(table):
+    """原交易表名的兼容视图（只含该类交易，列与原表相同），以及把写入转到统一交易表的 INSTEAD OF 触发器
+    程序中的写入直接写 ledger（写视图时 lastrowid 与 rowcount 不可用），兼容视图供查询及其他脚本使用"""
+    columns = LEDGER_COLUMNS.format(money="money_fen").split(",")
+    data_columns = columns[1:]  # 不含 id
+    values = ["new.%s" % col for col in data_columns[:-1]] + ["ifnull(new.is_delete, 0)"]
+    return [
+        "CREATE VIEW %s AS SELECT %s FROM ledger WHERE kind = '%s'" % (table, ",".join(columns), table),
+        "CREATE TRIGGER trg_%s_view_insert INSTEAD OF INSERT ON %s BEGIN "
+        "INSERT INTO ledger (id, kind, %s) VALUES (new.id, '%s', %s); END"
+        % (table, table, ", ".join(data_columns), table, ", ".join(values)),
+        "CREATE TRIGGER trg_%s_view_update INSTEAD OF UPDATE ON %s BEGIN "
+        "UPDATE ledger SET %s WHERE id = old.id; END"
+        % (table, table, ", ".join("%s = new.%s" % (col, col) for col in columns)),
+        "CREATE TRIGGER trg_%s_view_delete INSTEAD OF DELETE ON %s BEGIN DELETE FROM ledger WHERE id = old.id; END"
+        % (table, table),
+    ]
+
+
+def ledger_view_sql(view):
+    """v_*_info 视图改为直接查询统一交易表，列与原视图相同"""
+    table = view[2:-5]
+    return ledger_views[view].replace("from %s as p" % table, "from ledger as p").replace(
+        "where is_delete=0", "where p.kind = '%s' and p.is_delete=0" % table)
+
+
+# 交易表按月汇总表，由交易表上的触发器维护；各 id 为空时记为 0，使主键（唯一约束）对未分类记录同样生效
+monthly_totals_table = """CREATE TABLE IF NOT EXISTS monthly_totals(
+        kind TEXT NOT NULL, -- 交易表名：payments/incomes/borrows/lends/repayments
+        year_month TEXT NOT NULL, -- 年月，如 2025-01
+        category_pid INT NOT NULL,
+        category_cid INT NOT NULL,
+        account_id INT NOT NULL,
+        member_id INT NOT NULL,
+        count INTEGER NOT NULL, -- 笔数
+        sum_fen INTEGER NOT NULL, -- 金额合计，单位：分
+        PRIMARY KEY (kind, year_month, category_pid, category_cid, account_id, member_id)
+        ) WITHOUT ROWID"""
+MONTHLY_KEY_COLUMNS = "kind, year_month, category_pid, category_cid, account_id, member_id"
+# 一条记录所在的汇总行，{row} 为 new 或 old
+MONTHLY_KEY_VALUES = "{kind}, substr({row}.note_date, 1, 7), ifnull({row}.category_pid, 0), " \
+                     "ifnull({row}.category_cid, 0), ifnull({row}.account_id, 0), ifnull({row}.member_id, 0)"
+MONTHLY_KEY_WHERE = "kind = {kind} AND year_month = substr({row}.note_date, 1, 7) " \
+                    "AND category_pid = ifnull({row}.category_pid, 0) AND category_cid = ifnull({row}.category_cid, 0) " \
+                    "AND account_id = ifnull({row}.account_id, 0) AND member_id = ifnull({row}.member_id, 0)"
+# 计入一条未删除的记录
+MONTHLY_ADD = "INSERT INTO monthly_totals (" + MONTHLY_KEY_COLUMNS + ", count, sum_fen) " \
+              "VALUES (" + MONTHLY_KEY_VALUES + ", 1, {row}.money_fen) " \
+              "ON CONFLICT (" + MONTHLY_KEY_COLUMNS + ") " \
+              "DO UPDATE SET count = count + 1, sum_fen = sum_fen + excluded.sum_fen;"
+# 扣除一条记录，笔数为 0 的汇总行随之删除
+MONTHLY_REMOVE = "UPDATE monthly_totals SET count = count - 1, sum_fen = sum_fen - {row}.money_fen " \
+                 "WHERE " + MONTHLY_KEY_WHERE + "; " \
+                 "DELETE FROM monthly_totals WHERE count <= 0 AND " + MONTHLY_KEY_WHERE + ";"
+# 影响汇总的列，修改事项、备注等其他列时不触发
+MONTHLY_COLUMNS = "note_date, money_fen, category_pid, category_cid, account_id, member_id, is_delete"
+
+
+def monthly_triggers(table):
+    """交易表维护按月汇总的触发器：新增、删除、修改（含逻辑删除）；统一交易表按每条记录的 kind 计入"""
+    columns = MONTHLY_COLUMNS
+
+    def kind(row):
+        return "'%s'" % table if table != LEDGER else "%s.kind" % row
+
+    if table == LEDGER:
+        columns = "kind, " + columns
+    triggers = [
+        ("insert", "AFTER INSERT ON {table} WHEN new.is_delete = 0", MONTHLY_ADD.format(kind=kind("new"), row="new")),
+        ("delete", "AFTER DELETE ON {table} WHEN old.is_delete = 0", MONTHLY_REMOVE.format(kind=kind("old"), row="old")),
+        ("update_old", "AFTER UPDATE OF %s ON {table} WHEN old.is_delete = 0" % columns,
+         MONTHLY_REMOVE.format(kind=kind("old"), row="old")),
+        ("update_new", "AFTER UPDATE OF %s ON {table} WHEN new.is_delete = 0" % columns,
+         MONTHLY_ADD.format(kind=kind("new"), row="new")),
+    ]
+    return ["CREATE TRIGGER IF NOT EXISTS trg_{table}_monthly_%s %s BEGIN %s END".format(table=table) % (
+        name, event.format(table=table), body) for name, event, body in triggers]
+
+
+def monthly_select_sql(table):
+    """直接扫描交易表得到的按月汇总"""
+    return "SELECT '%s', substr(note_date, 1, 7), ifnull(category_pid, 0), ifnull(category_cid, 0), " \
+           "ifnull(account_id, 0), ifnull(member_id, 0), count(*), sum(money_fen) " \
+           "FROM %s WHERE is_delete = 0 GROUP BY 2, 3, 4, 5, 6" % (table, table)
+
+
+def monthly_rebuild_sql(table):
+    """从交易表重新统计该表的按月汇总"""
+    return "INSERT INTO monthly_totals (" + MONTHLY_KEY_COLUMNS + ", count, sum_fen) " + monthly_select_sql(table)
+
+
+# 全文索引的列：交易表为事项、备注，记录表另有额外备注
+FTS_COLUMNS = {table: ["title", "remark"] for table in LEDGER_TABLES}
+FTS_COLUMNS["notes"] = ["title", "remark", "remark2"]
+FTS_COLUMNS[LEDGER] = ["title", "remark"]  # 迁移 9 后交易表共用一个全文索引
+
+
+def fts_sql(table):
+    """表的全文索引（外部内容表，trigram 分词，支持中文子串匹配）及保持同步的触发器"""
+    columns = FTS_COLUMNS[table]
+    cols = ", ".join(columns)
+    new_values = ", ".join("new.%s" % col for col in columns)
+    old_values = ", ".join("old.%s" % col for col in columns)
+    fts = "%s_fts" % table
+    insert = "INSERT INTO %s(rowid, %s) VALUES (new.id, %s);" % (fts, cols, new_values)
+    delete = "INSERT INTO %s(%s, rowid, %s) VALUES ('delete', old.id, %s);" % (fts, fts, cols, old_values)
+    return [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5(%s, content='%s', content_rowid='id', tokenize='trigram')"
+        % (fts, cols, table),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_fts_insert AFTER INSERT ON %s BEGIN %s END" % (table, table, insert),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_fts_delete AFTER DELETE ON %s BEGIN %s END" % (table, table, delete),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_fts_update AFTER UPDATE OF %s ON %s BEGIN %s %s END"
+        % (table, cols, table, delete, insert),
+        "INSERT INTO %s(%s) VALUES ('rebuild')" % (fts, fts),  # 为已有记录建立索引
+    ]
+
+
+# 分类闭包表：分类表通过 pid 指向上级分类，闭包表为每个分类记下它的全部上级（含自身）
+CATEGORY_TABLES = ["pay_categorys", "income_categorys"]
+
+
+def closure_table(table):
+    """分类表对应的闭包表名"""
+    return "%s_closure" % table
+
+
+def closure_sql(table):
+    """分类表的闭包表、保持同步的触发器（新增分类、修改上级、删除分类），以及从已有分类生成闭包的语句
+    闭包表每行 (ancestor, descendant, depth, ancestor_level)：descendant 的第 depth 级上级是 ancestor，
+    ancestor 位于第 ancestor_level 级（顶级分类为 1），每个分类有一行 depth = 0 的自身记录；
+    pid 为空、为 0 或指向不存在的分类时作为顶级分类
+    """
+    closure = closure_table(table)
+    subtree = "SELECT descendant FROM %s WHERE ancestor = {row}.id" % closure
+    # 记录 x 的层级即其上级（含自身）的个数
+    level = "(SELECT count(*) FROM %s x WHERE x.descendant = %s.ancestor)" % (closure, closure)
+    insert = ("INSERT INTO {c} (ancestor, descendant, depth, ancestor_level) VALUES (new.id, new.id, 0, "
+              "1 + (SELECT count(*) FROM {c} WHERE descendant = new.pid)); "
+              "INSERT INTO {c} (ancestor, descendant, depth, ancestor_level) "
+              "SELECT ancestor, new.id, depth + 1, ancestor_level FROM {c} WHERE descendant = new.pid;").format(c=closure)
+    # 移动子树：先断开子树与原上级的关系，再接到新上级下，最后重算子树内各分类的层级
+    move = ("DELETE FROM {c} WHERE descendant IN ({subtree}) AND ancestor NOT IN ({subtree}); "
+            "INSERT INTO {c} (ancestor, descendant, depth, ancestor_level) "
+            "SELECT a.ancestor, d.descendant, a.depth + d.depth + 1, a.ancestor_level FROM {c} a, {c} d "
+            "WHERE a.descendant = new.pid AND d.ancestor = new.id; "
+            "UPDATE {c} SET ancestor_level = {level} WHERE ancestor IN ({subtree});").format(
+        c=closure, subtree=subtree.format(row="new"), level=level)
+    # 删除分类：其下级分类成为顶级分类（层级按被删分类所在层级上移）；
+    # 子树中的行只保留上级仍在子树内的部分，被删分类自身及其原上级与子树的关系全部删除
+    below = "SELECT descendant FROM %s WHERE ancestor = old.id AND descendant <> old.id" % closure  # 被删分类的下级（不含自身）
+    delete = ("UPDATE {c} SET ancestor_level = ancestor_level - "
+              "(SELECT ancestor_level FROM {c} WHERE ancestor = old.id AND descendant = old.id) "
+              "WHERE ancestor IN ({below}); "
+              "DELETE FROM {c} WHERE descendant IN ({subtree}) AND ancestor NOT IN ({below});"
+              ).format(c=closure, subtree=subtree.format(row="old"), below=below)
+    rebuild = """WITH RECURSIVE tree(id, level) AS (
+            SELECT id, 1 FROM {t} WHERE pid IS NULL OR pid NOT IN (SELECT id FROM {t})
+            UNION ALL SELECT t.id, tree.level + 1 FROM {t} t JOIN tree ON t.pid = tree.id),
+        paths(ancestor, descendant, depth) AS (
+            SELECT id, id, 0 FROM tree
+            UNION ALL SELECT paths.ancestor, t.id, paths.depth + 1 FROM paths JOIN {t} t ON t.pid = paths.descendant)
+        INSERT INTO {c} (ancestor, descendant, depth, ancestor_level)
+        SELECT paths.ancestor, paths.descendant, paths.depth, tree.level FROM paths JOIN tree ON tree.id = paths.ancestor""" \
+        .format(t=table, c=closure)
+    return [
+        """CREATE TABLE IF NOT EXISTS %s(
+        ancestor INTEGER NOT NULL, -- 上级分类 id（含自身）
+        descendant INTEGER NOT NULL, -- 分类 id
+        depth INTEGER NOT NULL, -- 相差的层数，自身为 0
+        ancestor_level INTEGER NOT NULL, -- 上级分类所在的层级，顶级分类为 1
+        PRIMARY KEY (descendant, ancestor)
+        ) WITHOUT ROWID""" % closure,
+        "CREATE INDEX IF NOT EXISTS idx_%s_ancestor ON %s(ancestor, descendant)" % (closure, closure),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_closure_insert AFTER INSERT ON %s BEGIN %s END" % (table, table, insert),
+        # 不能移到自身或自身的下级分类下，否则形成环
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_closure_check BEFORE UPDATE OF pid ON %s WHEN new.pid IN (%s) "
+        "BEGIN SELECT RAISE(ABORT, '不能把分类移到它自身或它的下级分类下'); END" % (table, table, subtree.format(row="old")),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_closure_update AFTER UPDATE OF pid ON %s WHEN old.pid IS NOT new.pid "
+        "BEGIN %s END" % (table, table, move),
+        "CREATE TRIGGER IF NOT EXISTS trg_%s_closure_delete AFTER DELETE ON %s BEGIN %s END" % (table, table, delete),
+        "DELETE FROM %s" % closure,
+        rebuild,
+    ]
+
+
+def _m1_covering_indexes(c):
+    """为交易表添加日期区间覆盖索引"""
+    for sql in covering_indexes.values():
+        c.execute(sql)
+
+
+def _m2_dimension_indexes(c):
+    """为维度表添加查询索引"""
+    for sql in dimension_indexes.values():
+        c.execute(sql)
+
+
+def _m3_analyze(c):
+    """收集统计信息，供查询优化器选择索引"""
+    c.execute("ANALYZE")
+
+
+def _check_money_fen(c, table, old_table):
+    """核对金额转换：记录数一致，且以分为单位的合计与原浮点合计一致（允许无法精确到分的记录各差半分以内）"""
+    old_count, old_total = c.execute("select count(*), sum(money) from %s" % old_table).fetchone()
+    new_count, new_total = c.execute("select count(*), sum(money_fen) from %s" % table).fetchone()
+    inexact = c.execute("select count(*) from %s as o join %s as n on o.id = n.id where n.money_fen / 100.0 <> o.money"
+                        % (old_table, table)).fetchone()[0]
+    old_fen = round((old_total or 0) * 100)
+    if old_count != new_count or abs((new_total or 0) - old_fen) > inexact:
+        raise ValueError("%s 金额转换核对失败：原 %s 条合计 %s，转换后 %s 条合计 %s 分"
+                         % (table, old_count, old_total, new_count, new_total))
+    if inexact:
+        print("%s 有 %s 条金额不足一分的部分已四舍五入" % (table, inexact))
+    print("%s 共 %s 条，合计 %s 元 -> %s 分" % (table, new_count, old_total or 0, new_total or 0))
+
+
+def _m4_money_fen(c):
+    """交易表金额改为整数分保存，视图仍以元提供 money"""
+    for view in ledger_views:
+        c.execute("DROP VIEW IF EXISTS %s" % view)  # 视图引用了要重建的表，先删除
+    for table in LEDGER_TABLES:
+        old_table = "%s_float" % table
+        row = c.execute("select seq from sqlite_sequence where name=?", (table,)).fetchone()
+        c.execute("ALTER TABLE %s RENAME TO %s" % (table, old_table))
+        c.execute(ledger_fen_table.format(table=table))
+        c.execute("insert into %s (%s) select %s from %s" % (
+            table, LEDGER_COLUMNS.format(money="money_fen"),
+            LEDGER_COLUMNS.format(money="CAST(round(money * 100) AS INTEGER)"), old_table))
+        _check_money_fen(c, table, old_table)
+        c.execute("DROP TABLE %s" % old_table)  # 原表的索引随之删除
+        if row is not None:
+            # 保留自增序号，已删除的最大 id 不会被重新使用
+            c.execute("delete from sqlite_sequence where name=?", (table,))
+            c.execute("insert into sqlite_sequence (name, seq) values (?,?)", (table, row[0]))
+    for sql in fen_covering_indexes.values():
+        c.execute(sql)
+    for sql in ledger_views.values():
+        c.execute(sql)
+    c.execute("ANALYZE")
+
+
+def _m5_monthly_totals(c):
+    """按月汇总表及维护它的触发器"""
+    c.execute(monthly_totals_table)
+    c.execute("DELETE FROM monthly_totals")
+    for table in LEDGER_TABLES:
+        for sql in monthly_triggers(table):
+            c.execute(sql)
+        c.execute(monthly_rebuild_sql(table))
+
+
+def _m6_fts(c):
+    """交易表与记录表的 FTS5 全文索引，SQLite 不支持 FTS5 或 trigram 分词时跳过，搜索仍使用 like"""
+    try:
+        c.execute("CREATE VIRTUAL TABLE temp.fts_check USING fts5(title, tokenize='trigram')")
+        c.execute("DROP TABLE temp.fts_check")
+    except sqlite3.OperationalError as e:
+        print("当前 SQLite 不支持 FTS5 trigram 分词（%s），跳过全文索引" % e)
+        return
+    for table in LEDGER_TABLES + ["notes"]:
+        for sql in fts_sql(table):
+            c.execute(sql)
+
+
+def _m7_dimension_id_indexes(c):
+    """交易表按维度 id 过滤的索引"""
+    for sql in dimension_id_indexes.values():
+        c.execute(sql)
+    c.execute("ANALYZE")
+
+
+def _m8_category_closure(c):
+    """分类闭包表及维护它的触发器，按任意层级汇总分类时只需按 id 连接一次"""
+    for table in CATEGORY_TABLES:
+        for sql in closure_sql(table):
+            c.execute(sql)
+    c.execute("ANALYZE")
+
+
+# 各类交易的名称，用于提示编号变更
+LEDGER_TITLES = {"payments": "支出", "incomes": "收入", "borrows": "借入", "lends": "借出", "repayments": "还款"}
+
+# 迁移 9 中整体顺延了 id 的交易类型：新 id = 原 id + offset
+ledger_id_shifts_table = """CREATE TABLE IF NOT EXISTS ledger_id_shifts(
+        kind TEXT PRIMARY KEY,
+        first_id INTEGER NOT NULL, -- 原最小 id
+        last_id INTEGER NOT NULL, -- 原最大 id
+        offset INTEGER NOT NULL
+        )"""
+
+
+def id_shift_notes(conn):
+    """迁移 9 中记录编号的变更说明 [文字]，没有变更时为空列表"""
+    if conn.execute("select 1 from sqlite_master where type='table' and name='ledger_id_shifts'").fetchone() is None:
+        return []
+    return ["%s记录的编号整体增加 %s（原 %s~%s，现为 %s~%s）" % (
+        LEDGER_TITLES.get(kind, kind), offset, first_id, last_id, first_id + offset, last_id + offset)
+        for kind, first_id, last_id, offset in conn.execute(
+            "select kind, first_id, last_id, offset from ledger_id_shifts order by first_id + offset")]
+
+
+def _m9_ledger(c):
+    """各类交易合并到统一交易表 ledger，原表名改为兼容视图；v_*_info 视图、按月汇总与全文索引改在 ledger 上维护
+    id 与此前已迁入的记录重复时，该类交易的 id 整体顺延（保持原有顺序），顺延记入 ledger_id_shifts，
+    程序启动时提示用户（见 id_shift_notes）；按月汇总不受影响，无需重建"""
+    fts = c.execute("select 1 from sqlite_master where type='table' and name='payments_fts'").fetchone() is not None
+    for view in ledger_views:
+        c.execute("DROP VIEW IF EXISTS %s" % view)
+    c.execute(ledger_table)
+    c.execute(ledger_id_shifts_table)
+    columns = LEDGER_COLUMNS.format(money="money_fen")
+    seq = 0
+    for table in LEDGER_TABLES:
+        top = c.execute("select ifnull(max(id), 0) from ledger").fetchone()[0]
+        low, count, total = c.execute("select min(id), count(*), sum(money_fen) from %s" % table).fetchone()
+        offset = max(0, top - low + 1) if count else 0
+        c.execute("insert into ledger (kind, %s) select '%s', id + %d, %s from %s" % (
+            columns, table, offset, columns.split(",", 1)[1], table))
+        moved = c.execute("select count(*), sum(money_fen) from ledger where kind = ?", (table,)).fetchone()
+        if moved != (count, total):
+            raise ValueError("%s 迁入统一交易表核对失败：原 %s 条合计 %s 分，迁入 %s 条合计 %s 分"
+                             % (table, count, total, moved[0], moved[1]))
+        row = c.execute("select seq from sqlite_sequence where name=?", (table,)).fetchone()
+        seq = max(seq, (row[0] if row else 0) + offset)
+        print("%s 共 %s 条%s" % (table, count, "，id 顺延 %s" % offset if offset else ""))
+        if offset:
+            c.execute("insert into ledger_id_shifts (kind, first_id, last_id, offset) "
+                      "select ?, min(id), max(id), ? from %s" % table, (table, offset))
+        c.execute("DROP TABLE %s" % table)  # 原表的索引、触发器随之删除
+        c.execute("DROP TABLE IF EXISTS %s_fts" % table)
+        c.execute("delete from sqlite_sequence where name=?", (table,))
+    # 保留自增序号，各表已删除的最大 id 不会被重新使用
+    c.execute("delete from sqlite_sequence where name=?", (LEDGER,))
+    c.execute("insert into sqlite_sequence (name, seq) values (?, (select max(?, ifnull(max(id), 0)) from ledger))",
+              (LEDGER, seq))
+    for sql in ledger_indexes.values():
+        c.execute(sql)
+    for table in LEDGER_TABLES:
+        for sql in compat_view_sql(table):
+            c.execute(sql)
+    for view in ledger_views:
+        c.execute(ledger_view_sql(view))
+    for sql in monthly_triggers(LEDGER):
+        c.execute(sql)
+    if fts:
+        for sql in fts_sql(LEDGER):
+            c.execute(sql)
+    c.execute("ANALYZE")
+
+
+# 账户余额：收入、借入使账户余额增加，支出、借出、还款使余额减少；
+# 迁移 11 起还款记下所还借款的类型（loan_kind），收回借出的还款使余额增加
+BALANCE_SIGNS = {"incomes": 1, "borrows": 1, "payments": -1, "lends": -1, "repayments": -1}
+
+# 各账户每月的净收支，由统一交易表上的触发器同步增减，没有账户的记录不计入
+account_monthly_table = """CREATE TABLE IF NOT EXISTS account_monthly(
+        account_id INT NOT NULL,
+        year_month TEXT NOT NULL, -- 如 2025-01
+        count INTEGER NOT NULL,
+        net_fen INTEGER NOT NULL, -- 净额，单位：分
+        PRIMARY KEY (account_id, year_month)
+        ) WITHOUT ROWID"""
+# 账户月末余额快照（含期初余额），只为已结束的月份建立（见 core.balances.checkpoint）；
+# 补记、修改往月的记录时由触发器调整该月及以后的快照，当前余额 = 最近快照 + 其后各月净额
+account_snapshots_table = """CREATE TABLE IF NOT EXISTS account_snapshots(
+        account_id INT NOT NULL,
+        year_month TEXT NOT NULL,
+        balance_fen INTEGER NOT NULL, -- 月末余额，单位：分
+        PRIMARY KEY (account_id, year_month)
+        ) WITHOUT ROWID"""
+
+
+def balance_amount_sql(row=None, loans=True):
+    """记录使账户余额变化的金额（分），row 为 new/old 或表别名，为空时直接引用列名
+    loans 为 True 时所还借款类型为借出的还款计为收回（迁移 10 建立的结构尚无 loan_kind 列，使用 False）；
+    正负只看还款自身的 loan_kind，不依赖借款记录是否还在"""
+    prefix = "%s." % row if row else ""
+    inflow = ", ".join("'%s'" % kind for kind, sign in BALANCE_SIGNS.items() if sign > 0)
+    returned = "WHEN {p}kind = 'repayments' AND {p}loan_kind = 'lends' THEN {p}money_fen " if loans else ""
+    return ("CASE WHEN {p}kind IN ({inflow}) THEN {p}money_fen " + returned +
+            "ELSE -{p}money_fen END").format(p=prefix, inflow=inflow)
+
+
+# 计入（sign 为 1）或扣除（sign 为 -1）一条记录，{amount} 为带符号的金额
+BALANCE_APPLY = "INSERT INTO account_monthly (account_id, year_month, count, net_fen) " \
+                "VALUES ({row}.account_id, substr({row}.note_date, 1, 7), {sign}, {amount}) " \
+                "ON CONFLICT (account_id, year_month) " \
+                "DO UPDATE SET count = count + excluded.count, net_fen = net_fen + excluded.net_fen; " \
+                "DELETE FROM account_monthly WHERE count <= 0 " \
+                "AND account_id = {row}.account_id AND year_month = substr({row}.note_date, 1, 7); " \
+                "UPDATE account_snapshots SET balance_fen = balance_fen + {amount} " \
+                "WHERE account_id = {row}.account_id AND year_month >= substr({row}.note_date, 1, 7);"
+# 影响余额的列
+BALANCE_COLUMNS = "kind, note_date, money_fen, account_id, is_delete"
+
+
+def balance_triggers(loans=True):
+    """统一交易表维护账户月净额与余额快照的触发器，以及修改期初余额、删除账户时调整快照的触发器
+    loans 的含义见 balance_amount_sql，为 True 时修改还款所还借款的类型也会触发"""
+    columns = BALANCE_COLUMNS + (", loan_kind" if loans else "")
+
+    def apply(row, sign):
+        amount = "(%s)" % balance_amount_sql(row, loans)
+        return BALANCE_APPLY.format(row=row, sign=sign, amount=amount if sign > 0 else "-" + amount)
+
+    active = "{row}.is_delete = 0 AND {row}.account_id IS NOT NULL"
+    triggers = [
+        ("insert", "AFTER INSERT ON ledger WHEN " + active.format(row="new"), apply("new", 1)),
+        ("delete", "AFTER DELETE ON ledger WHEN " + active.format(row="old"), apply("old", -1)),
+        ("update_old", "AFTER UPDATE OF %s ON ledger WHEN %s" % (columns, active.format(row="old")),
+         apply("old", -1)),
+        ("update_new", "AFTER UPDATE OF %s ON ledger WHEN %s" % (columns, active.format(row="new")),
+         apply("new", 1)),
+    ]
+    sqls = ["CREATE TRIGGER IF NOT EXISTS trg_ledger_balance_%s %s BEGIN %s END" % item for item in triggers]
+    sqls += [
+        "CREATE TRIGGER IF NOT EXISTS trg_accounts_opening AFTER UPDATE OF opening_fen ON accounts BEGIN "
+        "UPDATE account_snapshots SET balance_fen = balance_fen + new.opening_fen - old.opening_fen "
+        "WHERE account_id = new.id; END",
+        "CREATE TRIGGER IF NOT EXISTS trg_accounts_snapshots_delete AFTER DELETE ON accounts BEGIN "
+        "DELETE FROM account_snapshots WHERE account_id = old.id; END",
+    ]
+    return sqls
+
+
+def account_monthly_select_sql(loans=True):
+    """直接扫描统一交易表得到的各账户每月净额"""
+    return "SELECT l.account_id, substr(l.note_date, 1, 7), count(*), sum(%s) FROM ledger l " \
+           "WHERE l.is_delete = 0 AND l.account_id IS NOT NULL GROUP BY 1, 2" % balance_amount_sql("l", loans)
+
+
+def _m10_account_balances(c):
+    """账户期初余额、每月净额与月末余额快照，快照在程序运行时由 core.balances.checkpoint 补建"""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(accounts)")]
+    if "opening_fen" not in columns:
+        c.execute("ALTER TABLE accounts ADD COLUMN opening_fen INTEGER NOT NULL DEFAULT 0")  # 期初余额，单位：分
+    c.execute(account_monthly_table)
+    c.execute(account_snapshots_table)
+    for sql in balance_triggers(loans=False):
+        c.execute(sql)
+    c.execute("DELETE FROM account_monthly")
+    c.execute("INSERT INTO account_monthly (account_id, year_month, count, net_fen) "
+              + account_monthly_select_sql(loans=False))
+
+
+# 借款：每笔借入、借出一行（loan_id 为该记录在 ledger 中的 id），还款通过 ledger.loan_id 关联所还的借款，
+# 同时在 ledger.loan_kind 记下所还借款的类型（见 core.loans.link_values），余额按它计入；
+# 已还金额由触发器随还款增减，未还余额 = principal_fen - repaid_fen
+LOAN_KINDS = ["borrows", "lends"]
+loans_table = """CREATE TABLE IF NOT EXISTS loans(
+        loan_id INTEGER PRIMARY KEY, -- 借入或借出记录的 id
+        kind TEXT NOT NULL, -- borrows 或 lends
+        seller_id INT, -- 交易方
+        note_date TEXT NOT NULL,
+        principal_fen INTEGER NOT NULL, -- 借款金额，单位：分
+        repaid_fen INTEGER NOT NULL DEFAULT 0 -- 已还金额，单位：分
+        )"""
+loan_indexes = {
+    # 还款按所还的借款查找，只为已关联借款的还款建立
+    "idx_ledger_loan": "CREATE INDEX IF NOT EXISTS idx_ledger_loan ON ledger(loan_id, kind, is_delete, money_fen) "
+                       "WHERE loan_id IS NOT NULL",
+    # 未结清的借款（按交易方汇总、账龄），已结清的借款不在索引中
+    "idx_loans_open": "CREATE INDEX IF NOT EXISTS idx_loans_open ON loans"
+                      "(kind, seller_id, note_date, principal_fen, repaid_fen) WHERE principal_fen <> repaid_fen",
+}
+# 借款记录计入借款表，已还金额从已关联的还款重新合计（逻辑删除后恢复的借款），{where} 为计入的条件
+LOAN_ADD = "INSERT INTO loans (loan_id, kind, seller_id, note_date, principal_fen, repaid_fen) " \
+           "SELECT new.id, new.kind, new.seller_id, new.note_date, new.money_fen, " \
+           "ifnull((SELECT sum(money_fen) FROM ledger WHERE loan_id = new.id AND kind = 'repayments' " \
+           "AND is_delete = 0), 0) WHERE {where};"
+LOAN_REMOVE = "DELETE FROM loans WHERE loan_id = old.id;"
+# 还款计入（sign 为 +）或扣除（sign 为 -）所还借款的已还金额
+REPAYMENT_APPLY = "UPDATE loans SET repaid_fen = repaid_fen {sign} {row}.money_fen WHERE loan_id = {row}.loan_id;"
+
+
+def loan_triggers():
+    """统一交易表维护借款表的触发器：借入、借出记录增删改，以及还款增删改（含逻辑删除、改关联）
+    同一事件的多个触发器执行顺序不确定，修改借款记录时先删后插须在同一个触发器内完成
+    还款的 loan_kind 须与所关联借款的类型一致；已有还款关联的借款不能修改类型，也不能直接删除（逻辑删除不受限制）"""
+    kinds = ", ".join("'%s'" % kind for kind in LOAN_KINDS)
+    loan = "{row}.kind IN (%s) AND {row}.is_delete = 0" % kinds
+    repayment = "{row}.kind = 'repayments' AND {row}.loan_id IS NOT NULL AND {row}.is_delete = 0"
+    triggers = [
+        ("insert", "AFTER INSERT ON ledger WHEN " + loan.format(row="new"), LOAN_ADD.format(where="1")),
+        ("delete", "AFTER DELETE ON ledger WHEN old.kind IN (%s)" % kinds, LOAN_REMOVE),
+        ("update", "AFTER UPDATE OF kind, seller_id, note_date, money_fen, is_delete ON ledger "
+                   "WHEN old.kind IN ({0}) OR new.kind IN ({0})".format(kinds),
+         LOAN_REMOVE + " " + LOAN_ADD.format(where=loan.format(row="new"))),
+        ("repay_insert", "AFTER INSERT ON ledger WHEN " + repayment.format(row="new"),
+         REPAYMENT_APPLY.format(sign="+", row="new")),
+        ("repay_delete", "AFTER DELETE ON ledger WHEN " + repayment.format(row="old"),
+         REPAYMENT_APPLY.format(sign="-", row="old")),
+        ("repay_update_old", "AFTER UPDATE OF kind, money_fen, loan_id, is_delete ON ledger WHEN "
+         + repayment.format(row="old"), REPAYMENT_APPLY.format(sign="-", row="old")),
+        ("repay_update_new", "AFTER UPDATE OF kind, money_fen, loan_id, is_delete ON ledger WHEN "
+         + repayment.format(row="new"), REPAYMENT_APPLY.format(sign="+", row="new")),
+    ]
+    linked = "EXISTS (SELECT 1 FROM ledger WHERE loan_id = old.id AND kind = 'repayments')"
+    mismatch = "new.kind = 'repayments' AND new.loan_id IS NOT NULL " \
+               "AND new.loan_kind IS NOT (SELECT kind FROM ledger WHERE id = new.loan_id)"
+    check = "SELECT RAISE(ABORT, '还款的借款类型与所关联的借款不一致');"
+    triggers += [
+        ("delete_linked", "BEFORE DELETE ON ledger WHEN old.kind IN (%s) AND %s" % (kinds, linked),
+         "SELECT RAISE(ABORT, '该借款已有关联的还款，不能删除');"),
+        ("kind", "BEFORE UPDATE OF kind ON ledger WHEN old.kind IN (%s) AND new.kind <> old.kind AND %s"
+         % (kinds, linked), "SELECT RAISE(ABORT, '该借款已有关联的还款，不能修改类型');"),
+        ("link_insert", "BEFORE INSERT ON ledger WHEN " + mismatch, check),
+        ("link_update", "BEFORE UPDATE OF kind, loan_id, loan_kind ON ledger WHEN " + mismatch, check),
+    ]
+    return ["CREATE TRIGGER IF NOT EXISTS trg_ledger_loan_%s %s BEGIN %s END" % item for item in triggers]
+
+
+def loans_select_sql():
+    """直接扫描统一交易表得到的借款表内容"""
+    return "SELECT l.id, l.kind, l.seller_id, l.note_date, l.money_fen, " \
+           "ifnull((SELECT sum(r.money_fen) FROM ledger r WHERE r.loan_id = l.id AND r.kind = 'repayments' " \
+           "AND r.is_delete = 0), 0) FROM ledger l WHERE l.kind IN (%s) AND l.is_delete = 0" % ", ".join(
+               "'%s'" % kind for kind in LOAN_KINDS)
+
+
+def repayments_view_sql():
+    """迁移 11 起的还款视图，比其他 v_*_info 视图多出所还借款的类型 loan_kind（导出备份时写出）"""
+    return ledger_view_sql("v_repayments_info").replace("p.money_fen\n", "p.money_fen,p.loan_kind\n")
+
+
+def _m11_loans(c):
+    """还款关联借款（ledger.loan_id、loan_kind）、借款表及维护它的触发器；账户余额的触发器改为区分收回借出的还款"""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(ledger)")]
+    if "loan_id" not in columns:
+        c.execute("ALTER TABLE ledger ADD COLUMN loan_id INT")  # 还款所还的借入或借出记录 id
+    if "loan_kind" not in columns:
+        c.execute("ALTER TABLE ledger ADD COLUMN loan_kind TEXT")  # 还款所还借款的类型：borrows/lends
+    c.execute("DROP VIEW IF EXISTS v_repayments_info")
+    c.execute(repayments_view_sql())
+    c.execute(loans_table)
+    for sql in loan_indexes.values():
+        c.execute(sql)
+    for sql in loan_triggers():
+        c.execute(sql)
+    c.execute("DELETE FROM loans")
+    c.execute("INSERT INTO loans (loan_id, kind, seller_id, note_date, principal_fen, repaid_fen) " + loans_select_sql())
+    # 此前的还款都没有关联借款，余额不变，只需替换触发器
+    for name, in c.execute("select name from sqlite_master where type='trigger' and name like 'trg_ledger_balance_%'"
+                           ).fetchall():
+        c.execute('DROP TRIGGER "%s"' % name)
+    for sql in balance_triggers():
+        c.execute(sql)
+    c.execute("ANALYZE")
+
+
+# 迁移列表：(版本号, 说明, 执行函数)，只能在末尾追加，不能修改已发布的版本
+MIGRATIONS = [
+    (1, "交易表日期区间覆盖索引", _m1_covering_indexes),
+    (2, "维度表查询索引", _m2_dimension_indexes),
+    (3, "ANALYZE 统计信息", _m3_analyze),
+    (4, "金额改为整数分保存", _m4_money_fen),
+    (5, "按月汇总表及触发器", _m5_monthly_totals),
+    (6, "事项与备注全文索引", _m6_fts),
+    (7, "交易表维度 id 索引", _m7_dimension_id_indexes),
+    (8, "分类闭包表", _m8_category_closure),
+    (9, "交易合并为统一交易表", _m9_ledger),
+    (10, "账户余额与月末快照", _m10_account_balances),
+    (11, "还款关联借款与借款表", _m11_loans),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """获取数据库当前结构版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """将已打开的数据库连接升级到最新版本，返回本次执行的迁移版本号列表"""
+    applied = []
+    version = get_version(conn)
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # 手动控制事务，保证迁移与版本号同时生效
+    try:
+        for number, desc, func in MIGRATIONS:
+            if number <= version:
+                continue
+            c = conn.cursor()
+            try:
+                c.execute("BEGIN")
+                func(c)
+                c.execute("PRAGMA user_version = %d" % number)
+                c.execute("COMMIT")
+            except Exception:
+                c.execute("ROLLBACK")
+                print("数据库迁移 %s（%s）失败，已回滚！" % (number, desc))
+                raise
+            finally:
+                c.close()
+            print("数据库迁移 %s（%s）完成！" % (number, desc))
+            applied.append(number)
+            version = number
+    finally:
+        conn.isolation_level = isolation_level
+    return applied
+
+
+def backup(conn, backup_dir):
+    """将数据库完整复制到 backup_dir 下带版本号和时间的文件中，返回备份文件路径"""
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, "finance-v%s-%s.db" % (get_version(conn), time.strftime("%Y%m%d-%H%M%S")))
+    dest = sqlite3.connect(path)
+    try:
+        conn.backup(dest)  # 在线备份，WAL 中尚未合并的写入同样复制
+    finally:
+        dest.close()
+    return path
+
+
+def upgrade(db_path, backup_dir=None):
+    """打开数据库文件并升级到最新版本，有需要执行的迁移且指定了 backup_dir 时先备份数据库"""
+    conn = sqlite3.connect(db_path)
+    try:
+        if backup_dir and get_version(conn) < LATEST_VERSION:
+            print("数据库结构升级前已备份到 %s" % backup(conn, backup_dir))
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+# 热点查询：(名称, 查询语句, 参数)，用于检查查询计划是否走索引
+HOT_QUERIES = [
+    ("月度支出分类汇总",
+     """SELECT cc.ancestor, SUM(p.money_fen) AS total_amount
+        FROM payments p
+        LEFT JOIN pay_categorys_closure cc ON cc.descendant = COALESCE(NULLIF(p.category_cid, 0), NULLIF(p.category_pid, 0))
+            AND (cc.ancestor_level = 1 OR (cc.depth = 0 AND cc.ancestor_level < 1))
+        WHERE p.note_date BETWEEN ? AND ? AND p.is_delete = 0
+        GROUP BY cc.ancestor ORDER BY total_amount DESC""",
+     ("2025-01-01", "2025-01-31")),
+    ("分类明细",
+     """SELECT id, note_date, title, remark, money_fen, create_time FROM payments
+        WHERE note_date BETWEEN ? AND ? AND is_delete = 0
+        AND COALESCE(NULLIF(category_cid, 0), NULLIF(category_pid, 0)) IN (
+            SELECT descendant FROM pay_categorys_closure WHERE ancestor = ? AND ancestor_level = 1)
+        ORDER BY note_date DESC""",
+     ("2025-01-01", "2025-01-31", 1)),
+    ("年度月份×分类矩阵",
+     """SELECT CAST(strftime('%m', p.note_date) AS INTEGER) AS month, p.category_pid, p.category_cid,
+               SUM(p.money_fen) AS total_amount
+        FROM payments p WHERE p.is_delete = 0 AND p.note_date BETWEEN ? AND ?
+        GROUP BY month, p.category_pid, p.category_cid""",
+     ("2025-01-01", "2025-12-31")),
+    ("月度支出明细",
+     """SELECT id, note_date, title, remark, money_fen, create_time FROM payments
+        WHERE note_date BETWEEN ? AND ? AND is_delete = 0 ORDER BY note_date DESC""",
+     ("2025-01-01", "2025-01-31")),
+    ("月度支出总额",
+     "SELECT COALESCE(SUM(money_fen), 0) FROM payments WHERE note_date BETWEEN ? AND ? AND is_delete = 0",
+     ("2025-01-01", "2025-01-31")),
+    ("月度收入总额",
+     "SELECT COALESCE(SUM(money_fen), 0) FROM incomes WHERE note_date BETWEEN ? AND ? AND is_delete = 0",
+     ("2025-01-01", "2025-01-31")),
+    ("月度收入分类汇总",
+     """SELECT COALESCE(ic.title, '未分类') as category_name, SUM(p.money_fen) as total_amount
+        FROM incomes p LEFT JOIN income_categorys ic ON p.category_pid = ic.id
+        WHERE p.note_date BETWEEN ? AND ? AND p.is_delete = 0
+        GROUP BY COALESCE(ic.title, '未分类') ORDER BY total_amount DESC""",
+     ("2025-01-01", "2025-01-31")),
+    ("月度收入明细",
+     """SELECT id, note_date, title, remark, money_fen, create_time FROM incomes
+        WHERE note_date BETWEEN ? AND ? AND is_delete = 0 ORDER BY note_date DESC""",
+     ("2025-01-01", "2025-01-31")),
+    ("借入日期区间",
+     "SELECT SUM(money_fen) FROM borrows WHERE note_date BETWEEN ? AND ? AND is_delete = 0",
+     ("2025-01-01", "2025-12-31")),
+    ("借出日期区间",
+     "SELECT SUM(money_fen) FROM lends WHERE note_date BETWEEN ? AND ? AND is_delete = 0",
+     ("2025-01-01", "2025-12-31")),
+    ("还款日期区间",
+     "SELECT SUM(money_fen) FROM repayments WHERE note_date BETWEEN ? AND ? AND is_delete = 0",
+     ("2025-01-01", "2025-12-31")),
+    ("月度汇总分类",
+     """SELECT cc.ancestor, SUM(m.sum_fen) FROM monthly_totals m
+        LEFT JOIN pay_categorys_closure cc ON cc.descendant = COALESCE(NULLIF(m.category_cid, 0), NULLIF(m.category_pid, 0))
+            AND cc.depth = 0
+        WHERE m.kind = ? AND m.year_month BETWEEN ? AND ? GROUP BY cc.ancestor""",
+     ("payments", "2025-01", "2025-12")),
+    ("查询页面日期区间",
+     """with m as materialized (select id,note_date,title,remark,money_fen,account_id,seller_id from lends
+        where is_delete = 0 and note_date >= ? and note_date <= ? and money_fen >= ?)
+        select count(*) from m""",
+     ("2025-01-01", "2025-12-31", 1000)),
+    ("查询页面账户",
+     """with m as materialized (select id,note_date,title,remark,money_fen,account_id,seller_id from payments
+        where is_delete = 0 and account_id in (?, ?))
+        select count(*) from m""",
+     (1, 2)),
+    ("查询页面成员",
+     """with m as materialized (select id,note_date,money_fen,member_id from payments
+        where is_delete = 0 and member_id in (?))
+        select count(*) from m""",
+     (1,)),
+    ("首页各类交易汇总",
+     "SELECT kind, count(money_fen), sum(money_fen), max(money_fen), min(money_fen) FROM ledger "
+     "WHERE is_delete = 0 GROUP BY kind",
+     ()),
+    ("借款按交易方汇总",
+     """SELECT seller_id, kind, count(*), sum(principal_fen - repaid_fen) FROM loans
+        WHERE principal_fen <> repaid_fen GROUP BY seller_id, kind""",
+     ()),
+    ("借款的还款",
+     "SELECT sum(money_fen) FROM ledger WHERE loan_id = ? AND kind = 'repayments' AND is_delete = 0",
+     (1,)),
+    ("二级分类联动",
+     "select title from pay_categorys where pid is ?",
+     (1,)),
+]
+
+
+def explain(conn, sql, params=()):
+    """返回查询计划的描述行"""
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+def check_query_plans(conn, queries=None):
+    """检查热点查询是否走索引，返回未走索引的 [(名称, 查询计划)]"""
+    failures = []
+    for name, sql, params in (queries or HOT_QUERIES):
+        plan = explain(conn, sql, params)
+        # 出现不带索引的 SCAN 说明是全表扫描（扫描已物化的 CTE 除外）
+        materialized = ["SCAN " + line.split()[-1] for line in plan if line.startswith("MATERIALIZE")]
+        if any(line.startswith("SCAN") and "INDEX" not in line and line not in materialized for line in plan):
+            failures.append((name, plan))
+    return failures
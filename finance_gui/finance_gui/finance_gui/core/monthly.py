@@ -0,0 +1,55 @@
+# 用于读取与维护按月汇总表 monthly_totals
+# 汇总表由交易表上的触发器在新增、修改、删除（含逻辑删除）时同步增减，预算、主页饼图和统计图表直接读取，
+# 不再每次从交易记录重新求和；汇总与交易记录不一致时可用 rebuild 从交易表重新统计
+
+from core.migrate import LEDGER_TABLES, monthly_rebuild_sql, monthly_select_sql
+from core import categories
+
+# 各交易表对应的分类表
+KIND_CATEGORY_TABLE = {"payments": "pay_categorys", "incomes": "income_categorys"}
+
+
+def month_total(conn, kind, year_month):
+    """指定月份的金额合计（元），kind 为交易表名，year_month 如 2025-01"""
+    sql = "select coalesce(sum(sum_fen), 0) from monthly_totals where kind=? and year_month=?"
+    return conn.execute(sql, (kind, year_month)).fetchone()[0] / 100
+
+
+def category_totals(conn, kind, start_month, end_month, level=None):
+    """[起始月份, 结束月份] 内按分类的金额合计 [(分类 id, 分类名称, 金额)]，按金额从大到小排列，未分类的 id 为 None
+    kind : payments 或 incomes
+    level : 汇总到第几级分类（1 为按一级分类汇总），None 为不汇总，按记录最细一级的分类统计
+    """
+    category_table = KIND_CATEGORY_TABLE[kind]
+    sql = """
+        SELECT cc.ancestor, SUM(m.sum_fen) / 100.0 AS total_amount
+        FROM monthly_totals m
+        %s
+        WHERE m.kind = ? AND m.year_month BETWEEN ? AND ?
+        GROUP BY cc.ancestor
+        ORDER BY total_amount DESC
+    """ % categories.rollup_join(category_table, categories.leaf_sql("m"), level)
+    return [(category_id, categories.label(conn, category_table, category_id), amount)
+            for category_id, amount in conn.execute(sql, (kind, start_month, end_month)).fetchall()]
+
+
+def rebuild(conn):
+    """从交易表重新统计全部汇总（在一个事务内完成），返回汇总行数"""
+    with conn:
+        conn.execute("DELETE FROM monthly_totals")
+        for table in LEDGER_TABLES:
+            conn.execute(monthly_rebuild_sql(table))
+    return conn.execute("select count(*) from monthly_totals").fetchone()[0]
+
+
+def check(conn):
+    """将汇总表与直接扫描交易表的结果逐行比较，返回不一致的 [(汇总键, 扫描结果, 汇总表中的值)]"""
+    key_sql = "kind, year_month, category_pid, category_cid, account_id, member_id"
+    actual = {row[:6]: row[6:] for row in conn.execute("select %s, count, sum_fen from monthly_totals" % key_sql)}
+    expected = {}
+    for table in LEDGER_TABLES:
+        for row in conn.execute(monthly_select_sql(table)):
+            expected[row[:6]] = row[6:]
+    return [(key, expected.get(key), actual.get(key))
+            for key in sorted(set(expected) | set(actual), key=str)
+            if expected.get(key) != actual.get(key)]
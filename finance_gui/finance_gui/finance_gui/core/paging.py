@@ -0,0 +1,103 @@
+# 用于记录列表的键集分页（keyset pagination）
+# 按 (排序列, id) 记住当前页首尾两条记录，上一页/下一页都从该位置继续查询，不使用 OFFSET，
+# 翻到任意位置的查询代价只与页大小有关，界面只保留可见的几页数据
+
+# 允许的排序列与排序方式
+ORDER_MODES = ("id", "note_date", "money")
+ORDER_KEYS = ("asc", "desc")
+
+
+class KeysetPager(object):
+    """单个查询的键集分页
+    pager = KeysetPager(conn, "v_payments_info", ["id", "note_date", "money"], "note_date", "desc")
+    rows = pager.first()              # 第一页
+    rows = pager.after(rows[-1])      # 某条记录之后的一页
+    rows = pager.before(rows[0])      # 某条记录之前的一页（仍按显示顺序返回）
+    rows = pager.starting_at(row_id)  # 从 id 为 row_id 的记录开始的一页，记录不存在返回 []
+    where/params 为附加的过滤条件（如搜索），columns 中必须包含 id 和排序列
+    """
+
+    def __init__(self, conn, source, columns, order_mode="id", order_key="asc", where="", params=(), page_size=100):
+        if order_mode not in ORDER_MODES or order_key not in ORDER_KEYS:
+            raise ValueError("不支持的排序方式:%s %s" % (order_mode, order_key))
+        self.conn = conn
+        self.source = source  # 表名或视图名
+        self.columns = list(columns)
+        self.order_mode = order_mode
+        self.order_key = order_key
+        self.where = where
+        self.params = tuple(params)
+        self.page_size = page_size
+        self.id_index = self.columns.index("id")
+        self.order_index = self.columns.index(order_mode)
+
+    def key(self, row):
+        """记录的分页键"""
+        if self.order_mode == "id":
+            return (row[self.id_index],)
+        return (row[self.order_index], row[self.id_index])
+
+    def query(self, key=None, forward=True, inclusive=False):
+        """从 key 位置开始取一页；forward 为 False 时向前取，结果仍按显示顺序排列"""
+        sort_cols = "id" if self.order_mode == "id" else "%s, id" % self.order_mode
+        # 向后翻页沿用显示顺序，向前翻页反转顺序后再把结果倒过来
+        ascending = (self.order_key == "asc") == forward
+        direction = "asc" if ascending else "desc"
+        conditions = []
+        params = []
+        if self.where:
+            conditions.append("(%s)" % self.where)
+            params.extend(self.params)
+        if key is not None:
+            op = ">" if ascending else "<"
+            if inclusive:
+                op += "="
+            conditions.append("(%s) %s (%s)" % (sort_cols, op, ", ".join("?" * len(key))))
+            params.extend(key)
+        sql = "select %s from %s" % (", ".join(self.columns), self.source)
+        if conditions:
+            sql += " where " + " and ".join(conditions)
+        sql += " order by %s limit ?" % ", ".join("%s %s" % (col, direction) for col in sort_cols.split(", "))
+        params.append(self.page_size)
+        rows = self.conn.execute(sql, params).fetchall()
+        if not forward:
+            rows.reverse()
+        return rows
+
+    def first(self):
+        return self.query()
+
+    def after(self, row):
+        return self.query(self.key(row))
+
+    def before(self, row):
+        return self.query(self.key(row), forward=False)
+
+    def fetch(self, row_id):
+        """按当前过滤条件获取一条记录，不存在或不符合条件返回 None"""
+        sql = "select %s from %s where id=?" % (", ".join(self.columns), self.source)
+        params = [row_id]
+        if self.where:
+            sql += " and (%s)" % self.where
+            params.extend(self.params)
+        return self.conn.execute(sql, params).fetchone()
+
+    def starting_at(self, row_id):
+        """从指定 id 的记录开始取一页（用于按编号定位）"""
+        row = self.fetch(row_id)
+        if row is None:
+            return []
+        return self.query(self.key(row), inclusive=True)
+
+    def precedes(self, row, other):
+        """按显示顺序 row 是否排在 other 之前"""
+        if self.order_key == "asc":
+            return self.key(row) < self.key(other)
+        return self.key(row) > self.key(other)
+
+    def count(self):
+        """符合条件的记录总数"""
+        sql = "select count(*) from %s" % self.source
+        if self.where:
+            sql += " where %s" % self.where
+        return self.conn.execute(sql, self.params).fetchone()[0]
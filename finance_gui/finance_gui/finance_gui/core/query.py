@@ -0,0 +1,189 @@
+# 用于查询页面的多条件查询
+# 账户、交易方、分类、成员先在维度表中把名称解析为 id，再在交易表的 *_id 列上过滤；
+# 日期、金额为区间条件，可以走交易表的索引；只有事项、备注这类自由文本使用全文索引或 like；
+# 汇总、分组统计和详情都从同一个 CTE（符合条件的交易记录）查询，查询条件只拼接一次；
+# 汇总与各维度的分组统计由一次按所有维度 id 组合的 group by 在内存中合并得到
+
+from core.Mytools import changeStrToDate, to_fen
+from core.monthly import KIND_CATEGORY_TABLE
+from core.summary import MONEY_AGGREGATES, SummaryResult
+from core import dims
+from core import search
+
+# 视图对应的交易表
+VIEW_TABLES = {view: table for view, table in search.VIEW_TABLES.items() if table != "notes"}
+
+# 维度字段：视图中的名称列 -> (交易表中的 id 列, 维度表)，分类表因交易表而异，记为 None
+DIMENSIONS = {
+    "account": ("account_id", "accounts"),
+    "seller": ("seller_id", "sellers"),
+    "category_p": ("category_pid", None),
+    "category_c": ("category_cid", None),
+    "member": ("member_id", "members"),
+}
+
+# 自由文本字段
+TEXT_FIELDS = ["title", "remark"]
+
+# 排序字段：视图中的列 -> 交易表中的列
+ORDER_COLUMNS = {"id": "id", "note_date": "note_date", "money": "money_fen"}
+
+
+def parse_date_range(text):
+    """日期区间 (起, 止)，无法识别返回 None
+    2024-03-01 当天；2024-03 整月；2024 整年；2024-03-01~2024-03-15 区间，起止可省略其一
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    start, sep, end = text.partition("~")
+    if not sep:
+        end = start
+    start, end = _date_bound(start, False), _date_bound(end, True)
+    if start is False or end is False or (start is None and end is None):
+        return None
+    return start, end
+
+
+def _date_bound(text, upper):
+    """区间的一端，年、年月补全为该年/月的第一天或最后一天（只用于字符串比较），为空返回 None，无法识别返回 False"""
+    text = text.strip()
+    if not text:
+        return None
+    parts = text.replace(".", "-").split("-")
+    if len(parts) == 1 and len(text) == 4 and text.isdigit():
+        return text + ("-12-31" if upper else "-01-01")
+    if len(parts) == 2 and len(parts[0]) == 4 and all(part.isdigit() for part in parts) and 1 <= int(parts[1]) <= 12:
+        return "%s-%s" % (parts[0], parts[1].zfill(2)) + ("-31" if upper else "-01")
+    return changeStrToDate(text) or False
+
+
+def parse_money_range(text):
+    """金额区间 (最小分, 最大分)，无法识别返回 None
+    12.5 等于该金额；10~100 区间；10~ 不少于；~100 不超过
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    low, sep, high = text.partition("~")
+    if not sep:
+        high = low
+    try:
+        low, high = to_fen(low.strip()), to_fen(high.strip())
+    except Exception:
+        return None
+    if low is None and high is None:
+        return None
+    return low, high
+
+
+class LedgerQuery(object):
+    """交易记录的多条件查询
+    q = LedgerQuery(conn, "v_payments_info")
+    q.add_text("title", "饭")                  # 事项、备注
+    q.add_dimension("account", "微信")          # 名称包含“微信”的账户
+    q.add_date_range("2024-03")                 # 2024 年 3 月
+    q.add_money_range("10~100")                 # 10 到 100 元
+    q.summary()                                 # SummaryResult：overall() 总体统计，groups(字段) 分组统计
+    q.details("note_date", "desc", limit=100)   # (记录总数, [(id, 日期, 事项, 备注, 金额, 账户, 交易方, ...)])
+    """
+
+    def __init__(self, conn, source):
+        self.conn = conn
+        self.source = source
+        self.table = VIEW_TABLES[source]
+        self.category_table = KIND_CATEGORY_TABLE.get(self.table)
+        # 分组统计与详情中的维度字段，只有支出、收入有分类和成员
+        self.fields = [field for field in DIMENSIONS if self.category_table or field in ("account", "seller")]
+        self.conditions = []
+        self.params = []
+
+    def dimension_table(self, field):
+        return DIMENSIONS[field][1] or self.category_table
+
+    def add_condition(self, condition, params=()):
+        self.conditions.append(condition)
+        self.params.extend(params)
+
+    def add_text(self, field, key):
+        """自由文本字段包含 key"""
+        if key:
+            self.add_condition(*search.keyword_condition(self.conn, self.table, field, key))
+
+    def add_dimension(self, field, key):
+        """维度名称包含 key：先从维度缓存中找出符合的 id，再按 id 过滤交易表"""
+        if not key or field not in self.fields:
+            return
+        ids = dims.cache.table(self.conn, self.dimension_table(field)).matching_ids(key)
+        if not ids:
+            self.add_condition("0")  # 没有符合的名称，不会有记录
+        else:
+            self.add_condition("%s in (%s)" % (DIMENSIONS[field][0], ",".join("?" * len(ids))), ids)
+
+    def add_date_range(self, text):
+        """日期区间，格式见 parse_date_range，无法识别时忽略"""
+        date_range = parse_date_range(text)
+        if date_range is None:
+            return
+        start, end = date_range
+        if start is not None:
+            self.add_condition("note_date >= ?", (start,))
+        if end is not None:
+            self.add_condition("note_date <= ?", (end,))
+
+    def add_money_range(self, text):
+        """金额区间，格式见 parse_money_range，无法识别时忽略"""
+        money_range = parse_money_range(text)
+        if money_range is None:
+            return
+        low, high = money_range
+        if low is not None and low == high:
+            self.add_condition("money_fen = ?", (low,))
+            return
+        if low is not None:
+            self.add_condition("money_fen >= ?", (low,))
+        if high is not None:
+            self.add_condition("money_fen <= ?", (high,))
+
+    def cte(self):
+        """符合条件的交易记录，只查询一次，供汇总、分组统计和详情共用"""
+        conditions = ["is_delete = 0"] + self.conditions
+        return "with m as materialized (select id,note_date,title,remark,money_fen,%s from %s where %s)" % (
+            ",".join(DIMENSIONS[field][0] for field in self.fields), self.table, " and ".join(conditions))
+
+    def dimension_joins(self):
+        """连接维度表取名称：(连接子句, 名称列)"""
+        joins = []
+        names = []
+        for i, field in enumerate(self.fields):
+            joins.append("left join %s d%s on m.%s = d%s.id" % (self.dimension_table(field), i,
+                                                                  DIMENSIONS[field][0], i))
+            names.append("d%s.title" % i)
+        return " ".join(joins), names
+
+    def summary(self):
+        """总体统计与各维度的分组统计：按所有维度 id 的组合分组只扫描一次，再按名称合并，返回 SummaryResult"""
+        joins, names = self.dimension_joins()
+        sql = "%s select %s,count(m.money_fen),sum(m.money_fen),max(m.money_fen),min(m.money_fen) from m %s " \
+              "group by %s" % (self.cte(), ",".join(names), joins,
+                               ",".join("m.%s" % DIMENSIONS[field][0] for field in self.fields))
+        result = SummaryResult(self.fields)
+        result.add_rows(self.conn.execute(sql, self.params))
+        return result
+
+    def details(self, order_mode="id", order_key="asc", limit=None, offset=0):
+        """详情，排序值相同时按 id 排列，分批读取时顺序固定
+        返回 (符合条件的记录总数, [(id, 日期, 事项, 备注, 金额, 各维度名称...)])"""
+        joins, names = self.dimension_joins()
+        order_key = "desc" if order_key == "desc" else "asc"
+        sql = "%s select m.id,m.note_date,m.title,m.remark,m.money_fen / 100.0,%s,count(*) over () from m %s " \
+              "order by m.%s %s, m.id %s limit %s offset %s" % (
+                  self.cte(), ",".join(names), joins, ORDER_COLUMNS.get(order_mode, "id"), order_key,
+                  order_key, -1 if limit is None else int(limit), int(offset))
+        rows = self.conn.execute(sql, self.params).fetchall()
+        total = rows[0][-1] if rows else self.count()
+        return total, [row[:-1] for row in rows]
+
+    def count(self):
+        """符合条件的记录数"""
+        return self.conn.execute("%s select count(*) from m" % self.cte(), self.params).fetchone()[0]
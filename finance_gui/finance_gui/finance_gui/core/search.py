@@ -0,0 +1,43 @@
+# 用于关键字搜索的查询条件
+# 事项、备注等文本列通过 FTS5 全文索引（trigram 分词）匹配子串，只需按 rowid 取出命中的记录，不必逐行 like 扫描视图；
+# trigram 至少需要 3 个字符，关键字更短或数据库没有全文索引时仍使用 like；
+# 各类交易在统一交易表 ledger 中共用一个全文索引，命中的 id 再由视图按交易类型过滤
+
+from core.migrate import FTS_COLUMNS, LEDGER, LEDGER_TABLES
+
+TRIGRAM_MIN = 3  # trigram 分词能匹配的最短关键字
+
+# 视图对应的数据表
+VIEW_TABLES = {
+    "v_payments_info": "payments",
+    "v_incomes_info": "incomes",
+    "v_borrows_info": "borrows",
+    "v_lends_info": "lends",
+    "v_repayments_info": "repayments",
+    "v_notes_info": "notes",
+}
+
+
+def has_fts(conn, table):
+    """数据表是否建有全文索引"""
+    sql = "select 1 from sqlite_master where type='table' and name=?"
+    return conn.execute(sql, ("%s_fts" % table,)).fetchone() is not None
+
+
+def match_expr(column, key):
+    """只在 column 列中匹配子串 key 的 FTS5 查询表达式"""
+    return '{%s} : "%s"' % (column, key.replace('"', '""'))
+
+
+def keyword_condition(conn, source, column, key):
+    """视图或表 source 中 column 列包含 key 的查询条件，返回 (where, params)，可直接用于 KeysetPager 和 LedgerSummary
+    where = "id in (select rowid from ledger_fts where ledger_fts match ?)"   # 可用全文索引时
+    where = "title like ?"                                                      # 其他情况
+    """
+    key = str(key)
+    table = VIEW_TABLES.get(source, source)
+    if table in LEDGER_TABLES:
+        table = LEDGER
+    if column in FTS_COLUMNS.get(table, ()) and len(key) >= TRIGRAM_MIN and has_fts(conn, table):
+        return "id in (select rowid from %s_fts where %s_fts match ?)" % (table, table), (match_expr(column, key),)
+    return "%s like ?" % column, ("%%%s%%" % key,)
@@ -0,0 +1,175 @@
+# 用于记录列表的汇总统计：笔数、总金额、平均、最大、最小，以及按账户/交易方等字段分组的统计
+# 查询条件变化时只扫描一次：按所有分组字段的组合 group by，整体和各字段的统计在内存中由这些细分组合并得到；
+# 之后新增/修改/删除单条记录只在内存中增减，
+# 只有被移除的记录恰好是某组的最大值或最小值时，才重新查询该组的最大/最小值
+# 金额以整数分（money_fen）累计，显示时才转为元，合计不会出现浮点误差
+
+from decimal import Decimal, ROUND_HALF_UP
+from core.Mytools import to_fen
+from core.migrate import LEDGER_TABLES
+
+# 以元显示的 笔数, 总金额, 平均金额, 最大金额, 最小金额，在整数分上聚合，用于直接查询视图
+MONEY_AGGREGATES = "count(money_fen),sum(money_fen) / 100.0,round(avg(money_fen)) / 100.0," \
+                   "max(money_fen) / 100.0,min(money_fen) / 100.0"
+
+
+class Stats(object):
+    """一组记录的统计，金额单位为分"""
+
+    def __init__(self, count=0, total=None, max_money=None, min_money=None):
+        self.count = count
+        self.total = total or 0
+        self.max = max_money
+        self.min = min_money
+
+    def add(self, money):
+        self.count += 1
+        self.total += money
+        self.max = money if self.max is None else max(self.max, money)
+        self.min = money if self.min is None else min(self.min, money)
+
+    def merge(self, count, total, max_money, min_money):
+        """并入另一组记录的统计"""
+        if not count:
+            return
+        self.count += count
+        self.total += total
+        self.max = max_money if self.max is None else max(self.max, max_money)
+        self.min = min_money if self.min is None else min(self.min, min_money)
+
+    def remove(self, money):
+        """移除一笔金额，移除的是最大/最小值时返回 True（需要重新查询最大/最小值）"""
+        self.count -= 1
+        self.total -= money
+        if self.count <= 0:
+            self.count, self.total, self.max, self.min = 0, 0, None, None
+            return False
+        return money >= self.max or money <= self.min
+
+    def values(self):
+        """(笔数, 总金额, 平均金额, 最大金额, 最小金额)，金额单位为元，与 MONEY_AGGREGATES 查询结果一致"""
+        if not self.count:
+            return 0, None, None, None, None
+        # 平均金额四舍五入到分，与 SQLite 的 round 一致
+        average = int((Decimal(self.total) / self.count).to_integral_value(ROUND_HALF_UP))
+        return self.count, self.total / 100, average / 100, self.max / 100, self.min / 100
+
+
+class SummaryResult(object):
+    """汇总结果：整体统计和各字段的分组统计，供记录页面和查询页面显示
+    result = SummaryResult(["account", "seller"])
+    result.add_rows(rows)       # rows 为 (账户, 交易方, 笔数, 总金额分, 最大分, 最小分)，即按两个字段组合分组的统计
+    result.overall()            # (笔数, 总金额, 平均, 最大, 最小)
+    result.groups("account")    # [(账户, 笔数, 总金额, 平均, 最大, 最小)]
+    """
+
+    def __init__(self, group_fields):
+        self.group_fields = list(group_fields)
+        self.total = Stats()
+        self.group_stats = {field: {} for field in self.group_fields}  # {字段: {字段值: Stats}}
+
+    def add_rows(self, rows):
+        """并入按所有分组字段组合分组的统计行，整体与各字段的统计由细分组合并得到"""
+        n = len(self.group_fields)
+        for row in rows:
+            stats = row[n:]
+            self.total.merge(*stats)
+            for field, value in zip(self.group_fields, row[:n]):
+                self.group_stats[field].setdefault(value, Stats()).merge(*stats)
+
+    def overall(self):
+        return self.total.values()
+
+    def groups(self, field):
+        """某字段的分组统计，按字段值排序（空值在前，与 group by 的顺序一致）"""
+        stats = self.group_stats[field]
+        return [(value,) + stats[value].values()
+                for value in sorted(stats, key=lambda v: (v is not None, v))]
+
+
+def grouped_sql(source, group_fields, where=""):
+    """按所有分组字段组合分组的统计语句，只扫描 source 一次"""
+    fields = "".join("%s," % field for field in group_fields)
+    sql = "select %scount(money_fen),sum(money_fen),max(money_fen),min(money_fen) from %s" % (fields, source)
+    if where:
+        sql += " where %s" % where
+    if group_fields:
+        sql += " group by %s" % ",".join(group_fields)
+    return sql
+
+
+def kind_totals(conn):
+    """各类交易的总体统计 {交易类型: (笔数, 总金额, 平均金额, 最大金额, 最小金额)}，与 MONEY_AGGREGATES 查询结果一致
+    在统一交易表上按 kind 分组，只扫描一次"""
+    totals = {kind: (0, None, None, None, None) for kind in LEDGER_TABLES}
+    for row in conn.execute("select kind,%s from ledger where is_delete = 0 group by kind" % MONEY_AGGREGATES):
+        totals[row[0]] = tuple(row[1:])
+    return totals
+
+
+class LedgerSummary(SummaryResult):
+    """记录列表的汇总统计
+    summary = LedgerSummary(conn, "v_payments_info", ["account", "seller"])
+    summary.load("title like ?", ("%饭%",))   # 按查询条件整体统计
+    summary.overall()                         # (笔数, 总金额, 平均, 最大, 最小)
+    summary.groups("account")                 # [(账户, 笔数, 总金额, 平均, 最大, 最小)]
+    summary.apply(old_row, new_row)           # 单条记录变化，行为 {字段: 值}，新增时 old_row 为 None，删除时 new_row 为 None
+    """
+
+    def __init__(self, conn, source, group_fields):
+        super().__init__(group_fields)
+        self.conn = conn
+        self.source = source  # 视图名
+        self.where = ""
+        self.params = ()
+
+    def load(self, where="", params=()):
+        """按查询条件重新统计，只查询一次"""
+        self.where = where
+        self.params = tuple(params)
+        self.total = Stats()
+        self.group_stats = {field: {} for field in self.group_fields}
+        self.add_rows(self.conn.execute(grouped_sql(self.source, self.group_fields, where), self.params))
+
+    def apply(self, old_row, new_row):
+        """一条记录新增/修改/删除后更新统计，返回重新查询最大/最小值的次数
+        行中的 money 为视图提供的元，转为分后累计"""
+        stale = []  # 需要重新查询最大/最小值的组：(字段, 字段值)，整体为 (None, None)
+        if old_row is not None:
+            old_money = to_fen(old_row["money"])
+            if self.total.remove(old_money):
+                stale.append((None, None))
+            for field in self.group_fields:
+                stats = self.group_stats[field].get(old_row[field])
+                if stats is None:
+                    continue
+                if stats.remove(old_money):
+                    stale.append((field, old_row[field]))
+                if not stats.count:
+                    del self.group_stats[field][old_row[field]]
+        if new_row is not None:
+            new_money = to_fen(new_row["money"])
+            self.total.add(new_money)
+            for field in self.group_fields:
+                self.group_stats[field].setdefault(new_row[field], Stats()).add(new_money)
+        for field, value in stale:
+            self.refresh_extremes(field, value)
+        return len(stale)
+
+    def refresh_extremes(self, field=None, value=None):
+        """重新查询整体或某组的最大/最小值"""
+        if field is None:
+            stats = self.total
+            conditions, params = [], []
+        else:
+            stats = self.group_stats[field].get(value)
+            if stats is None:
+                return
+            conditions, params = ["%s is ?" % field], [value]
+        if self.where:
+            conditions.append("(%s)" % self.where)
+            params.extend(self.params)
+        sql = "select max(money_fen),min(money_fen) from %s" % self.source
+        if conditions:
+            sql += " where " + " and ".join(conditions)
+        stats.max, stats.min = self.conn.execute(sql, params).fetchone()
@@ -0,0 +1,35 @@
+# 测试共用的数据库：db/finance.db 在内存中的副本升级到最新版本，不修改原文件
+# migrated_db 整个测试过程只升级一次，conn 为每个测试单独复制一份，测试中可以随意写入
+
+import os
+import sqlite3
+import pytest
+from core import migrate
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "finance.db")
+
+
+def copy_db(src):
+    """src 连接的数据库在内存中的副本"""
+    conn = sqlite3.connect(":memory:")
+    src.backup(conn)
+    return conn
+
+
+@pytest.fixture(scope="session")
+def migrated_db():
+    """升级到最新版本的数据库副本，只读使用"""
+    src = sqlite3.connect(DB_PATH)
+    conn = copy_db(src)
+    src.close()
+    migrate.migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def conn(migrated_db):
+    """当前测试独用的升级后数据库副本"""
+    conn = copy_db(migrated_db)
+    yield conn
+    conn.close()
@@ -0,0 +1,55 @@
+import datetime
+from core import balances
+
+
+def add(conn, kind, note_date, money_fen, account_id=1):
+    return conn.execute("insert into ledger (kind, note_date, title, money_fen, account_id, create_time) "
+                        "values (?, ?, '检查', ?, ?, ?)", (kind, note_date, money_fen, account_id, note_date)).lastrowid
+
+
+def current(conn, account_id=1):
+    return {row[0]: row[3] for row in balances.current_balances(conn)}[account_id]
+
+
+def test_balances_match_ledger(conn):
+    balances.checkpoint(conn)
+    assert balances.check(conn) == []
+
+
+def test_snapshots_follow_edits(conn):
+    """修改期初余额、补记往月记录、改金额、改类型、逻辑删除后，快照与当前余额随之调整"""
+    balances.checkpoint(conn)
+    start = current(conn)
+    balances.set_opening(conn, 1, conn.execute("select opening_fen from accounts where id = 1").fetchone()[0] + 10000)
+    assert current(conn) == start + 10000
+    income = add(conn, "incomes", "2000-01-15", 5000)
+    payment = add(conn, "payments", "2000-02-15", 2000)
+    assert current(conn) == start + 13000
+    conn.execute("update ledger set money_fen = 3000 where id = ?", (payment,))
+    conn.execute("update ledger set kind = 'lends' where id = ?", (income,))  # 收入改为借出，余额减少
+    assert current(conn) == start + 10000 - 5000 - 3000
+    conn.execute("update ledger set is_delete = 1 where id = ?", (payment,))
+    assert current(conn) == start + 10000 - 5000
+    assert balances.check(conn) == []
+
+
+def test_history_and_checkpoint(conn):
+    """余额走势与逐月推算一致；补建快照后再次执行不重复建立"""
+    add(conn, "incomes", "2000-01-10", 1000)
+    add(conn, "payments", "2000-03-10", 400)
+    today = datetime.date(2000, 4, 1)
+    assert balances.checkpoint(conn, today) > 0
+    assert balances.checkpoint(conn, today) == 0
+    months, rows = balances.history(conn, "2000-01", "2000-03")
+    assert months == ["2000-01", "2000-02", "2000-03"]
+    opening = {account_id: opening_fen for account_id, opening_fen in conn.execute("select id, opening_fen from accounts")}
+    history = {account_id: values for account_id, title, values in rows}
+    assert history[1] == [opening[1] + 1000, opening[1] + 1000, opening[1] + 600]
+    assert balances.check(conn) == []
+
+
+def test_rebuild(conn):
+    add(conn, "incomes", "2000-01-10", 1000)
+    conn.execute("delete from account_monthly")
+    balances.rebuild(conn)
+    assert balances.check(conn) == []
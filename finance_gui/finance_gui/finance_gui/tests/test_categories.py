@@ -0,0 +1,44 @@
+import sqlite3
+import pytest
+from core import categories
+from core import migrate
+
+
+@pytest.mark.parametrize("table", migrate.CATEGORY_TABLES)
+def test_closure_matches_pid(conn, table):
+    assert categories.check_closure(conn, table) == []
+
+
+@pytest.mark.parametrize("table", migrate.CATEGORY_TABLES)
+def test_closure_maintenance(conn, table):
+    """新增、移动、删除一棵三级的分类子树后，触发器维护的闭包表仍与 pid 一致"""
+    c = conn.cursor()
+    ids = []
+    for title, pid in (("检查一级", None), ("检查二级", 0), ("检查三级", 1)):
+        c.execute("insert into %s (title, pid) values (?, ?)" % table, (title, ids[pid] if pid is not None else None))
+        ids.append(c.lastrowid)
+    assert categories.check_closure(conn, table) == []
+    top = c.execute("select min(id) from %s where pid is null and id < ?" % table, (ids[0],)).fetchone()[0]
+    steps = [("update %s set pid = ? where id = ?" % table, (top, ids[0])),  # 整棵子树移到已有分类下
+             ("update %s set pid = null where id = ?" % table, (ids[1],)),  # 二级分类移为顶级
+             ("delete from %s where id = ?" % table, (ids[1],))]  # 删除后三级分类成为顶级
+    for sql, params in steps:
+        c.execute(sql, params)
+        assert categories.check_closure(conn, table) == [], sql
+    with pytest.raises(sqlite3.IntegrityError, match="下级分类"):
+        c.execute("update %s set pid = ? where id = ?" % table, (ids[2], ids[2]))
+
+
+@pytest.mark.parametrize("table", migrate.CATEGORY_TABLES)
+def test_delete_middle_category(conn, table):
+    """删除中间一级的分类后，其下级成为顶级，下级之间的关系保留"""
+    c = conn.cursor()
+    ids = []
+    for title in ("检查一级", "检查二级", "检查三级", "检查四级"):
+        c.execute("insert into %s (title, pid) values (?, ?)" % table, (title, ids[-1] if ids else None))
+        ids.append(c.lastrowid)
+    c.execute("delete from %s where id = ?" % table, (ids[1],))
+    assert categories.check_closure(conn, table) == []
+    rows = c.execute("select ancestor, descendant, depth, ancestor_level from %s where descendant in (?, ?) "
+                     "order by descendant, depth" % migrate.closure_table(table), ids[2:]).fetchall()
+    assert rows == [(ids[2], ids[2], 0, 1), (ids[3], ids[3], 0, 2), (ids[2], ids[3], 1, 1)]
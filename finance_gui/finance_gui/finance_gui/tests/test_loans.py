@@ -0,0 +1,122 @@
+import datetime
+import sqlite3
+import pytest
+from core import balances
+from core import loans
+
+INSERT = "insert into ledger (kind, note_date, title, money_fen, account_id, seller_id, loan_id, loan_kind, create_time) " \
+         "values (?, ?, '检查', ?, 1, 1, ?, ?, '2000-01-01')"
+
+
+def add(conn, kind, note_date, money_fen, loan_id=None):
+    values = loans.link_values(conn, loan_id)
+    return conn.execute(INSERT, (kind, note_date, money_fen, values["loan_id"], values["loan_kind"])).lastrowid
+
+
+def balance(conn, account_id=1):
+    return {row[0]: row[3] for row in balances.current_balances(conn)}[account_id]
+
+
+def outstanding(conn, loan_id):
+    row = conn.execute("select principal_fen - repaid_fen from loans where loan_id = ?", (loan_id,)).fetchone()
+    return row[0] if row else None
+
+
+def assert_consistent(conn):
+    assert loans.check(conn) == []
+    assert balances.check(conn) == []
+
+
+def test_loans_match_ledger(conn):
+    balances.checkpoint(conn)
+    assert_consistent(conn)
+
+
+def test_repayments_follow_edits(conn):
+    """借出后分两次收回，再修改金额、改关联、逻辑删除和恢复，借款表与账户余额都随之调整"""
+    balances.checkpoint(conn)
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    borrow = add(conn, "borrows", "2000-01-20", 20000)
+    first = add(conn, "repayments", "2000-02-10", 10000, lend)
+    second = add(conn, "repayments", "2000-03-10", 15000)
+    loans.link(conn, second, lend)
+    assert outstanding(conn, lend) == 25000
+    conn.execute("update ledger set money_fen = 12000 where id = ?", (first,))
+    conn.execute("update ledger set money_fen = 60000, note_date = '2000-01-11' where id = ?", (lend,))
+    assert outstanding(conn, lend) == 33000
+    loans.link(conn, first, borrow)
+    assert (outstanding(conn, lend), outstanding(conn, borrow)) == (45000, 8000)
+    conn.execute("update ledger set is_delete = 1 where id = ?", (lend,))
+    assert outstanding(conn, lend) is None
+    conn.execute("update ledger set is_delete = 0 where id = ?", (lend,))
+    assert outstanding(conn, lend) == 45000
+    assert_consistent(conn)
+
+
+def test_overview_and_aging(conn):
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    add(conn, "repayments", "2000-02-10", 10000, lend)
+    overview = {row[0]: row[2:] for row in loans.seller_overview(conn)}
+    count, borrowed, lent = overview[1]
+    assert lent >= 40000
+    rows = {(row[0], row[2]): row for row in loans.aging(conn, datetime.date(2000, 2, 20))}
+    seller_id, title, kind, count, total, buckets = rows[(1, "lends")]
+    assert sum(buckets) == total and buckets[1] >= 40000  # 借出 41 天，在 31-60 天一档
+
+
+def test_loan_kind_change_blocked(conn):
+    """已有还款关联的借款不能修改类型，否则还款计入余额的正负会与借款类型不一致"""
+    balances.checkpoint(conn)
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    add(conn, "repayments", "2000-02-10", 10000, lend)
+    with pytest.raises(sqlite3.IntegrityError, match="不能修改类型"):
+        conn.execute("update ledger set kind = 'borrows' where id = ?", (lend,))
+    other = add(conn, "lends", "2000-01-12", 30000)
+    conn.execute("update ledger set kind = 'borrows' where id = ?", (other,))  # 没有还款的借款可以修改
+    assert_consistent(conn)
+
+
+def test_loan_delete_blocked(conn):
+    """已有还款关联的借款不能直接删除（包括通过兼容视图），没有还款的借款可以删除"""
+    balances.checkpoint(conn)
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    add(conn, "repayments", "2000-02-10", 10000, lend)
+    with pytest.raises(sqlite3.IntegrityError, match="不能删除"):
+        conn.execute("delete from lends where id = ?", (lend,))
+    other = add(conn, "lends", "2000-01-12", 30000)
+    conn.execute("delete from ledger where id = ?", (other,))
+    assert outstanding(conn, lend) == 40000
+    assert_consistent(conn)
+
+
+def test_loan_kind_must_match(conn):
+    """还款的 loan_kind 与所关联借款的类型不一致时拒绝写入"""
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    repayment = add(conn, "repayments", "2000-02-10", 10000)
+    with pytest.raises(sqlite3.IntegrityError, match="不一致"):
+        conn.execute("update ledger set loan_id = ?, loan_kind = 'borrows' where id = ?", (lend, repayment))
+    with pytest.raises(sqlite3.IntegrityError, match="不一致"):
+        conn.execute(INSERT, ("repayments", "2000-02-10", 10000, lend, None))
+
+
+def test_restored_repayment_keeps_direction(conn):
+    """恢复备份后还款不再关联借款（loan_id 为空），但保留 loan_kind，余额不变"""
+    balances.checkpoint(conn)
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    repayment = add(conn, "repayments", "2000-02-10", 10000, lend)
+    before = balance(conn)
+    conn.execute("update ledger set loan_id = null where id = ?", (repayment,))
+    conn.execute("update ledger set is_delete = 1 where id = ?", (lend,))
+    conn.execute("update ledger set is_delete = 0 where id = ?", (lend,))
+    assert balance(conn) == before
+    loans.link(conn, repayment, None)  # 手动取消关联时还款改为计入支出
+    assert balance(conn) == before - 20000
+    assert_consistent(conn)
+
+
+def test_rebuild(conn):
+    lend = add(conn, "lends", "2000-01-10", 50000)
+    add(conn, "repayments", "2000-02-10", 10000, lend)
+    conn.execute("delete from loans")
+    assert loans.rebuild(conn) >= 1
+    assert_consistent(conn)
@@ -0,0 +1,39 @@
+import os
+import shutil
+import sqlite3
+from core import migrate
+from tests.conftest import DB_PATH
+
+
+def test_latest_version(conn):
+    assert migrate.get_version(conn) == migrate.LATEST_VERSION
+    assert migrate.migrate(conn) == []  # 已是最新版本时不再执行
+
+
+def test_hot_queries_use_indexes(conn):
+    assert migrate.check_query_plans(conn) == []
+
+
+def test_upgrade_backs_up_once(tmp_path):
+    """有待执行的迁移时先备份原文件，已是最新版本时不再备份"""
+    db_path = str(tmp_path / "finance.db")
+    shutil.copy(DB_PATH, db_path)
+    backup_dir = str(tmp_path / "backup")
+    applied = migrate.upgrade(db_path, backup_dir=backup_dir)
+    assert applied == [number for number, desc, func in migrate.MIGRATIONS]
+    backups = os.listdir(backup_dir)
+    assert len(backups) == 1 and backups[0].startswith("finance-v0-")
+    backup = sqlite3.connect(os.path.join(backup_dir, backups[0]))
+    assert migrate.get_version(backup) == 0
+    backup.close()
+    assert migrate.upgrade(db_path, backup_dir=backup_dir) == []
+    assert len(os.listdir(backup_dir)) == 1
+
+
+def test_id_shifts_recorded(conn):
+    """合并交易表时顺延的 id 都有记录，记录的区间与迁入后的 id 一致"""
+    shifts = conn.execute("select kind, first_id, last_id, offset from ledger_id_shifts").fetchall()
+    assert len(migrate.id_shift_notes(conn)) == len(shifts)
+    for kind, first_id, last_id, offset in shifts:
+        low, high = conn.execute("select min(id), max(id) from ledger where kind = ?", (kind,)).fetchone()
+        assert low >= first_id + offset and high <= last_id + offset
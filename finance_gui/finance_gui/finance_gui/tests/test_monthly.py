@@ -0,0 +1,43 @@
+from core import monthly
+
+
+def add_payment(conn, note_date, money_fen, category_pid=None):
+    return conn.execute("insert into ledger (kind, note_date, title, money_fen, category_pid, create_time) "
+                        "values ('payments', ?, '检查', ?, ?, ?)",
+                        (note_date, money_fen, category_pid, note_date)).lastrowid
+
+
+def test_totals_match_ledger(conn):
+    assert monthly.check(conn) == []
+
+
+def test_triggers_follow_edits(conn):
+    """新增、修改金额与日期、逻辑删除后汇总表仍与交易记录一致"""
+    nid = add_payment(conn, "2000-01-15", 1234)
+    assert monthly.month_total(conn, "payments", "2000-01") == 12.34
+    conn.execute("update ledger set money_fen = 2000, note_date = '2000-02-01' where id = ?", (nid,))
+    assert monthly.month_total(conn, "payments", "2000-01") == 0
+    assert monthly.month_total(conn, "payments", "2000-02") == 20
+    conn.execute("update ledger set is_delete = 1 where id = ?", (nid,))
+    assert monthly.month_total(conn, "payments", "2000-02") == 0
+    assert monthly.check(conn) == []
+
+
+def test_category_rollup(conn):
+    """按一级分类汇总时，二级分类的金额计入所属的一级分类，合计与当月总额一致"""
+    parent, child = conn.execute("select pid, id from pay_categorys where pid is not null limit 1").fetchone()
+    add_payment(conn, "2000-03-01", 500, parent)
+    nid = add_payment(conn, "2000-03-02", 300, parent)
+    conn.execute("update ledger set category_cid = ? where id = ?", (child, nid))
+    add_payment(conn, "2000-03-03", 200)
+    by_parent = {row[0]: row[2] for row in monthly.category_totals(conn, "payments", "2000-03", "2000-03", 1)}
+    assert by_parent == {parent: 8, None: 2}
+    by_leaf = {row[0]: row[2] for row in monthly.category_totals(conn, "payments", "2000-03", "2000-03")}
+    assert by_leaf == {parent: 5, child: 3, None: 2}
+    assert sum(by_leaf.values()) == monthly.month_total(conn, "payments", "2000-03")
+
+
+def test_rebuild(conn):
+    conn.execute("delete from monthly_totals")
+    assert monthly.rebuild(conn) > 0
+    assert monthly.check(conn) == []
@@ -0,0 +1,29 @@
+import pytest
+from core.paging import KeysetPager, ORDER_MODES, ORDER_KEYS
+
+SOURCE = "v_payments_info"
+COLUMNS = ["id", "note_date", "title", "remark", "money"]
+PAGE_SIZE = 7
+
+
+@pytest.mark.parametrize("order_mode", ORDER_MODES)
+@pytest.mark.parametrize("order_key", ORDER_KEYS)
+def test_pages_match_full_query(migrated_db, order_mode, order_key):
+    """逐页前后翻动的结果与一次性按同样顺序查询一致"""
+    conn = migrated_db
+    sort = "id %s" % order_key if order_mode == "id" else "%s %s, id %s" % (order_mode, order_key, order_key)
+    expected = conn.execute("select %s from %s order by %s" % (", ".join(COLUMNS), SOURCE, sort)).fetchall()
+    assert len(expected) > PAGE_SIZE
+    pager = KeysetPager(conn, SOURCE, COLUMNS, order_mode, order_key, page_size=PAGE_SIZE)
+    pages = [pager.first()]
+    while pages[-1] and len(pages[-1]) == PAGE_SIZE:
+        pages.append(pager.after(pages[-1][-1]))
+    assert [row for page in pages for row in page] == expected
+    # 从最后一条记录往回翻
+    back = [[expected[-1]]]
+    while back[-1]:
+        back.append(pager.before(back[-1][0]))
+    assert [row for page in reversed(back) for row in page] == expected
+    middle = expected[len(expected) // 2]
+    assert pager.starting_at(middle[0])[0] == middle
+    assert pager.count() == len(expected)
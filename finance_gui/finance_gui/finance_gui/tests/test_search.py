@@ -0,0 +1,19 @@
+import pytest
+from core import search
+from core.migrate import FTS_COLUMNS
+
+CASES = [(source, column) for source, table in search.VIEW_TABLES.items() for column in FTS_COLUMNS[table]]
+
+
+@pytest.mark.parametrize("source, column", CASES)
+def test_search_matches_like(migrated_db, source, column):
+    """全文索引搜索与 like 搜索的结果一致，关键字取已有记录中长短不一的片段"""
+    conn = migrated_db
+    values = [row[0] for row in conn.execute("select %s from %s where %s is not null limit 20" % (column, source, column))]
+    keys = {value[i:i + n] for value in values for n in (1, 2, 3, 4) for i in range(0, max(len(value) - n, 0) + 1, 2)}
+    for key in sorted(keys):
+        where, params = search.keyword_condition(conn, source, column, key)
+        found = conn.execute("select id from %s where %s order by id" % (source, where), params).fetchall()
+        expected = conn.execute("select id from %s where %s like ? order by id" % (source, column),
+                                ("%%%s%%" % key,)).fetchall()
+        assert found == expected, key
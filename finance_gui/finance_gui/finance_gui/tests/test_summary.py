@@ -0,0 +1,71 @@
+import pytest
+from core.summary import LedgerSummary, MONEY_AGGREGATES, kind_totals
+from core.migrate import LEDGER_TABLES
+
+SOURCES = [("v_payments_info", ["account", "seller", "category_p", "category_c", "member"]),
+           ("v_incomes_info", ["account", "seller", "category_p", "category_c", "member"]),
+           ("v_borrows_info", ["account", "seller"])]
+
+
+def per_field(conn, source, fields):
+    """逐字段查询的统计结果：整体查询一次，每个分组字段再各查询一次"""
+    overall = conn.execute("select %s from %s" % (MONEY_AGGREGATES, source)).fetchone()
+    groups = {field: [tuple(row) for row in conn.execute("select %s,%s from %s group by %s" % (
+        field, MONEY_AGGREGATES, source, field))] for field in fields}
+    return tuple(overall), groups
+
+
+def table_scans(conn, sql):
+    """语句的查询计划中读取交易表（视图中别名为 p）的次数"""
+    plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+    return sum(1 for line in plan if line.split()[:2] in (["SCAN", "p"], ["SEARCH", "p"]))
+
+
+@pytest.mark.parametrize("source, fields", SOURCES)
+def test_single_scan_matches_per_field(migrated_db, source, fields):
+    """一次扫描得到的整体与各字段统计与逐字段查询一致，且只读取交易表一次"""
+    statements = []
+    migrated_db.set_trace_callback(statements.append)
+    try:
+        summary = LedgerSummary(migrated_db, source, fields)
+        summary.load()
+    finally:
+        migrated_db.set_trace_callback(None)
+    overall, groups = per_field(migrated_db, source, fields)
+    assert summary.overall() == overall
+    for field in fields:
+        assert summary.groups(field) == sorted(groups[field], key=lambda row: (row[0] is not None, row[0]))
+    assert len(statements) == 1 and table_scans(migrated_db, statements[0]) == 1
+
+
+def test_apply_matches_reload(conn):
+    """单条记录新增、修改、删除后，内存中增减的统计与重新统计一致"""
+    source, fields = SOURCES[0]
+    summary = LedgerSummary(conn, source, fields)
+    summary.load()
+
+    def row(nid):
+        return dict(zip(["money"] + fields, conn.execute("select money,%s from %s where id = ?" % (
+            ",".join(fields), source), (nid,)).fetchone()))
+
+    nid = conn.execute("insert into ledger (kind, note_date, title, money_fen, create_time) "
+                       "values ('payments', '2000-01-01', '检查', 99999999, '2000-01-01')").lastrowid
+    summary.apply(None, row(nid))
+    old = row(nid)
+    conn.execute("update ledger set money_fen = 1 where id = ?", (nid,))
+    summary.apply(old, row(nid))
+    old = row(nid)
+    conn.execute("update ledger set is_delete = 1 where id = ?", (nid,))
+    summary.apply(old, None)
+    fresh = LedgerSummary(conn, source, fields)
+    fresh.load()
+    assert summary.overall() == fresh.overall()
+    for field in fields:
+        assert sorted(summary.groups(field), key=str) == sorted(fresh.groups(field), key=str)
+
+
+def test_kind_totals(migrated_db):
+    totals = kind_totals(migrated_db)
+    for kind in LEDGER_TABLES:
+        expected = migrated_db.execute("select %s from %s where is_delete = 0" % (MONEY_AGGREGATES, kind)).fetchone()
+        assert totals[kind] == (tuple(expected) if expected[0] else (0, None, None, None, None))